@@ -1,17 +1,52 @@
 import os
-import json
 import asyncio
-import shutil
+import hashlib
+import hmac
 import sqlite3
 import random
-from typing import List, Optional
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple, Union
 from datetime import datetime
 
 import pandas as pd
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import Depends, FastAPI, Header, HTTPException, UploadFile, File, Form, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel, field_validator # Changed: Added field_validator
+from pydantic import BaseModel, ValidationError, field_validator # Changed: Added field_validator
+
+try:
+    from .serialization import dumps_str, loads, SSE_DONE, sse_event, sse_chunks
+    from .shared_dataset import SHARED_DATASET_ENV, SharedDataset, publish
+    from .output_validation import OutputValidationStats, parse_json_with_repair, repair_json
+    from .roadmap_schema import RoadmapMilestone, assign_missing_ids, known_fields
+    from .traffic_capture import capture_from_env
+    from .dataset_index import AGE_BINS, AGE_LABELS, BitmapIndex
+    from .semantic_cache import SemanticCache, adapt_response, cohort_key, shareable_response
+    from .conversation_memory import ConversationMemory
+    from .profiling import install_profiler
+    from .roadmap_templates import apply_personalization, build_roadmap, match_archetype, title_outline
+    from .dataset_registry import DEFAULT_WAVE, EMPTY_WAVE, DatasetRegistry, LoadedWave, parse_wave
+    from .chunked_upload import DEFAULT_CHUNK_SIZE, UploadError, UploadSessions
+    from .circuit_breaker import ModelUnavailable, breaker_from_env
+    from .fallback_engine import build_fallback_roadmap
+except ImportError:
+    from serialization import dumps_str, loads, SSE_DONE, sse_event, sse_chunks
+    from shared_dataset import SHARED_DATASET_ENV, SharedDataset, publish
+    from output_validation import OutputValidationStats, parse_json_with_repair, repair_json
+    from roadmap_schema import RoadmapMilestone, assign_missing_ids, known_fields
+    from traffic_capture import capture_from_env
+    from dataset_index import AGE_BINS, AGE_LABELS, BitmapIndex
+    from semantic_cache import SemanticCache, adapt_response, cohort_key, shareable_response
+    from conversation_memory import ConversationMemory
+    from profiling import install_profiler
+    from roadmap_templates import apply_personalization, build_roadmap, match_archetype, title_outline
+    from dataset_registry import DEFAULT_WAVE, EMPTY_WAVE, DatasetRegistry, LoadedWave, parse_wave
+    from chunked_upload import DEFAULT_CHUNK_SIZE, UploadError, UploadSessions
+    from circuit_breaker import ModelUnavailable, breaker_from_env
+    from fallback_engine import build_fallback_roadmap
 
 try:
     from groq import Groq
@@ -31,221 +66,307 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Opt-in sampling profiler; a no-op unless HIVEMIND_PROFILE_DIR is set
+install_profiler(app, "ai-chat-companion")
 
 # --- 2. DATASET LOADING & STATS ---
-EASYSHARE_DF = None
-DATASET_STATS = "Dataset not loaded."
+def legacy_dataset_path() -> str:
+    """Single-file location used before the wave registry; adopted as the default wave."""
+    return os.path.join(os.path.dirname(__file__), 'easyshare_data.sav')
 
-def load_dataset():
-    global EASYSHARE_DF, DATASET_STATS
-    try:
-        base_dir = os.path.dirname(__file__)
-        sav_path = os.path.join(base_dir, 'easyshare_data.sav')
+def build_dataset(df: pd.DataFrame):
+    """Label columns and compute prompt stats for one wave. Returns (df, stats)."""
+    stats = "Dataset not loaded."
+    if not df.empty:
+        df.columns = [c.lower() for c in df.columns]
 
-        if os.path.exists(sav_path):
-            # Prefer SPSS if available (Hackathon requirement)
-            EASYSHARE_DF = pd.read_spss(sav_path)
-            print(f"Loaded SPSS Dataset: {len(EASYSHARE_DF)} records.")
-            # Print columns to help map variables (e.g. age, gender)
-            print(f"Columns found: {list(EASYSHARE_DF.columns)[:10]}...") 
-        else:
-            print("No dataset found. Proceeding with empty dataframe.")
-            EASYSHARE_DF = pd.DataFrame()
-            
-        if not EASYSHARE_DF.empty:
-            EASYSHARE_DF.columns = [c.lower() for c in EASYSHARE_DF.columns]
-
-            # --- Label mappings (basic) ---
-            label_map_sphus = {
-                1: 'Excellent', 2: 'Very good', 3: 'Good', 4: 'Fair', 5: 'Poor'
-            }
-            label_map_br015 = {
-                1: 'Daily', 2: 'More than once a week', 3: 'Once a week', 4: 'One to three times a month', 5: 'Hardly ever or never'
-            }
-            label_map_ep005 = {
-                1: 'Employed', 2: 'Unemployed', 3: 'Retired', 4: 'Student', 5: 'Homemaker', 6: 'Disabled', 7: 'Other'
-            }
-            label_map_mar = {
-                1: 'Married/Registered', 2: 'Separated', 3: 'Divorced', 4: 'Widowed', 5: 'Never married'
-            }
-
-            def apply_labels(series, mapping):
-                try:
-                    return series.map(lambda x: mapping.get(x, x))
-                except Exception:
-                    return series
+        # --- Label mappings (basic) ---
+        label_map_sphus = {
+            1: 'Excellent', 2: 'Very good', 3: 'Good', 4: 'Fair', 5: 'Poor'
+        }
+        label_map_br015 = {
+            1: 'Daily', 2: 'More than once a week', 3: 'Once a week', 4: 'One to three times a month', 5: 'Hardly ever or never'
+        }
+        label_map_ep005 = {
+            1: 'Employed', 2: 'Unemployed', 3: 'Retired', 4: 'Student', 5: 'Homemaker', 6: 'Disabled', 7: 'Other'
+        }
+        label_map_mar = {
+            1: 'Married/Registered', 2: 'Separated', 3: 'Divorced', 4: 'Widowed', 5: 'Never married'
+        }
 
-            # Defensive conversions: always coerce, never raise
+        def apply_labels(series, mapping):
             try:
-                if 'sphus' in EASYSHARE_DF.columns:
-                    sphus_num = pd.to_numeric(EASYSHARE_DF['sphus'], errors='coerce')
-                    EASYSHARE_DF['sphus_l'] = apply_labels(sphus_num, label_map_sphus)
+                return series.map(lambda x: mapping.get(x, x))
             except Exception:
-                pass
+                return series
+
+        # Defensive conversions: always coerce, never raise
+        try:
+            if 'sphus' in df.columns:
+                sphus_num = pd.to_numeric(df['sphus'], errors='coerce')
+                df['sphus_l'] = apply_labels(sphus_num, label_map_sphus)
+        except Exception:
+            pass
 
+        try:
+            if 'br015_' in df.columns:
+                br_num = pd.to_numeric(df['br015_'], errors='coerce')
+                df['br015_l'] = apply_labels(br_num, label_map_br015)
+        except Exception:
+            pass
+
+        try:
+            if 'ep005_' in df.columns:
+                ep_num = pd.to_numeric(df['ep005_'], errors='coerce')
+                df['ep005_l'] = apply_labels(ep_num, label_map_ep005)
+        except Exception:
+            pass
+
+        try:
+            if 'mar_stat' in df.columns:
+                mar_num = pd.to_numeric(df['mar_stat'], errors='coerce')
+                df['mar_stat_l'] = apply_labels(mar_num, label_map_mar)
+        except Exception:
+            pass
+
+        # --- Core stats ---
+        total = len(df)
+
+        # Age metrics
+        avg_age = 'N/A'
+        age_bins_str = ''
+        if 'age' in df.columns:
+            age_series = df['age']
+            if age_series.dtype.name == 'category':
+                age_series = age_series.astype(str)
+            numeric_age = pd.to_numeric(age_series, errors='coerce')
             try:
-                if 'br015_' in EASYSHARE_DF.columns:
-                    br_num = pd.to_numeric(EASYSHARE_DF['br015_'], errors='coerce')
-                    EASYSHARE_DF['br015_l'] = apply_labels(br_num, label_map_br015)
+                avg_age = round(numeric_age.mean(), 1)
             except Exception:
                 pass
+            # Histogram bins (broad view)
+            age_binned = pd.cut(numeric_age, bins=AGE_BINS, labels=AGE_LABELS, right=False)
+            age_counts = age_binned.value_counts(normalize=True).sort_index()
+            age_bins_str = ', '.join([f"{idx}: {val:.1%}" for idx, val in age_counts.items()])
+
+        # Top locations (country/location)
+        loc_counts = ''
+        for col in ['location', 'country', 'birth_country']:
+            if col in df.columns:
+                top_locs = df[col].value_counts().head(5).to_dict()
+                loc_counts = f"Top {col.title()}: {top_locs}"
+                break
+
+        # Gender distribution
+        gender_dist = ''
+        if 'female' in df.columns:
+            g_counts = df['female'].value_counts(normalize=True).to_dict()
+            g_str = ', '.join([f"female={int(k)}: {v:.1%}" for k, v in g_counts.items()])
+            gender_dist = f"Gender Split: {g_str}"
+
+        # Health status
+        health_dist = ''
+        src = 'sphus_l' if 'sphus_l' in df.columns else ('sphus' if 'sphus' in df.columns else None)
+        if src:
+            h_counts = df[src].value_counts(normalize=True).head(5).to_dict()
+            h_str = ', '.join([f"{k}: {v:.1%}" for k, v in h_counts.items()])
+            health_dist = f"Self-Perceived Health: {h_str}"
+
+        # Activity frequency
+        activity_dist = ''
+        src = 'br015_l' if 'br015_l' in df.columns else ('br015_' if 'br015_' in df.columns else None)
+        if src:
+            a_counts = df[src].value_counts(normalize=True).head(5).to_dict()
+            a_str = ', '.join([f"{k}: {v:.1%}" for k, v in a_counts.items()])
+            activity_dist = f"Vigorous Activity: {a_str}"
+
+        # Employment
+        emp_dist = ''
+        src = 'ep005_l' if 'ep005_l' in df.columns else ('ep005_' if 'ep005_' in df.columns else None)
+        if src:
+            e_counts = df[src].value_counts(normalize=True).head(5).to_dict()
+            e_str = ', '.join([f"{k}: {v:.1%}" for k, v in e_counts.items()])
+            emp_dist = f"Employment: {e_str}"
+
+        # Smoking & BMI summaries
+        smoking_rate = ''
+        if 'ever_smoked' in df.columns:
+            sm_counts = df['ever_smoked'].value_counts(normalize=True).to_dict()
+            sm_str = ', '.join([f"ever_smoked={k}: {v:.1%}" for k, v in sm_counts.items()])
+            smoking_rate = f"Smoking History: {sm_str}"
 
+        bmi_summary = ''
+        bmi_col = 'bmi'
+        if bmi_col in df.columns:
+            bmi_numeric = pd.to_numeric(df[bmi_col], errors='coerce')
+            mean_bmi = bmi_numeric.mean()
+            over_30 = (bmi_numeric >= 30).mean()
+            bmi_summary = f"BMI Avg: {mean_bmi:.1f}, Obesity (BMI>=30): {over_30:.1%}"
+
+        # CASP well-being
+        casp_summary = ''
+        if 'casp' in df.columns:
             try:
-                if 'ep005_' in EASYSHARE_DF.columns:
-                    ep_num = pd.to_numeric(EASYSHARE_DF['ep005_'], errors='coerce')
-                    EASYSHARE_DF['ep005_l'] = apply_labels(ep_num, label_map_ep005)
+                casp_num = pd.to_numeric(df['casp'], errors='coerce')
+                casp_summary = f"CASP Avg: {casp_num.mean():.1f}"
             except Exception:
                 pass
 
+        # --- Insights ---
+        insights = []
+        # Health & Activity Insight
+        if 'sphus_l' in df.columns and 'br015_l' in df.columns:
+            healthy = df[df['sphus_l'].isin(['Excellent', 'Very good'])]
+            if not healthy.empty:
+                active_counts = healthy['br015_l'].value_counts(normalize=True)
+                vigorous_pct = active_counts.get('More than once a week', 0) * 100
+                insights.append(f"Among those in excellent/very good health, {vigorous_pct:.1f}% exercise >1x/week.")
+        # CASP by marital status
+        if 'casp' in df.columns and 'mar_stat_l' in df.columns:
+            try:
+                df['casp_num'] = pd.to_numeric(df['casp'], errors='coerce')
+                avg_casp = df.groupby('mar_stat_l')['casp_num'].mean().sort_values(ascending=False)
+                if not avg_casp.empty:
+                    best_status = avg_casp.index[0]
+                    insights.append(f"Highest CASP average observed in: {best_status}.")
+            except Exception:
+                pass
+        # Smoking vs BMI (simple signal)
+        if 'ever_smoked' in df.columns and bmi_col in df.columns:
             try:
-                if 'mar_stat' in EASYSHARE_DF.columns:
-                    mar_num = pd.to_numeric(EASYSHARE_DF['mar_stat'], errors='coerce')
-                    EASYSHARE_DF['mar_stat_l'] = apply_labels(mar_num, label_map_mar)
+                bmi_numeric = pd.to_numeric(df[bmi_col], errors='coerce')
+                grp = pd.DataFrame({'bmi': bmi_numeric, 'smoked': df['ever_smoked']}).dropna()
+                if not grp.empty:
+                    diff = grp.groupby('smoked')['bmi'].mean()
+                    if set(diff.index) >= {0,1}:
+                        delta = diff.get(1, float('nan')) - diff.get(0, float('nan'))
+                        insights.append(f"Average BMI difference (ever smoked vs not): {delta:.1f}.")
             except Exception:
                 pass
 
-            # --- Core stats ---
-            total = len(EASYSHARE_DF)
-
-            # Age metrics
-            avg_age = 'N/A'
-            age_bins_str = ''
-            if 'age' in EASYSHARE_DF.columns:
-                age_series = EASYSHARE_DF['age']
-                if age_series.dtype.name == 'category':
-                    age_series = age_series.astype(str)
-                numeric_age = pd.to_numeric(age_series, errors='coerce')
-                try:
-                    avg_age = round(numeric_age.mean(), 1)
-                except Exception:
-                    pass
-                # Histogram bins (broad view)
-                bins = [0, 30, 40, 50, 60, 70, 80, 120]
-                labels = ['<30', '30-39', '40-49', '50-59', '60-69', '70-79', '80+']
-                age_binned = pd.cut(numeric_age, bins=bins, labels=labels, right=False)
-                age_counts = age_binned.value_counts(normalize=True).sort_index()
-                age_bins_str = ', '.join([f"{idx}: {val:.1%}" for idx, val in age_counts.items()])
-
-            # Top locations (country/location)
-            loc_counts = ''
-            for col in ['location', 'country', 'birth_country']:
-                if col in EASYSHARE_DF.columns:
-                    top_locs = EASYSHARE_DF[col].value_counts().head(5).to_dict()
-                    loc_counts = f"Top {col.title()}: {top_locs}"
-                    break
-
-            # Gender distribution
-            gender_dist = ''
-            if 'female' in EASYSHARE_DF.columns:
-                g_counts = EASYSHARE_DF['female'].value_counts(normalize=True).to_dict()
-                g_str = ', '.join([f"female={int(k)}: {v:.1%}" for k, v in g_counts.items()])
-                gender_dist = f"Gender Split: {g_str}"
-
-            # Health status
-            health_dist = ''
-            src = 'sphus_l' if 'sphus_l' in EASYSHARE_DF.columns else ('sphus' if 'sphus' in EASYSHARE_DF.columns else None)
-            if src:
-                h_counts = EASYSHARE_DF[src].value_counts(normalize=True).head(5).to_dict()
-                h_str = ', '.join([f"{k}: {v:.1%}" for k, v in h_counts.items()])
-                health_dist = f"Self-Perceived Health: {h_str}"
-
-            # Activity frequency
-            activity_dist = ''
-            src = 'br015_l' if 'br015_l' in EASYSHARE_DF.columns else ('br015_' if 'br015_' in EASYSHARE_DF.columns else None)
-            if src:
-                a_counts = EASYSHARE_DF[src].value_counts(normalize=True).head(5).to_dict()
-                a_str = ', '.join([f"{k}: {v:.1%}" for k, v in a_counts.items()])
-                activity_dist = f"Vigorous Activity: {a_str}"
-
-            # Employment
-            emp_dist = ''
-            src = 'ep005_l' if 'ep005_l' in EASYSHARE_DF.columns else ('ep005_' if 'ep005_' in EASYSHARE_DF.columns else None)
-            if src:
-                e_counts = EASYSHARE_DF[src].value_counts(normalize=True).head(5).to_dict()
-                e_str = ', '.join([f"{k}: {v:.1%}" for k, v in e_counts.items()])
-                emp_dist = f"Employment: {e_str}"
-
-            # Smoking & BMI summaries
-            smoking_rate = ''
-            if 'ever_smoked' in EASYSHARE_DF.columns:
-                sm_counts = EASYSHARE_DF['ever_smoked'].value_counts(normalize=True).to_dict()
-                sm_str = ', '.join([f"ever_smoked={k}: {v:.1%}" for k, v in sm_counts.items()])
-                smoking_rate = f"Smoking History: {sm_str}"
-
-            bmi_summary = ''
-            bmi_col = 'bmi'
-            if bmi_col in EASYSHARE_DF.columns:
-                bmi_numeric = pd.to_numeric(EASYSHARE_DF[bmi_col], errors='coerce')
-                mean_bmi = bmi_numeric.mean()
-                over_30 = (bmi_numeric >= 30).mean()
-                bmi_summary = f"BMI Avg: {mean_bmi:.1f}, Obesity (BMI>=30): {over_30:.1%}"
-
-            # CASP well-being
-            casp_summary = ''
-            if 'casp' in EASYSHARE_DF.columns:
-                try:
-                    casp_num = pd.to_numeric(EASYSHARE_DF['casp'], errors='coerce')
-                    casp_summary = f"CASP Avg: {casp_num.mean():.1f}"
-                except Exception:
-                    pass
+        insights_text = "\n".join(insights)
+        sections = [
+            f"Total Records: {total}",
+            f"Average Age: {avg_age}",
+            (f"Age Bins: {age_bins_str}" if age_bins_str else None),
+            (loc_counts or None),
+            (gender_dist or None),
+            (health_dist or None),
+            (activity_dist or None),
+            (emp_dist or None),
+            (smoking_rate or None),
+            (bmi_summary or None),
+            (casp_summary or None),
+        ]
+        summary_lines = [s for s in sections if s]
+        stats = "\n".join(summary_lines) + ("\n\nDATASET INSIGHTS\n" + insights_text if insights_text else "")
 
-            # --- Insights ---
-            insights = []
-            # Health & Activity Insight
-            if 'sphus_l' in EASYSHARE_DF.columns and 'br015_l' in EASYSHARE_DF.columns:
-                healthy = EASYSHARE_DF[EASYSHARE_DF['sphus_l'].isin(['Excellent', 'Very good'])]
-                if not healthy.empty:
-                    active_counts = healthy['br015_l'].value_counts(normalize=True)
-                    vigorous_pct = active_counts.get('More than once a week', 0) * 100
-                    insights.append(f"Among those in excellent/very good health, {vigorous_pct:.1f}% exercise >1x/week.")
-            # CASP by marital status
-            if 'casp' in EASYSHARE_DF.columns and 'mar_stat_l' in EASYSHARE_DF.columns:
-                try:
-                    EASYSHARE_DF['casp_num'] = pd.to_numeric(EASYSHARE_DF['casp'], errors='coerce')
-                    avg_casp = EASYSHARE_DF.groupby('mar_stat_l')['casp_num'].mean().sort_values(ascending=False)
-                    if not avg_casp.empty:
-                        best_status = avg_casp.index[0]
-                        insights.append(f"Highest CASP average observed in: {best_status}.")
-                except Exception:
-                    pass
-            # Smoking vs BMI (simple signal)
-            if 'ever_smoked' in EASYSHARE_DF.columns and bmi_col in EASYSHARE_DF.columns:
-                try:
-                    bmi_numeric = pd.to_numeric(EASYSHARE_DF[bmi_col], errors='coerce')
-                    grp = pd.DataFrame({'bmi': bmi_numeric, 'smoked': EASYSHARE_DF['ever_smoked']}).dropna()
-                    if not grp.empty:
-                        diff = grp.groupby('smoked')['bmi'].mean()
-                        if set(diff.index) >= {0,1}:
-                            delta = diff.get(1, float('nan')) - diff.get(0, float('nan'))
-                            insights.append(f"Average BMI difference (ever smoked vs not): {delta:.1f}.")
-                except Exception:
-                    pass
+    return df, stats
 
-            DATASET_INSIGHTS = "\n".join(insights)
-            sections = [
-                f"Total Records: {total}",
-                f"Average Age: {avg_age}",
-                (f"Age Bins: {age_bins_str}" if age_bins_str else None),
-                (loc_counts or None),
-                (gender_dist or None),
-                (health_dist or None),
-                (activity_dist or None),
-                (emp_dist or None),
-                (smoking_rate or None),
-                (bmi_summary or None),
-                (casp_summary or None),
-            ]
-            summary_lines = [s for s in sections if s]
-            DATASET_STATS = "\n".join(summary_lines) + ("\n\nDATASET INSIGHTS\n" + DATASET_INSIGHTS if DATASET_INSIGHTS else "")
-            
+def load_wave(sav_path: str, sha256: Optional[str] = None) -> LoadedWave:
+    """Read one wave's .sav file and build its stats and bitmap indexes."""
+    try:
+        if os.path.exists(sav_path):
+            # Prefer SPSS if available (Hackathon requirement)
+            df = pd.read_spss(sav_path)
+            print(f"Loaded SPSS Dataset: {len(df)} records.")
+            # Print columns to help map variables (e.g. age, gender)
+            print(f"Columns found: {list(df.columns)[:10]}...")
+        else:
+            print(f"No dataset found at {sav_path}. Proceeding with empty dataframe.")
+            df = pd.DataFrame()
+        df, stats = build_dataset(df)
+        # Bitmap indexes for /api/dataset/query
+        return LoadedWave(df, stats, BitmapIndex(df), sha256)
     except Exception as e:
         print(f"Error loading dataset: {e}")
-        EASYSHARE_DF = pd.DataFrame()
-        DATASET_STATS = f"Error loading data: {str(e)}"
+        return LoadedWave(pd.DataFrame(), f"Error loading data: {str(e)}", BitmapIndex(None), sha256)
+
+# --- Wave registry ---
+# Several EasyShare waves/versions live side by side under datasets/; requests pick
+# one with a "wave" parameter ("w8" or "w8@2"), the default wave otherwise. Waves
+# load on first use and are evicted LRU-style above DATASET_MEMORY_BUDGET_MB.
+# Building the registry only reads registry.json; an old easyshare_data.sav is
+# adopted in the startup hook, so importing this module writes nothing.
+DATASET_REGISTRY = DatasetRegistry(
+    os.environ.get("DATASETS_DIR", os.path.join(os.path.dirname(__file__), "datasets")),
+    load_wave,
+    memory_budget_bytes=int(float(os.environ.get("DATASET_MEMORY_BUDGET_MB", "1024")) * 1024 * 1024),
+    legacy_path=legacy_dataset_path(),
+)
+
+def load_default_wave() -> LoadedWave:
+    key = DATASET_REGISTRY.resolve(None)
+    if key is None:
+        print("No dataset found. Proceeding with empty dataframe.")
+        return EMPTY_WAVE
+    return DATASET_REGISTRY.load(key)
+
+async def get_wave(wave: Optional[str]) -> LoadedWave:
+    """Loaded dataset for a request's wave parameter (reads it from disk on first use)."""
+    await refresh_shared_dataset()
+    try:
+        key = DATASET_REGISTRY.resolve(wave)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset wave: {wave}. See /api/datasets.")
+    if key is None:
+        return EMPTY_WAVE
+    loaded = DATASET_REGISTRY.peek(key)
+    if loaded is None:
+        try:
+            loaded = await asyncio.to_thread(DATASET_REGISTRY.load, key)
+        except KeyError:
+            # Pruned by an upload on another worker since resolve()
+            raise HTTPException(status_code=404, detail=f"Dataset version {key} is no longer available.")
+    return loaded
+
+# --- Multi-worker mode ---
+# When started through `python shared_dataset.py --workers N`, the supervisor has
+# already loaded and published the default wave; workers only map it read-only.
+# Other waves are loaded privately per worker. Attaching maps every column and
+# rebuilds the bitmap indexes, and publishing writes every column, so both run
+# in a thread (one at a time per worker), never on the event loop.
+SHARED_DATASET_DIR = os.environ.get(SHARED_DATASET_ENV)
+SHARED_DATASET = SharedDataset(SHARED_DATASET_DIR) if SHARED_DATASET_DIR else None
+_SHARED_DATASET_LOCK = threading.Lock()
+
+def attach_shared_dataset():
+    # A new generation means an upload was registered; don't wait for the throttled re-read
+    DATASET_REGISTRY.reload()
+    key = DATASET_REGISTRY.key_for_sha256(DEFAULT_WAVE, SHARED_DATASET.sha256)
+    if key is None:
+        print("Shared dataset is not in the registry; loading waves privately.")
+        return
+    # Indexes are built from the mapped columns; only the bitmaps are per-worker
+    DATASET_REGISTRY.install(
+        key,
+        LoadedWave(SHARED_DATASET.df, SHARED_DATASET.stats, BitmapIndex(SHARED_DATASET.df), SHARED_DATASET.sha256),
+        pinned=True,
+    )
+
+def reattach_shared_dataset() -> bool:
+    """Map the CURRENT shared generation and install it; False if nothing is published. Blocking."""
+    with _SHARED_DATASET_LOCK:
+        if not SHARED_DATASET.attach():
+            return False
+        attach_shared_dataset()
+        return True
+
+async def refresh_shared_dataset():
+    """Pick up a dataset re-published by another worker (cheap, throttled check)."""
+    if SHARED_DATASET and SHARED_DATASET.changed():
+        await asyncio.to_thread(reattach_shared_dataset)
 
 @app.on_event("startup")
 async def startup_event():
-    load_dataset()
+    await asyncio.to_thread(DATASET_REGISTRY.adopt_legacy)
+    if SHARED_DATASET:
+        if await asyncio.to_thread(reattach_shared_dataset):
+            return
+        print("No shared dataset published yet. Loading a private copy.")
+    await asyncio.to_thread(load_default_wave)
 
 # --- 3. GROQ CONFIGURATION ---
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
@@ -259,6 +380,10 @@ if Groq and GROQ_API_KEY:
 else:
     print("GROQ_API_KEY not set or groq SDK missing. AI feedback will fallback.")
 
+# Model calls slower than MODEL_LATENCY_BUDGET_SECONDS count as failures; after
+# repeated failures the circuit opens and requests get the local fallback roadmap
+MODEL_BREAKER = breaker_from_env(default_budget=30.0)
+
 # --- 4. DATA MODELS ---
 class TaskModel(BaseModel):
     taskId: str
@@ -289,12 +414,17 @@ class AgentProfile(BaseModel):
     bio: Optional[str] = "New agent"
     user_input: Optional[str] = None
     
+    # Never filled in: parse_agent_profile pops the tree before validation and
+    # passes it on as parsed. The field stays so the OpenAPI request schema of
+    # /api/analyze-agent, which is built from this model, documents its shape.
     current_roadmap: List[MilestoneModel] = []
     points: int = 0
     experience_level: int = 1  # 1-10 scale
     wants: List[str] = []
     achievements: List[str] = []
     problems: List[str] = []
+    # Dataset wave for the stats in the prompt ("w8" or "w8@2"); default wave if unset
+    wave: Optional[str] = None
 
     # ADDED: Validator to handle string input for list fields
     @field_validator('interests', 'wants', 'achievements', 'problems', mode='before')
@@ -307,8 +437,8 @@ class AgentProfile(BaseModel):
             v = v.strip()
             if v.startswith("[") and v.endswith("]"):
                 try:
-                    return json.loads(v)
-                except json.JSONDecodeError:
+                    return loads(v)
+                except ValueError:
                     pass
             # Otherwise, treat as comma-separated values
             return [item.strip() for item in v.split(',') if item.strip()]
@@ -317,19 +447,261 @@ class AgentProfile(BaseModel):
 class MilestoneRequest(BaseModel):
     feedback: dict  # Expect the feedback JSON produced previously
 
-def format_sse(data: str) -> str:
-    return f"data: {data}\n\n"
+class DatasetQuery(BaseModel):
+    # e.g. {"female": 1, "ep005_l": "Retired", "age_bin": "60-69", "country": ["Austria", "Germany"]}
+    filters: Dict[str, Union[str, int, float, List[Union[str, int, float]]]] = {}
+    aggregates: List[str] = []  # e.g. ["bmi", "casp"]
+    wave: Optional[str] = None
+
+def _inline_refs(node, defs: dict):
+    if isinstance(node, dict):
+        if "$ref" in node:
+            return _inline_refs(defs[node["$ref"].rsplit("/", 1)[-1]], defs)
+        return {k: _inline_refs(v, defs) for k, v in node.items()}
+    if isinstance(node, list):
+        return [_inline_refs(v, defs) for v in node]
+    return node
+
+def request_body_schema(model) -> dict:
+    """openapi_extra for an endpoint that parses its body by hand.
+
+    The model's nested definitions are inlined, since pydantic's "#/$defs/..."
+    references do not resolve inside the OpenAPI document.
+    """
+    schema = model.model_json_schema()
+    schema = _inline_refs(schema, schema.pop("$defs", {}))
+    return {"requestBody": {"content": {"application/json": {"schema": schema}}, "required": True}}
+
+def parse_agent_profile(raw: bytes) -> Tuple[AgentProfile, list]:
+    """Decode the analyze-agent body; returns (profile, current_roadmap).
+
+    The body is parsed once with orjson. Only the small profile fields go
+    through AgentProfile; the current_roadmap tree is checked to be a list of
+    objects and returned as parsed, because it is only serialized back into the
+    prompt and never read field by field. Errors are raised the same way
+    FastAPI reports body validation errors.
+    """
+    try:
+        body = loads(raw)
+    except ValueError as e:
+        raise RequestValidationError([{"type": "json_invalid", "loc": ("body",), "msg": "JSON decode error",
+                                       "input": {}, "ctx": {"error": str(e)}}])
+    if not isinstance(body, dict):
+        raise RequestValidationError([{"type": "model_attributes_type", "loc": ("body",),
+                                       "msg": "Input should be a valid dictionary or object", "input": body}])
+
+    current_roadmap = body.pop("current_roadmap", None) or []
+    if not isinstance(current_roadmap, list) or not all(isinstance(m, dict) for m in current_roadmap):
+        raise RequestValidationError([{"type": "list_type", "loc": ("body", "current_roadmap"),
+                                       "msg": "Input should be a list of milestone objects",
+                                       "input": current_roadmap}])
+    try:
+        profile = AgentProfile.model_validate(body)
+    except ValidationError as e:
+        errors = [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)]
+        raise RequestValidationError(errors)
+    return profile, current_roadmap
+
+# --- OUTPUT VALIDATION ---
+OUTPUT_VALIDATION_STATS = OutputValidationStats()
+
+MILESTONE_SCHEMA_HINT = (
+    '{"milestoneId": str, "operation": "create|update|delete|none", "title": str, "desc": str, '
+    '"quests": [{"questId": str, "operation": "create|update|delete|none", "title": str, "desc": str, '
+    '"difficulty": "EASY|MEDIUM|HARD|EPIC", "tasks": [{"taskId": str, "operation": "create|update|delete|none", '
+    '"title": str, "desc": str}]}]}'
+)
+RESPONSE_SCHEMA_HINT = '{"message": str, "milestones": [' + MILESTONE_SCHEMA_HINT + ']}'
+
+async def _reprompt_fragment(fragment: str, error: str, schema_hint: str) -> Optional[str]:
+    """Ask the model to fix a single invalid fragment instead of regenerating everything."""
+    prompt = (
+        f"The following JSON does not match the schema {schema_hint}.\n"
+        f"Validation error: {error}\n"
+        f"JSON: {fragment}\n"
+        "Return only the corrected JSON, keeping the same content."
+    )
+
+    def _call_groq():
+        return groq_client.chat.completions.create(
+            model="meta-llama/llama-4-scout-17b-16e-instruct",
+            messages=[{"role": "user", "content": prompt}],
+            response_format={"type": "json_object"},
+            max_completion_tokens=1500,
+        )
+
+    try:
+        completion = await MODEL_BREAKER.call(_call_groq)
+        return str(completion.choices[0].message.content)
+    except Exception as e:
+        print(f"Re-prompt failed: {e}")
+        return None
+
+async def validate_roadmap_output(text: str) -> Optional[dict]:
+    """Validate the model answer against the roadmap schema.
+
+    Common faults (truncation, trailing commas, enum casing, missing temporary
+    ids) are repaired locally. Only milestones that still fail are sent back to
+    the model, one fragment at a time. Returns None if nothing usable is left.
+    """
+    data, repaired = parse_json_with_repair(text)
+    reprompted = False
+    if not isinstance(data, dict):
+        fixed = await _reprompt_fragment(text, "response is not a valid JSON object", RESPONSE_SCHEMA_HINT)
+        data = parse_json_with_repair(fixed)[0] if fixed else None
+        if not isinstance(data, dict):
+            OUTPUT_VALIDATION_STATS.failed += 1
+            return None
+        reprompted = True
+
+    message = data.get("message")
+    if not isinstance(message, str):
+        message = "" if message is None else str(message)
+        repaired = True
+
+    milestones = data.get("milestones") or []
+    if isinstance(milestones, dict):
+        milestones = [milestones]
+        repaired = True
+
+    valid_milestones = []
+    for idx, raw in enumerate(milestones if isinstance(milestones, list) else []):
+        original = dumps_str(raw)
+        try:
+            milestone = RoadmapMilestone.model_validate(assign_missing_ids(raw, idx))
+            # Compare as dicts: key order and ignored extra keys are not repairs
+            if milestone.model_dump(exclude_unset=True) != known_fields(loads(original), RoadmapMilestone):
+                repaired = True
+        except ValidationError as e:
+            fixed = await _reprompt_fragment(original, str(e), MILESTONE_SCHEMA_HINT)
+            try:
+                milestone = RoadmapMilestone.model_validate(assign_missing_ids(loads(repair_json(fixed or "")), idx))
+                reprompted = True
+            except (ValueError, ValidationError):
+                print(f"Dropping invalid milestone #{idx + 1}: {e}")
+                continue
+        valid_milestones.append(milestone.model_dump())
+
+    if reprompted:
+        OUTPUT_VALIDATION_STATS.reprompted += 1
+    elif repaired:
+        OUTPUT_VALIDATION_STATS.repaired += 1
+    else:
+        OUTPUT_VALIDATION_STATS.valid += 1
+    return {"message": message, "milestones": valid_milestones}
 
 # --- 5. MATCHING LOGIC REMOVED ---
 # User requested removal of candidate matching functionality.
 # Only global dataset stats and insights are used now.
 
+def remember_turn(username: str, user_query: str, response_text: str):
+    """Store the user message and the coach's reply (message only, not the roadmap JSON)."""
+    try:
+        reply = loads(response_text).get("message", "")
+    except (ValueError, AttributeError):
+        reply = ""
+    try:
+        CONVERSATION_MEMORY.append(username, "user", user_query)
+        CONVERSATION_MEMORY.append(username, "assistant", reply)
+    except sqlite3.Error as e:
+        print(f"Conversation memory write failed: {e}")
+
 # --- 6. AI FEEDBACK GENERATION ---
-async def generate_feedback_stream(agent: dict, relevant_matches: list):
+# Opt-in capture of hashed request fingerprints for cache sizing
+# (replay with ai-provement-tool/cache_simulator.py)
+TRAFFIC_CAPTURE = capture_from_env("ai-chat-companion")
+
+# Near-duplicate requests within a profile cohort reuse an earlier roadmap
+# (benchmark thresholds with bench_semantic_cache.py). Set to 0 to disable.
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.8"))
+SEMANTIC_CACHE = SemanticCache(threshold=SEMANTIC_CACHE_THRESHOLD) if SEMANTIC_CACHE_THRESHOLD > 0 else None
+
+# Per-user conversation memory in users.db, capped at a fixed token budget
+CONVERSATION_MEMORY = ConversationMemory(
+    os.environ.get("CONVERSATION_DB_PATH", os.path.join(os.path.dirname(__file__), "users.db")),
+    token_budget=int(os.environ.get("CONVERSATION_TOKEN_BUDGET", "1200")),
+)
+# A request within this long of the user's last turn continues that conversation, so it
+# skips the semantic cache and the templates; after a break it may use them again
+CONVERSATION_ACTIVE_SECONDS = float(os.environ.get("CONVERSATION_ACTIVE_SECONDS", "1800"))
+
+def in_conversation(username: str) -> bool:
+    last = CONVERSATION_MEMORY.last_turn_at(username)
+    return last is not None and time.time() - last < CONVERSATION_ACTIVE_SECONDS
+
+# Common goals (fitness, reading, learning, social, ...) start from a precomputed
+# template; the model only personalizes the message and titles. Set to 0 to disable.
+ROADMAP_TEMPLATES_ENABLED = os.environ.get("ROADMAP_TEMPLATES", "1") != "0"
+PERSONALIZATION_MAX_TOKENS = 600
+TEMPLATE_STATS = {"matched": 0, "personalized": 0, "rejected": 0}
+
+async def _personalize_template(roadmap: dict, agent_profile_only: dict, user_query: str):
+    """Short model call that rewrites only the message and titles of a template roadmap.
+
+    Returns (fits, personalized roadmap or None). fits is False when the model says the
+    template does not answer the request; without a usable answer the template stands.
+    """
+    outline = "\n".join(f"{node_id}: {title}" for node_id, title in title_outline(roadmap))
+    prompt = f"""
+    You are an AI coach for the 'Hivemind' system. A ready-made roadmap was picked for the user's request.
+
+    USER'S CURRENT REQUEST/MESSAGE:
+    "{user_query}"
+
+    AGENT PROFILE:
+    {dumps_str(agent_profile_only)}
+
+    ROADMAP TITLES (id: title):
+    {outline}
+
+    TASK:
+    1. Decide whether this roadmap is about what the user is asking for. If it is not (for example a
+       fitness roadmap for a question about running a business), return only {{"fits": false}}.
+    2. Write a short "message" (Markdown, under 120 words) that answers the request for this user.
+    3. Rewrite the titles so they fit this user's goal and situation. Keep them short, keep the same
+       meaning and level, and do not add or remove items.
+
+    Return a SINGLE valid JSON object: {{"fits": true, "message": "String", "titles": {{"<id>": "String"}}}}
+    """
+
+    def _call_groq():
+        return groq_client.chat.completions.create(
+            model="meta-llama/llama-4-scout-17b-16e-instruct",
+            messages=[{"role": "user", "content": prompt}],
+            response_format={"type": "json_object"},
+            max_completion_tokens=PERSONALIZATION_MAX_TOKENS,
+        )
+
     if not groq_client:
-        yield format_sse(json.dumps({"error": "AI model unavailable"}))
-        yield format_sse("[DONE]")
-        return
+        return True, None
+    try:
+        completion = await MODEL_BREAKER.call(_call_groq)
+        data, _ = parse_json_with_repair(str(completion.choices[0].message.content))
+    except Exception as e:
+        print(f"Template personalization failed: {e}")
+        return True, None
+    if not isinstance(data, dict):
+        return True, None
+    if data.get("fits") is False:
+        return False, None
+    return True, apply_personalization(roadmap, data.get("message"), data.get("titles"))
+
+# Served when there is no model or the breaker refuses the call. Fallback answers
+# are not cached or remembered, so the next request tries the model again.
+FALLBACK_STATS = {"served": 0}
+
+def fallback_frames(agent: dict, dataset: LoadedWave, capture_key, started: float, reset: bool = False) -> list:
+    FALLBACK_STATS["served"] += 1
+    text = dumps_str(build_fallback_roadmap(agent, dataset.index))
+    if TRAFFIC_CAPTURE:
+        TRAFFIC_CAPTURE.record("/api/analyze-agent", capture_key, len(text), (time.time() - started) * 1000,
+                               cacheable=False)
+    return [*sse_chunks(text, chunk_size=200, reset=reset), SSE_DONE]
+
+async def generate_feedback_stream(agent: dict, relevant_matches: list, dataset: LoadedWave = EMPTY_WAVE):
+    # The whole profile is what an exact-match cache would key on
+    capture_key = dict(agent) if TRAFFIC_CAPTURE else None
+    started = time.time()
 
     # Calculate age from dateOfBirth if age is missing
     if agent.get('age') is None and agent.get('dateOfBirth'):
@@ -357,18 +729,91 @@ async def generate_feedback_stream(agent: dict, relevant_matches: list):
     if user_query:
         query_context = f"\nUSER'S CURRENT REQUEST/MESSAGE:\n\"{user_query}\"\n(Please prioritize answering this specific request in your message.)\n"
 
+    username = agent.get('username')
+    conversation_history = CONVERSATION_MEMORY.render(username) if user_query else ""
+    conversation_context = ""
+    if conversation_history:
+        conversation_context = f"\nCONVERSATION SO FAR (for context; answer the current request):\n{conversation_history}\n"
+
+    # Only fresh roadmaps are cached: with an existing roadmap the answer is a diff against it,
+    # and in an ongoing conversation it depends on what the user just said. Older history
+    # does not block a cache hit or a template, but a model answer that saw it is not shared.
+    ongoing = bool(conversation_history) and in_conversation(username)
+    fresh_request = bool(user_query) and not current_roadmap and not ongoing
+    semantic_cohort = None
+    if SEMANTIC_CACHE and fresh_request:
+        # Answers depend on the wave's stats, so each wave version caches separately
+        semantic_cohort = f"{(dataset.sha256 or '')[:12]}|{cohort_key(agent)}"
+        cached = SEMANTIC_CACHE.lookup(semantic_cohort, user_query)
+        if cached:
+            entry, similarity = cached
+            print(f"Semantic cache hit (similarity {similarity:.2f})")
+            text = adapt_response(entry, agent.get('username'))
+            if TRAFFIC_CAPTURE:
+                TRAFFIC_CAPTURE.record("/api/analyze-agent", capture_key, len(text), cached=True)
+            remember_turn(username, user_query, text)
+            for frame in sse_chunks(text, chunk_size=200):
+                yield frame
+                await asyncio.sleep(0)
+            yield SSE_DONE
+            return
+
+    # True once a template was streamed and then rejected; the next answer replaces it
+    replace_streamed = False
+    archetype = None
+    if ROADMAP_TEMPLATES_ENABLED and fresh_request:
+        archetype = match_archetype(user_query)
+    if archetype:
+        print(f"Roadmap template match: {archetype}")
+        TEMPLATE_STATS["matched"] += 1
+        roadmap = build_roadmap(archetype, agent)
+        text = dumps_str(roadmap)
+        # Stream the ready-made tree right away; the personalized version replaces it
+        for frame in sse_chunks(text, chunk_size=200):
+            yield frame
+            await asyncio.sleep(0)
+
+        fits, personalized = await _personalize_template(roadmap, agent_profile_only, user_query)
+        if fits:
+            if personalized is not None:
+                TEMPLATE_STATS["personalized"] += 1
+                text = dumps_str(personalized)
+                for frame in sse_chunks(text, chunk_size=200, reset=True):
+                    yield frame
+                    await asyncio.sleep(0)
+
+            shareable = shareable_response(text) if semantic_cohort else None
+            if shareable:
+                SEMANTIC_CACHE.store(semantic_cohort, user_query, shareable, username)
+            remember_turn(username, user_query, text)
+            if TRAFFIC_CAPTURE:
+                TRAFFIC_CAPTURE.record("/api/analyze-agent", capture_key, len(text), (time.time() - started) * 1000)
+            yield SSE_DONE
+            return
+
+        # The model says the template misses the point: generate the full answer instead
+        print(f"Roadmap template {archetype} rejected for this request")
+        TEMPLATE_STATS["rejected"] += 1
+        replace_streamed = True
+
+    if not groq_client:
+        for frame in fallback_frames(agent, dataset, capture_key, started, reset=replace_streamed):
+            yield frame
+        return
+
     prompt = f"""
     You are an AI Analyst for the 'Hivemind' system.
 
     GLOBAL DATASET STATS (EasyShare Data):
-    {DATASET_STATS}
+    {dataset.stats}
+    {conversation_context}
     {query_context}
 
     AGENT PROFILE:
-    {json.dumps(agent_profile_only)}
+    {dumps_str(agent_profile_only)}
 
     CURRENT ROADMAP (Existing Milestones/Quests/Tasks):
-    {json.dumps(current_roadmap)}
+    {dumps_str(current_roadmap)}
 
       TASK:
       1. Analyze the profile and roadmap against the dataset stats.
@@ -428,7 +873,13 @@ async def generate_feedback_stream(agent: dict, relevant_matches: list):
                 max_completion_tokens=5000,
             )
 
-        completion = await asyncio.to_thread(_call_groq)
+        try:
+            completion = await MODEL_BREAKER.call(_call_groq)
+        except ModelUnavailable as e:
+            print(f"Model unavailable, serving the local fallback: {e}")
+            for frame in fallback_frames(agent, dataset, capture_key, started, reset=replace_streamed):
+                yield frame
+            return
         # Extract content text (content can be list of parts or raw string)
         text = None
         try:
@@ -443,33 +894,59 @@ async def generate_feedback_stream(agent: dict, relevant_matches: list):
             text = str(completion)
 
         if not text:
-            yield format_sse(json.dumps({"error": "Empty AI response"}))
-            yield format_sse("[DONE]")
+            yield sse_event({"error": "Empty AI response"})
+            yield SSE_DONE
+            return
+
+        validated = await validate_roadmap_output(text)
+        if validated is None:
+            # Never forward output that is not a roadmap
+            print(f"Unusable AI response: {text[:200]}")
+            if TRAFFIC_CAPTURE:
+                TRAFFIC_CAPTURE.record("/api/analyze-agent", capture_key, 0, (time.time() - started) * 1000,
+                                       cacheable=False)
+            yield sse_event({"error": "AI response could not be read as a roadmap. Please try again."})
+            yield SSE_DONE
             return
 
+        text = dumps_str(validated)
+        # Only the milestone tree is shared; the message is personal to this user
+        shareable = shareable_response(text) if semantic_cohort and not conversation_history else None
+        if shareable:
+            SEMANTIC_CACHE.store(semantic_cohort, user_query, shareable, username)
+        if user_query:
+            remember_turn(username, user_query, text)
+
+        if TRAFFIC_CAPTURE:
+            TRAFFIC_CAPTURE.record("/api/analyze-agent", capture_key, len(text), (time.time() - started) * 1000)
+
         # Chunk the response into manageable pieces for SSE framed streaming
-        chunk_size = 200
-        for i in range(0, len(text), chunk_size):
-            chunk = text[i:i+chunk_size]
-            yield format_sse(json.dumps({"chunk": chunk}))
+        for frame in sse_chunks(text, chunk_size=200, reset=replace_streamed):
+            yield frame
             await asyncio.sleep(0)
 
-        yield format_sse("[DONE]")
+        yield SSE_DONE
         
     except Exception as e:
         print(f"AI Error: {e}")
-        yield format_sse(json.dumps({"error": str(e)}))
-        yield format_sse("[DONE]")
+        if TRAFFIC_CAPTURE:
+            TRAFFIC_CAPTURE.record("/api/analyze-agent", capture_key, 0, (time.time() - started) * 1000, cacheable=False)
+        yield sse_event({"error": str(e)})
+        yield SSE_DONE
 
 
-@app.post("/api/analyze-agent")
-async def analyze_agent(payload: AgentProfile):
-    agent_data = payload.dict()
+# The body is parsed by parse_agent_profile; openapi_extra keeps it in the docs
+@app.post("/api/analyze-agent", openapi_extra=request_body_schema(AgentProfile))
+async def analyze_agent(request: Request):
+    payload, current_roadmap = parse_agent_profile(await request.body())
+    dataset = await get_wave(payload.wave)
+    agent_data = payload.model_dump(exclude={"wave", "current_roadmap"})
+    agent_data["current_roadmap"] = current_roadmap
     # Candidate matching removed per user request
     relevant_context = []
     
     return StreamingResponse(
-        generate_feedback_stream(agent_data, relevant_context),
+        generate_feedback_stream(agent_data, relevant_context, dataset),
         media_type="text/event-stream"
     )
 
@@ -485,45 +962,232 @@ async def milestones_stream(payload: MilestoneRequest):
     async def gen():
         try:
             for m in milestones:
-                yield format_sse(json.dumps({"milestone": m}))
+                yield sse_event({"milestone": m})
                 await asyncio.sleep(0)
             bit_vector = "".join(str(m["achieved"]) for m in milestones)
-            yield format_sse(json.dumps({"bit_vector": bit_vector}))
-            yield format_sse("[DONE]")
+            yield sse_event({"bit_vector": bit_vector})
+            yield SSE_DONE
         except Exception as e:
-            yield format_sse(json.dumps({"error": str(e)}))
-            yield format_sse("[DONE]")
+            yield sse_event({"error": str(e)})
+            yield SSE_DONE
 
     return StreamingResponse(gen(), media_type="text/event-stream")
 
+@app.post("/api/dataset/query")
+async def dataset_query(query: DatasetQuery):
+    """Ad-hoc slice of the dataset served from the bitmap indexes.
+
+    Filters on different columns are ANDed, list values within a column are ORed.
+    """
+    dataset = await get_wave(query.wave)
+    started = time.perf_counter()
+    try:
+        result = dataset.index.query(query.filters, query.aggregates)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"Unknown column: {e.args[0]}. See /api/dataset/schema.")
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return result
+
+@app.get("/api/dataset/schema")
+async def dataset_schema(wave: Optional[str] = None):
+    return (await get_wave(wave)).index.schema()
+
+@app.get("/api/datasets")
+async def list_datasets():
+    """Registered waves and versions, and which of them are loaded in this worker."""
+    await refresh_shared_dataset()
+    return DATASET_REGISTRY.describe()
+
+# Stored conversations are personal: reading or clearing them is an admin operation,
+# disabled unless CONVERSATION_ADMIN_TOKEN is set and sent as X-Admin-Token
+CONVERSATION_ADMIN_TOKEN = os.environ.get("CONVERSATION_ADMIN_TOKEN") or None
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    if not CONVERSATION_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode("utf-8"),
+                                                    CONVERSATION_ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/api/conversation/{username}", dependencies=[Depends(require_admin_token)])
+async def get_conversation(username: str):
+    """Current rolling summary and verbatim recent turns for a user."""
+    return CONVERSATION_MEMORY.get(username)
+
+@app.delete("/api/conversation/{username}", dependencies=[Depends(require_admin_token)])
+async def clear_conversation(username: str):
+    CONVERSATION_MEMORY.clear(username)
+    return {"message": f"Conversation memory cleared for {username}"}
+
 @app.get("/health")
 async def health():
-    return {"status": "ok", "model_ready": bool(groq_client)}
+    await refresh_shared_dataset()
+    return {
+        "status": "ok",
+        "model_ready": bool(groq_client),
+        "dataset_generation": SHARED_DATASET.generation if SHARED_DATASET else None,
+        "datasets_loaded": DATASET_REGISTRY.describe()["loaded"],
+        "output_validation": OUTPUT_VALIDATION_STATS.as_dict(),
+        "semantic_cache": SEMANTIC_CACHE.stats() if SEMANTIC_CACHE else None,
+        "roadmap_templates": TEMPLATE_STATS if ROADMAP_TEMPLATES_ENABLED else None,
+        "model_breaker": MODEL_BREAKER.stats(),
+        "fallback": FALLBACK_STATS,
+    }
+
+# --- Dataset uploads ---
+# Small files can still be posted in one request; upload_dataset.py uses the
+# chunked endpoints, which survive dropped connections and resume where they
+# stopped. Either way an upload identical to the loaded dataset is a no-op.
+UPLOAD_SESSIONS = UploadSessions(
+    os.environ.get("DATASET_UPLOAD_DIR", os.path.join(os.path.dirname(__file__), "uploads"))
+)
+
+class UploadInit(BaseModel):
+    filename: str
+    size: int
+    sha256: str
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+    wave: Optional[str] = None  # wave name; the upload becomes its new current version
+
+def upload_wave_name(wave: Optional[str]) -> str:
+    """Validate an upload's target wave. Raises ValueError."""
+    name, version = parse_wave(wave)
+    if version is not None:
+        raise ValueError("Uploads add a new version; pass the wave name without @version")
+    return name
+
+def unchanged_upload_response(filename: str, key: str) -> dict:
+    loaded = DATASET_REGISTRY.peek(key)
+    return {
+        "message": f"{filename} is identical to the current version of {key}; nothing to reload.",
+        "unchanged": True,
+        "wave": key,
+        "sha256": DATASET_REGISTRY.current_sha256(key),
+        "stats": loaded.stats if loaded else None,
+    }
+
+def _install_version(src_path: str, sha256: str, filename: str, wave: str) -> Tuple[str, LoadedWave]:
+    key = DATASET_REGISTRY.add_version(wave, src_path, sha256, filename)
+    # Load right away so the new version is ready for the next request
+    loaded = DATASET_REGISTRY.load(key)
+    if SHARED_DATASET and wave == DEFAULT_WAVE:
+        # Replace the shared copy and drop this worker's private one;
+        # the other workers notice the new generation on their next request.
+        with _SHARED_DATASET_LOCK:
+            publish(loaded.df, loaded.stats, SHARED_DATASET_DIR, loaded.sha256)
+            SHARED_DATASET.attach()
+            attach_shared_dataset()
+    return key, loaded
+
+async def install_dataset(src_path: str, sha256: str, filename: str, wave: str) -> dict:
+    """Register an uploaded file as the new current version of wave and load it."""
+    # Copying, loading and publishing take seconds; other requests keep being served
+    key, loaded = await asyncio.to_thread(_install_version, src_path, sha256, filename, wave)
+    return {
+        "message": f"File uploaded successfully: {filename}",
+        "unchanged": False,
+        "wave": key,
+        "sha256": loaded.sha256,
+        "stats": loaded.stats,
+    }
+
+def _upload_tmp_path() -> str:
+    """A fresh temp file name in the datasets directory, unique across requests and workers."""
+    os.makedirs(DATASET_REGISTRY.datasets_dir, exist_ok=True)
+    return os.path.join(DATASET_REGISTRY.datasets_dir, f".upload-{uuid.uuid4().hex}")
+
+def _save_upload(source, path: str) -> str:
+    """Copy an uploaded file to path; returns its sha256."""
+    digest = hashlib.sha256()
+    with open(path, "wb") as file_object:
+        for block in iter(lambda: source.read(1024 * 1024), b""):
+            digest.update(block)
+            file_object.write(block)
+    return digest.hexdigest()
 
 @app.post("/api/upload-dataset")
-async def upload_dataset(file: UploadFile = File(...)):
+async def upload_dataset(file: UploadFile = File(...), wave: Optional[str] = Form(None)):
     try:
-        base_dir = os.path.dirname(__file__)
-        file_location = ""
-        
-        if file.filename.endswith('.sav'):
-            file_location = os.path.join(base_dir, 'easyshare_data.sav')
-        else:
+        if not file.filename.endswith('.sav'):
             return {"error": "Invalid file format. Please upload .sav"}
-            
-        with open(file_location, "wb+") as file_object:
-            shutil.copyfileobj(file.file, file_object)
-            
-        # Reload the dataset to apply changes immediately
-        load_dataset()
-        
-        return {
-            "message": f"File uploaded successfully: {file.filename}", 
-            "stats": DATASET_STATS
-        }
+        wave = upload_wave_name(wave)
+
+        await refresh_shared_dataset()
+        tmp_location = _upload_tmp_path()
+        try:
+            sha256 = await asyncio.to_thread(_save_upload, file.file, tmp_location)
+            if sha256 == DATASET_REGISTRY.current_sha256(wave):
+                return unchanged_upload_response(file.filename, DATASET_REGISTRY.resolve(wave))
+            return await install_dataset(tmp_location, sha256, file.filename, wave)
+        finally:
+            if os.path.exists(tmp_location):
+                os.remove(tmp_location)
     except Exception as e:
         return {"error": str(e)}
 
+@app.post("/api/upload-dataset/init")
+async def upload_dataset_init(payload: UploadInit):
+    """Start or resume a chunked upload. Lists the chunks the server already has."""
+    if not payload.filename.endswith('.sav'):
+        raise HTTPException(status_code=400, detail="Invalid file format. Please upload .sav")
+    try:
+        wave = upload_wave_name(payload.wave)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await refresh_shared_dataset()
+    if payload.sha256.lower() == DATASET_REGISTRY.current_sha256(wave):
+        return unchanged_upload_response(payload.filename, DATASET_REGISTRY.resolve(wave))
+    try:
+        status = UPLOAD_SESSIONS.init(payload.filename, payload.size, payload.sha256, payload.chunk_size, wave)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return {**status, "unchanged": False}
+
+@app.get("/api/upload-dataset/{upload_id}")
+async def upload_dataset_status(upload_id: str):
+    try:
+        return UPLOAD_SESSIONS.status(upload_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+@app.put("/api/upload-dataset/{upload_id}/chunks/{index}")
+async def upload_dataset_chunk(upload_id: str, index: int, request: Request):
+    """Store one raw chunk. An optional X-Chunk-Sha256 header is verified."""
+    data = await request.body()
+    try:
+        await asyncio.to_thread(UPLOAD_SESSIONS.put_chunk, upload_id, index, data,
+                                request.headers.get("x-chunk-sha256"))
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return {"upload_id": upload_id, "index": index, "bytes": len(data)}
+
+@app.post("/api/upload-dataset/{upload_id}/complete")
+async def upload_dataset_complete(upload_id: str):
+    """Assemble the chunks, verify the whole-file sha256 and reload if it changed."""
+    await refresh_shared_dataset()
+    try:
+        status = UPLOAD_SESSIONS.status(upload_id)
+    except UploadError as e:
+        # A retried complete whose first attempt already installed the file
+        key = DATASET_REGISTRY.find_current(upload_id) if e.status_code == 404 else None
+        if key:
+            return unchanged_upload_response("Upload", key)
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    wave = status["wave"] or DEFAULT_WAVE
+    if upload_id == DATASET_REGISTRY.current_sha256(wave):
+        UPLOAD_SESSIONS.discard(upload_id)
+        return unchanged_upload_response(status["filename"], DATASET_REGISTRY.resolve(wave))
+    tmp_location = _upload_tmp_path()
+    try:
+        await asyncio.to_thread(UPLOAD_SESSIONS.assemble, upload_id, tmp_location)
+        return await install_dataset(tmp_location, upload_id, status["filename"], wave)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    finally:
+        if os.path.exists(tmp_location):
+            os.remove(tmp_location)
+
 # Run with: uvicorn aiBackend.app:app --reload
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,128 @@
+import random
+import sys
+import time
+
+from semantic_cache import SemanticCache, content_words, embed, same_subject
+
+# Usage: python bench_semantic_cache.py [rounds]
+# Replays paraphrased goal requests through the semantic cache at several
+# thresholds and reports hit rate, how many hits were correct (same goal as the
+# cached request) and lookup latency. Each goal includes one confuser that
+# borrows words from another goal ("learn to read music"). The confuser pairs
+# below are different goals on the same topic; none of them may hit.
+
+ROUNDS = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+THRESHOLDS = [0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95]
+
+PARAPHRASES = {
+    "fitness": [
+        "help me get fit", "I want to exercise more", "how do I start working out",
+        "I need to get in shape", "make me a workout plan", "I want to start running",
+        "help me get fitter", "i wanna exercise more often", "I want to walk more to relax",
+    ],
+    "reading": [
+        "I want to read more books", "help me build a reading habit", "how can I read more",
+        "I'd like to finish more novels", "reading plan please", "i want to read more",
+        "I want to read more about running",
+    ],
+    "sleep": [
+        "I can't sleep well", "help me fix my sleep schedule", "I want better sleep",
+        "how do I stop being tired all the time", "improve my bedtime routine", "help me sleep better",
+        "I'm too stressed at work to sleep",
+    ],
+    "social": [
+        "I feel lonely", "help me make new friends", "I want to meet more people",
+        "how can I be more social", "I want to join a community", "help me make friends",
+        "I want to make friends at the gym",
+    ],
+    "career": [
+        "help me find a job", "I want a promotion at work", "prepare me for job interviews",
+        "how do I improve my resume", "I want to change my career", "help me get a job",
+        "help me get a job as a fitness coach",
+    ],
+    "learning": [
+        "I want to learn Spanish", "help me learn a new skill", "I want to study programming",
+        "make me a plan to learn guitar", "how do I master a language", "i want to learn a skill",
+        "I want to learn to read music",
+    ],
+}
+
+CONFUSER_PAIRS = [
+    ("I want to learn Japanese", "I want to learn Python"),
+    ("help me get a job", "I want to quit my job"),
+    ("I want to get a job", "I want to quit my job"),
+    ("I want to start running", "I want to stop running"),
+    ("help me save money", "help me invest money"),
+    ("I want to read more books", "I want to write more books"),
+]
+
+# Requests come from a handful of cohorts; the cache only matches within one
+COHORTS = ["60s|austria|expert", "20s|germany|novice", "30s|digital nomad|novice"]
+
+
+def build_stream(rounds: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    stream = []
+    for _ in range(rounds):
+        for goal, texts in PARAPHRASES.items():
+            for text in texts:
+                stream.append((rng.choice(COHORTS), goal, text))
+    rng.shuffle(stream)
+    return stream
+
+
+def replay(stream: list, threshold: float) -> dict:
+    cache = SemanticCache(threshold=threshold)
+    correct = wrong = 0
+    latencies = []
+    for cohort, goal, text in stream:
+        start = time.perf_counter()
+        hit = cache.lookup(cohort, text, now=0)
+        latencies.append(time.perf_counter() - start)
+        if hit is None:
+            cache.store(cohort, text, goal, "bench", now=0)
+        elif hit[0]["response"] == goal:
+            correct += 1
+        else:
+            wrong += 1
+    total = len(stream)
+    latencies.sort()
+    return {
+        "threshold": threshold,
+        "hit_rate": (correct + wrong) / total,
+        "precision": correct / (correct + wrong) if correct + wrong else 1.0,
+        "wrong_hits": wrong,
+        "p50_us": latencies[len(latencies) // 2] * 1e6,
+        "p99_us": latencies[int(len(latencies) * 0.99)] * 1e6,
+    }
+
+
+def confuser_hits(threshold: float) -> int:
+    hits = 0
+    for cached, query in CONFUSER_PAIRS:
+        cache = SemanticCache(threshold=threshold)
+        cache.store("cohort", cached, cached, "bench", now=0)
+        hits += cache.lookup("cohort", query, now=0) is not None
+    return hits
+
+
+if __name__ == "__main__":
+    stream = build_stream(ROUNDS)
+    start = time.perf_counter()
+    for _, _, text in stream:
+        embed(text)
+    embed_us = (time.perf_counter() - start) / len(stream) * 1e6
+
+    print(f"{len(stream)} requests, {len(PARAPHRASES)} goals, {len(COHORTS)} cohorts; embed {embed_us:.0f} us/query\n")
+    print(f"{'threshold':>9} {'hit rate':>9} {'precision':>10} {'wrong hits':>11} {'confusers':>10} "
+          f"{'p50 us':>8} {'p99 us':>8}")
+    for threshold in THRESHOLDS:
+        r = replay(stream, threshold)
+        print(f"{r['threshold']:>9.2f} {r['hit_rate']:>8.1%} {r['precision']:>9.1%} {r['wrong_hits']:>11} "
+              f"{confuser_hits(threshold):>4}/{len(CONFUSER_PAIRS):<5} {r['p50_us']:>8.0f} {r['p99_us']:>8.0f}")
+
+    print("\nconfuser pairs (score, same content words):")
+    for cached, query in CONFUSER_PAIRS:
+        score = float(embed(cached) @ embed(query))
+        print(f"  {score:.2f} {str(same_subject(content_words(cached), content_words(query))):>5}  "
+              f"{cached!r} / {query!r}")
@@ -0,0 +1,109 @@
+import json
+import sys
+import time
+
+from app import AgentProfile, parse_agent_profile
+from serialization import SSE_DONE, dumps_str, sse_chunks, sse_event
+
+# Usage: python bench_serialization.py [milestones] [iterations]
+# Compares the per-request encode/validate cost of the legacy path
+# (json.loads -> AgentProfile(**) -> .dict() -> json.dumps + str SSE frames)
+# with the fast path (orjson decode -> profile-only validation with the roadmap
+# passed through -> orjson -> pre-encoded byte frames).
+
+MILESTONES = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+ITERATIONS = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+
+def build_payload(milestones: int) -> bytes:
+    roadmap = [
+        {
+            "milestoneId": f"m-{m}",
+            "title": f"Milestone {m}",
+            "desc": "Improve consistency over four weeks. " * 3,
+            "quests": [
+                {
+                    "questId": f"q-{m}-{q}",
+                    "title": f"Quest {q}",
+                    "desc": "Small repeatable steps.",
+                    "tasks": [
+                        {"taskId": f"t-{m}-{q}-{t}", "title": f"Task {t}", "desc": ""}
+                        for t in range(5)
+                    ],
+                }
+                for q in range(5)
+            ],
+        }
+        for m in range(milestones)
+    ]
+    payload = {
+        "username": "BenchUser",
+        "dateOfBirth": "1990-05-01",
+        "interests": "running, reading, cooking",
+        "location": "Digital Nomad",
+        "bio": "I want to improve my life.",
+        "user_input": "Help me build a running habit",
+        "wants": '["Get fit", "Sleep better"]',
+        "current_roadmap": roadmap,
+    }
+    return json.dumps(payload).encode("utf-8")
+
+
+# A typical model answer is a few KB of JSON streamed in 200-char chunks.
+RESPONSE_TEXT = json.dumps({
+    "message": "Here is your plan. " * 40,
+    "milestones": [{"milestoneId": f"new-m-{i}", "operation": "create", "title": "Run", "desc": "x" * 200, "quests": []} for i in range(10)],
+})
+
+
+def legacy_format_sse(data: str) -> str:
+    return f"data: {data}\n\n"
+
+
+def legacy_request(raw: bytes) -> int:
+    agent = AgentProfile(**json.loads(raw)).model_dump()  # .dict() in app.py before this change
+    roadmap = agent.get("current_roadmap", [])
+    profile = {k: v for k, v in agent.items() if k != "current_roadmap"}
+    prompt = json.dumps(profile) + json.dumps(roadmap)
+    frames = [legacy_format_sse(json.dumps({"chunk": RESPONSE_TEXT[i:i + 200]}))
+              for i in range(0, len(RESPONSE_TEXT), 200)]
+    frames.append(legacy_format_sse("[DONE]"))
+    # Starlette encodes str chunks to bytes before writing them
+    return len(prompt) + sum(len(f.encode("utf-8")) for f in frames)
+
+
+def fast_request(raw: bytes) -> int:
+    agent, roadmap = parse_agent_profile(raw)
+    profile = agent.model_dump(exclude={"current_roadmap"})
+    prompt = dumps_str(profile) + dumps_str(roadmap)
+    frames = sse_chunks(RESPONSE_TEXT, chunk_size=200)
+    frames.append(SSE_DONE)
+    return len(prompt) + sum(len(f) for f in frames)
+
+
+def timeit(fn, raw: bytes) -> float:
+    fn(raw)  # warm up
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        fn(raw)
+    return (time.perf_counter() - start) / ITERATIONS * 1e6
+
+
+def timeit_frames(fn) -> float:
+    start = time.perf_counter()
+    for _ in range(ITERATIONS * 10):
+        fn({"milestone": {"code": "M1", "title": "Initial Analysis Generated", "achieved": 1}})
+    return (time.perf_counter() - start) / (ITERATIONS * 10) * 1e6
+
+
+if __name__ == "__main__":
+    raw = build_payload(MILESTONES)
+    print(f"Payload: {len(raw) / 1024:.1f} KB, {MILESTONES} milestones, {ITERATIONS} iterations")
+
+    legacy_us = timeit(legacy_request, raw)
+    fast_us = timeit(fast_request, raw)
+    print(f"Per request   legacy: {legacy_us:8.1f} us   fast: {fast_us:8.1f} us   speedup: {legacy_us / fast_us:.2f}x")
+
+    legacy_frame = timeit_frames(lambda obj: legacy_format_sse(json.dumps(obj)).encode("utf-8"))
+    fast_frame = timeit_frames(sse_event)
+    print(f"Per SSE frame legacy: {legacy_frame:8.2f} us   fast: {fast_frame:8.2f} us   speedup: {legacy_frame / fast_frame:.2f}x")
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from typing import List, Optional
+
+# Resumable, checksummed dataset uploads.
+#
+# The client announces the file (name, size, sha256, chunk size) and gets back
+# an upload id derived from the hash, so re-running an interrupted upload finds
+# the same session and only sends the chunks the server does not have yet.
+# Chunks are stored as separate files under <upload_dir>/<upload_id>/ and
+# assembled (and hashed) only when the client calls complete.
+#
+#   <upload_dir>/<upload_id>/meta.json
+#   <upload_dir>/<upload_id>/chunk-000000
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+SESSION_TTL_SECONDS = 24 * 3600
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+_HASH_BLOCK = 1024 * 1024
+
+
+class UploadError(Exception):
+    """Raised for invalid upload requests; status_code maps to the HTTP response."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class UploadSessions:
+    def __init__(self, upload_dir: str):
+        self.upload_dir = upload_dir
+
+    def _session_dir(self, upload_id: str) -> str:
+        if not _SHA256_RE.match(upload_id):
+            raise UploadError(f"Unknown upload: {upload_id}", status_code=404)
+        return os.path.join(self.upload_dir, upload_id)
+
+    def _load_meta(self, upload_id: str) -> dict:
+        path = os.path.join(self._session_dir(upload_id), "meta.json")
+        if not os.path.exists(path):
+            raise UploadError(f"Unknown upload: {upload_id}", status_code=404)
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _received(self, session_dir: str) -> List[int]:
+        return sorted(int(name[6:]) for name in os.listdir(session_dir) if name.startswith("chunk-"))
+
+    def status(self, upload_id: str) -> dict:
+        meta = self._load_meta(upload_id)
+        received = self._received(self._session_dir(upload_id))
+        return {
+            "upload_id": upload_id,
+            "filename": meta["filename"],
+            "size": meta["size"],
+            "chunk_size": meta["chunk_size"],
+            "total_chunks": meta["total_chunks"],
+            "wave": meta.get("wave"),
+            "received": received,
+            "missing": sorted(set(range(meta["total_chunks"])) - set(received)),
+        }
+
+    def init(self, filename: str, size: int, sha256: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+             wave: Optional[str] = None) -> dict:
+        """Create (or resume) the session for a file. Returns its status.
+
+        wave is only recorded so complete knows where the file goes.
+        """
+        sha256 = sha256.lower()
+        if not _SHA256_RE.match(sha256):
+            raise UploadError("sha256 must be 64 hex characters")
+        if size <= 0:
+            raise UploadError("size must be positive")
+        if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+            raise UploadError(f"chunk_size must be between 1 and {MAX_CHUNK_SIZE}")
+
+        self.expire()
+        session_dir = self._session_dir(sha256)
+        meta_path = os.path.join(session_dir, "meta.json")
+        if os.path.exists(meta_path):
+            meta = self._load_meta(sha256)
+            if meta["size"] == size and meta["chunk_size"] == chunk_size:
+                if meta.get("wave") != wave:
+                    meta["wave"] = wave
+                    with open(meta_path, "w", encoding="utf-8") as f:
+                        json.dump(meta, f)
+                return self.status(sha256)
+            # Same content announced with a different chunking: start over
+            shutil.rmtree(session_dir, ignore_errors=True)
+
+        os.makedirs(session_dir, exist_ok=True)
+        meta = {
+            "filename": filename,
+            "size": size,
+            "sha256": sha256,
+            "chunk_size": chunk_size,
+            "total_chunks": -(-size // chunk_size),
+            "wave": wave,
+            "created_at": time.time(),
+        }
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        return self.status(sha256)
+
+    def put_chunk(self, upload_id: str, index: int, data: bytes, chunk_sha256: Optional[str] = None):
+        meta = self._load_meta(upload_id)
+        if not 0 <= index < meta["total_chunks"]:
+            raise UploadError(f"Chunk index {index} out of range (0-{meta['total_chunks'] - 1})")
+        last = index == meta["total_chunks"] - 1
+        expected = meta["size"] - index * meta["chunk_size"] if last else meta["chunk_size"]
+        if len(data) != expected:
+            raise UploadError(f"Chunk {index} has {len(data)} bytes, expected {expected}")
+        if chunk_sha256 and hashlib.sha256(data).hexdigest() != chunk_sha256.lower():
+            raise UploadError(f"Chunk {index} checksum mismatch")
+
+        session_dir = self._session_dir(upload_id)
+        # Write then rename, so a connection dropped mid-chunk never looks received
+        tmp_path = os.path.join(session_dir, f"tmp-{index:06d}.{uuid.uuid4().hex}")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, os.path.join(session_dir, f"chunk-{index:06d}"))
+
+    def assemble(self, upload_id: str, dest_path: str) -> str:
+        """Concatenate all chunks into dest_path after verifying the whole-file hash.
+
+        dest_path is only replaced if the checksum matches. Returns the sha256.
+        """
+        meta = self._load_meta(upload_id)
+        session_dir = self._session_dir(upload_id)
+        missing = sorted(set(range(meta["total_chunks"])) - set(self._received(session_dir)))
+        if missing:
+            raise UploadError(f"Upload incomplete, missing chunks: {missing[:20]}", status_code=409)
+
+        digest = hashlib.sha256()
+        # Unique per call: two uploads assembling at once never share a temp file
+        tmp_path = f"{dest_path}.upload-{uuid.uuid4().hex}"
+        try:
+            with open(tmp_path, "wb") as out:
+                for index in range(meta["total_chunks"]):
+                    with open(os.path.join(session_dir, f"chunk-{index:06d}"), "rb") as f:
+                        data = f.read()
+                    digest.update(data)
+                    out.write(data)
+            if digest.hexdigest() != meta["sha256"]:
+                # Drop the session so a retry re-sends everything
+                self.discard(upload_id)
+                raise UploadError("Checksum mismatch after assembly; upload discarded", status_code=422)
+            os.replace(tmp_path, dest_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.discard(upload_id)
+        return meta["sha256"]
+
+    def discard(self, upload_id: str):
+        shutil.rmtree(self._session_dir(upload_id), ignore_errors=True)
+
+    def expire(self, now: Optional[float] = None):
+        """Remove sessions abandoned for longer than SESSION_TTL_SECONDS."""
+        if not os.path.isdir(self.upload_dir):
+            return
+        now = time.time() if now is None else now
+        for name in os.listdir(self.upload_dir):
+            session_dir = os.path.join(self.upload_dir, name)
+            if os.path.isdir(session_dir) and now - os.path.getmtime(session_dir) > SESSION_TTL_SECONDS:
+                shutil.rmtree(session_dir, ignore_errors=True)
+
+
+__all__ = ["UploadSessions", "UploadError", "file_sha256", "DEFAULT_CHUNK_SIZE"]
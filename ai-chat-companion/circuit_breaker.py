@@ -0,0 +1,135 @@
+import asyncio
+import os
+import time
+
+# Latency-budget circuit breaker around the model calls.
+#
+# Every call gets MODEL_LATENCY_BUDGET_SECONDS; slower calls, connection
+# errors, 5xx and rate limits count as failures. Other 4xx errors are about the
+# request itself (e.g. an unreachable image URL) and are re-raised unchanged.
+# After MODEL_BREAKER_FAILURES consecutive failures the circuit opens and calls
+# are refused immediately (the caller answers with its local fallback) for
+# MODEL_BREAKER_COOLDOWN_SECONDS. Then a single probe call is let through:
+# success closes the circuit, failure opens it again. Calls that started
+# before the circuit opened and finish later do not decide anything; only the
+# probe does.
+#
+# A timed-out call keeps running in its worker thread (the Groq SDK is
+# synchronous and cannot be cancelled); only the caller stops waiting for it.
+#
+# Kept identical in ai-chat-companion and ai-provement-tool; change both copies
+# (ai-chat-companion/test/test_shared_copies.py fails when they differ).
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ModelUnavailable(Exception):
+    """The model call was refused, timed out or failed; use the local fallback."""
+
+
+def is_outage(error: Exception) -> bool:
+    """True for errors that say the model service is down or overloaded."""
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status >= 500 or status in (408, 429)
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    # The Groq SDK's APIConnectionError / APITimeoutError carry no status code
+    return any(cls.__name__ in ("APIConnectionError", "APITimeoutError") for cls in type(error).__mro__)
+
+
+class CircuitBreaker:
+    def __init__(self, latency_budget: float, failure_threshold: int = 3, cooldown: float = 30.0):
+        self.latency_budget = latency_budget
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self.counts = {"calls": 0, "timeouts": 0, "errors": 0, "client_errors": 0,
+                       "short_circuited": 0, "opened": 0}
+
+    def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self, probe: bool = False):
+        if not probe and self.state != CLOSED:
+            return  # a call from before the circuit opened; the probe decides
+        self.failures = 0
+        self.state = CLOSED
+
+    def record_failure(self, probe: bool = False):
+        if not probe and self.state != CLOSED:
+            return
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.counts["opened"] += 1
+                print(f"Model circuit opened after {self.failures} failure(s); "
+                      f"using local fallback for {self.cooldown:.0f}s")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def retry_after(self) -> float:
+        """Seconds until the open circuit lets a probe through; 0 otherwise."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    async def call(self, func, *args, **kwargs):
+        """Run a blocking model call in a thread within the latency budget.
+
+        Raises ModelUnavailable if the circuit is open, the budget is exceeded
+        or the service fails; client errors are re-raised as they are.
+        """
+        if not self.allow():
+            self.counts["short_circuited"] += 1
+            raise ModelUnavailable("model circuit open")
+        # Outside CLOSED, allow() only admits the probe
+        probe = self.state != CLOSED
+        self.counts["calls"] += 1
+        try:
+            result = await asyncio.wait_for(asyncio.to_thread(func, *args, **kwargs), timeout=self.latency_budget)
+        except asyncio.TimeoutError:
+            self.counts["timeouts"] += 1
+            self.record_failure(probe)
+            raise ModelUnavailable(f"model call exceeded the {self.latency_budget:g}s latency budget")
+        except Exception as e:
+            if not is_outage(e):
+                self.counts["client_errors"] += 1
+                raise
+            self.counts["errors"] += 1
+            self.record_failure(probe)
+            raise ModelUnavailable(f"model call failed: {e}") from e
+        finally:
+            # Also when the probe is cancelled mid-call (client disconnect,
+            # shutdown), so the half-open circuit does not wait for it forever
+            if probe:
+                self._probe_in_flight = False
+        self.record_success(probe)
+        return result
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures,
+                "latency_budget_s": self.latency_budget, **self.counts}
+
+
+def breaker_from_env(default_budget: float) -> CircuitBreaker:
+    return CircuitBreaker(
+        latency_budget=float(os.environ.get("MODEL_LATENCY_BUDGET_SECONDS", default_budget)),
+        failure_threshold=int(os.environ.get("MODEL_BREAKER_FAILURES", "3")),
+        cooldown=float(os.environ.get("MODEL_BREAKER_COOLDOWN_SECONDS", "30")),
+    )
+
+
+__all__ = ["CircuitBreaker", "ModelUnavailable", "breaker_from_env", "is_outage"]
@@ -0,0 +1,165 @@
+import re
+import sqlite3
+import time
+from typing import List, Optional
+
+# Server-side conversation memory with a fixed token budget.
+#
+# Turns are stored per username in users.db. Recent turns are kept verbatim
+# until they exceed the budget; older ones are folded into a rolling summary
+# (first sentence of each turn, oldest lines dropped first), so the history
+# block added to the prompt stays the same size however long the chat runs.
+# Summarization is extractive and local, so compaction never costs a model call.
+
+CHARS_PER_TOKEN = 4
+MAX_SUMMARY_LINE_CHARS = 160
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _first_sentence(text: str) -> str:
+    text = " ".join(text.split())
+    sentence = _SENTENCE_END_RE.split(text, maxsplit=1)[0]
+    if len(sentence) > MAX_SUMMARY_LINE_CHARS:
+        sentence = sentence[:MAX_SUMMARY_LINE_CHARS - 3].rstrip() + "..."
+    return sentence
+
+
+class ConversationMemory:
+    def __init__(self, db_path: str, token_budget: int = 1200, summary_budget: Optional[int] = None):
+        self.db_path = db_path
+        self.token_budget = token_budget
+        # A quarter of the budget for the summary, the rest for verbatim turns
+        self.summary_budget = summary_budget if summary_budget is not None else token_budget // 4
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def recent_budget(self) -> int:
+        return self.token_budget - self.summary_budget
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False, timeout=10)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS conversation_turns (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    tokens INTEGER NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_conversation_turns_user ON conversation_turns (username, id)"
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS conversation_summaries (
+                    username TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL,
+                    tokens INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+        return self._conn
+
+    def get(self, username: str) -> dict:
+        row = self.conn.execute(
+            "SELECT summary FROM conversation_summaries WHERE username = ?", (username,)
+        ).fetchone()
+        turns = self.conn.execute(
+            "SELECT role, content FROM conversation_turns WHERE username = ? ORDER BY id", (username,)
+        ).fetchall()
+        return {
+            "summary": row[0] if row else "",
+            "turns": [{"role": role, "content": content} for role, content in turns],
+        }
+
+    def last_turn_at(self, username: str) -> Optional[float]:
+        """Time of the user's latest stored turn; None if there is none."""
+        row = self.conn.execute(
+            "SELECT MAX(created_at) FROM conversation_turns WHERE username = ?", (username,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def render(self, username: str) -> str:
+        """History block for the prompt; empty string if there is none."""
+        memory = self.get(username)
+        parts = []
+        if memory["summary"]:
+            parts.append(f"Summary of earlier conversation:\n{memory['summary']}")
+        if memory["turns"]:
+            lines = [f"{'User' if t['role'] == 'user' else 'Coach'}: {t['content']}" for t in memory["turns"]]
+            parts.append("Recent turns:\n" + "\n".join(lines))
+        return "\n".join(parts)
+
+    def append(self, username: str, role: str, content: str):
+        content = content.strip()
+        if not content:
+            return
+        # A single oversized turn is cut so it alone can't blow the budget
+        max_chars = self.recent_budget * CHARS_PER_TOKEN
+        if len(content) > max_chars:
+            content = content[:max_chars - 3].rstrip() + "..."
+        self.conn.execute(
+            "INSERT INTO conversation_turns (username, role, content, tokens, created_at) VALUES (?, ?, ?, ?, ?)",
+            (username, role, content, estimate_tokens(content), time.time()),
+        )
+        self.compact(username)
+
+    def compact(self, username: str):
+        """Fold the oldest turns into the summary until the recent ones fit the budget."""
+        rows = self.conn.execute(
+            "SELECT id, role, content, tokens FROM conversation_turns WHERE username = ? ORDER BY id DESC",
+            (username,),
+        ).fetchall()
+        kept_tokens = 0
+        overflow: List[tuple] = []
+        for row in rows:
+            if overflow or kept_tokens + row[3] > self.recent_budget:
+                overflow.append(row)
+            else:
+                kept_tokens += row[3]
+        if not overflow:
+            return
+
+        overflow.reverse()  # oldest first
+        summary_row = self.conn.execute(
+            "SELECT summary FROM conversation_summaries WHERE username = ?", (username,)
+        ).fetchone()
+        lines = summary_row[0].split("\n") if summary_row and summary_row[0] else []
+        for _, role, content, _ in overflow:
+            lines.append(f"- {'User' if role == 'user' else 'Coach'}: {_first_sentence(content)}")
+        while len(lines) > 1 and estimate_tokens("\n".join(lines)) > self.summary_budget:
+            lines.pop(0)
+        summary = "\n".join(lines)
+
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO conversation_summaries (username, summary, tokens, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(username) DO UPDATE SET summary = excluded.summary, tokens = excluded.tokens, "
+                "updated_at = excluded.updated_at",
+                (username, summary, estimate_tokens(summary), time.time()),
+            )
+            conn.executemany("DELETE FROM conversation_turns WHERE id = ?", [(row[0],) for row in overflow])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def clear(self, username: str):
+        self.conn.execute("DELETE FROM conversation_turns WHERE username = ?", (username,))
+        self.conn.execute("DELETE FROM conversation_summaries WHERE username = ?", (username,))
+
+
+__all__ = ["ConversationMemory", "estimate_tokens"]
@@ -0,0 +1,159 @@
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+# Bitmap indexes over the EasyShare dataset for ad-hoc slicing.
+#
+# At load time every categorical column is turned into one packed bitmap per
+# value (1 bit per row). A query ANDs the bitmaps of its filters (values of the
+# same column are ORed) and runs NumPy aggregates over pre-extracted float
+# arrays, so no DataFrame is scanned per request.
+
+FilterValue = Union[str, int, float]
+
+# Column name in the query API -> candidate dataset columns (first match wins)
+CATEGORICAL_COLUMNS = {
+    "sphus_l": ["sphus_l"],
+    "br015_l": ["br015_l"],
+    "ep005_l": ["ep005_l"],
+    "mar_stat_l": ["mar_stat_l"],
+    "female": ["female"],
+    "ever_smoked": ["ever_smoked"],
+    "country": ["country", "location", "birth_country"],
+}
+NUMERIC_COLUMNS = {
+    "age": ["age"],
+    "bmi": ["bmi"],
+    "casp": ["casp_num", "casp"],
+}
+# Same bins as the "Age Bins" line of DATASET_STATS
+AGE_BINS = [0, 30, 40, 50, 60, 70, 80, 120]
+AGE_LABELS = ["<30", "30-39", "40-49", "50-59", "60-69", "70-79", "80+"]
+
+if hasattr(np, "bitwise_count"):
+    def _popcount(bits: np.ndarray) -> int:
+        return int(np.bitwise_count(bits).sum())
+else:
+    _POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(bits: np.ndarray) -> int:
+        return int(_POPCOUNT_TABLE[bits].sum())
+
+
+def _value_key(value) -> str:
+    """Normalize filter values so 1, 1.0 and "1" select the same bitmap."""
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    if isinstance(value, (int, np.integer)) and not isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, str):
+        stripped = value.strip()
+        try:
+            number = float(stripped)
+            if number.is_integer():
+                return str(int(number))
+        except ValueError:
+            pass
+        return stripped
+    return str(value)
+
+
+def _numeric(series: pd.Series) -> np.ndarray:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(str)
+    return pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+
+class BitmapIndex:
+    def __init__(self, df: Optional[pd.DataFrame]):
+        df = df if df is not None else pd.DataFrame()
+        self.rows = len(df)
+        self.universe = np.packbits(np.ones(self.rows, dtype=bool))
+        self.bitmaps: Dict[str, Dict[str, np.ndarray]] = {}
+        self.values: Dict[str, np.ndarray] = {}
+        if df.empty:
+            return
+
+        for name, candidates in CATEGORICAL_COLUMNS.items():
+            col = next((c for c in candidates if c in df.columns), None)
+            if col is not None:
+                self._index_categorical(name, df[col])
+
+        for name, candidates in NUMERIC_COLUMNS.items():
+            col = next((c for c in candidates if c in df.columns), None)
+            if col is not None:
+                self.values[name] = _numeric(df[col])
+
+        if "age" in self.values:
+            binned = pd.cut(self.values["age"], bins=AGE_BINS, labels=AGE_LABELS, right=False)
+            self._index_categorical("age_bin", pd.Series(binned))
+
+    def _index_categorical(self, name: str, series: pd.Series):
+        cat = pd.Categorical(series)
+        codes = np.asarray(cat.codes)
+        self.bitmaps[name] = {
+            _value_key(value): np.packbits(codes == i) for i, value in enumerate(cat.categories)
+        }
+
+    @property
+    def nbytes(self) -> int:
+        bitmaps = sum(bits.nbytes for column in self.bitmaps.values() for bits in column.values())
+        return bitmaps + sum(values.nbytes for values in self.values.values())
+
+    def schema(self) -> dict:
+        return {
+            "rows": self.rows,
+            "filters": {name: sorted(bitmaps) for name, bitmaps in self.bitmaps.items()},
+            "aggregates": sorted(self.values),
+        }
+
+    def _filter_bitmap(self, column: str, values: Union[FilterValue, List[FilterValue]]) -> np.ndarray:
+        if column not in self.bitmaps:
+            raise KeyError(column)
+        column_bitmaps = self.bitmaps[column]
+        if not isinstance(values, list):
+            values = [values]
+        combined = np.zeros_like(self.universe)
+        for value in values:
+            bits = column_bitmaps.get(_value_key(value))
+            if bits is not None:
+                np.bitwise_or(combined, bits, out=combined)
+        return combined
+
+    def query(self, filters: Dict[str, Union[FilterValue, List[FilterValue]]],
+              aggregates: List[str]) -> dict:
+        """Count rows matching all filters and aggregate numeric columns over them.
+
+        Raises KeyError for unknown filter or aggregate columns.
+        """
+        for name in aggregates:
+            if name not in self.values:
+                raise KeyError(name)
+
+        mask = self.universe.copy()
+        for column, values in filters.items():
+            np.bitwise_and(mask, self._filter_bitmap(column, values), out=mask)
+
+        count = _popcount(mask)
+        result = {"count": count, "share": count / self.rows if self.rows else 0.0, "aggregates": {}}
+        if not aggregates:
+            return result
+
+        selected = np.unpackbits(mask, count=self.rows).view(bool)
+        for name in aggregates:
+            values = self.values[name][selected]
+            values = values[~np.isnan(values)]
+            if values.size:
+                result["aggregates"][name] = {
+                    "count": int(values.size),
+                    "mean": float(values.mean()),
+                    "min": float(values.min()),
+                    "max": float(values.max()),
+                }
+            else:
+                result["aggregates"][name] = {"count": 0, "mean": None, "min": None, "max": None}
+        return result
+
+
+__all__ = ["BitmapIndex", "AGE_BINS", "AGE_LABELS"]
@@ -0,0 +1,312 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+try:
+    from .chunked_upload import file_sha256
+    from .dataset_index import BitmapIndex
+except ImportError:
+    from chunked_upload import file_sha256
+    from dataset_index import BitmapIndex
+
+# Registry of EasyShare waves kept side by side.
+#
+#   <datasets_dir>/registry.json
+#   <datasets_dir>/<wave>/v<version>-<sha256[:12]>.sav
+#
+# Each wave keeps its last MAX_VERSIONS_PER_WAVE uploads. Requests name a wave
+# ("w8"), optionally with a version ("w8@2"); without one they get the current
+# version of DEFAULT_WAVE. Waves are loaded on first use and the least recently
+# used ones are evicted once loaded waves exceed the memory budget.
+#
+# registry.json is rewritten atomically and re-read (at most once per
+# CHECK_INTERVAL_SECONDS) when another worker changed it. Constructing a
+# registry only reads it; adopting an older single-file deployment hashes the
+# file and writes registry.json, so that is a separate step (adopt_legacy) run
+# at startup.
+
+REGISTRY_FILE = "registry.json"
+DEFAULT_WAVE = "default"
+MAX_VERSIONS_PER_WAVE = 3
+CHECK_INTERVAL_SECONDS = 1.0
+_WAVE_RE = re.compile(r"^[A-Za-z0-9_-]{1,32}$")
+
+
+class LoadedWave:
+    """A wave in memory: prepared DataFrame, prompt stats and bitmap indexes."""
+
+    def __init__(self, df: pd.DataFrame, stats: str, index: BitmapIndex, sha256: Optional[str]):
+        self.df = df
+        self.stats = stats
+        self.index = index
+        self.sha256 = sha256
+        self.nbytes = int(df.memory_usage(deep=True).sum()) + index.nbytes
+
+
+EMPTY_WAVE = LoadedWave(pd.DataFrame(), "Dataset not loaded.", BitmapIndex(None), None)
+
+
+def parse_wave(wave: Optional[str]):
+    """Split "w8@2" into ("w8", 2). Raises ValueError for malformed names."""
+    name, _, version = (wave or DEFAULT_WAVE).partition("@")
+    if not _WAVE_RE.match(name):
+        raise ValueError(f"Invalid wave name: {name!r} (letters, digits, '-' and '_' only)")
+    if version and not version.isdigit():
+        raise ValueError(f"Invalid wave version: {version!r}")
+    return name, int(version) if version else None
+
+
+class DatasetRegistry:
+    def __init__(self, datasets_dir: str, loader: Callable[[str, Optional[str]], LoadedWave],
+                 memory_budget_bytes: int, legacy_path: Optional[str] = None):
+        """loader(path, sha256) reads and prepares one .sav file."""
+        self.datasets_dir = datasets_dir
+        self.loader = loader
+        self.memory_budget_bytes = memory_budget_bytes
+        self.legacy_path = legacy_path
+        self.loaded: "OrderedDict[str, LoadedWave]" = OrderedDict()  # key -> wave, LRU order
+        self.pinned = set()  # keys backed by the shared-memory copy; never evicted
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._mtime = None
+        self._last_check = 0.0
+        self.registry = self._read()
+
+    def adopt_legacy(self) -> bool:
+        """Register legacy_path (the single easyshare_data.sav of older deployments) as the
+        default wave if nothing is registered yet. Blocking; returns True if it did."""
+        path = self.legacy_path
+        if not path or not os.path.exists(path):
+            return False
+        with self._lock:
+            self.registry = self._read()
+            if self.registry["waves"]:
+                return False
+            self._add_entry(DEFAULT_WAVE, os.path.abspath(path), file_sha256(path), os.path.basename(path))
+            self._write()
+        return True
+
+    # --- registry.json ---
+    @property
+    def registry_path(self) -> str:
+        return os.path.join(self.datasets_dir, REGISTRY_FILE)
+
+    def _read(self) -> dict:
+        try:
+            self._mtime = os.stat(self.registry_path).st_mtime_ns
+            with open(self.registry_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"waves": {}}
+
+    def _write(self):
+        os.makedirs(self.datasets_dir, exist_ok=True)
+        tmp_path = f"{self.registry_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.registry, f, indent=2)
+        os.replace(tmp_path, self.registry_path)
+        self._mtime = os.stat(self.registry_path).st_mtime_ns
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._last_check < CHECK_INTERVAL_SECONDS:
+            return
+        self._last_check = now
+        try:
+            mtime = os.stat(self.registry_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime:
+            self.registry = self._read()
+
+    def reload(self):
+        """Re-read registry.json now, e.g. when another worker announced an upload."""
+        with self._lock:
+            self.registry = self._read()
+            self._last_check = time.monotonic()
+
+    def _next_version(self, wave: str) -> int:
+        entry = self.registry["waves"].get(wave, {"versions": []})
+        return max([v["version"] for v in entry["versions"]], default=0) + 1
+
+    def _add_entry(self, wave: str, path: str, sha256: str, filename: str) -> int:
+        version = self._next_version(wave)
+        entry = self.registry["waves"].setdefault(wave, {"current": 0, "versions": []})
+        entry["versions"].append({
+            "version": version,
+            "file": os.path.relpath(path, self.datasets_dir),
+            "sha256": sha256,
+            "filename": filename,
+            "added_at": round(time.time(), 3),
+        })
+        entry["current"] = version
+        return version
+
+    # --- lookup ---
+    def resolve(self, wave: Optional[str]) -> Optional[str]:
+        """Key ("wave@version") for a request's wave; None if nothing is registered yet.
+
+        Raises ValueError for malformed names and KeyError for unknown waves or versions.
+        """
+        name, version = parse_wave(wave)
+        self._maybe_reload()
+        entry = self.registry["waves"].get(name)
+        if entry is None:
+            if wave is None:
+                return None
+            raise KeyError(name)
+        version = version or entry["current"]
+        if not any(v["version"] == version for v in entry["versions"]):
+            raise KeyError(f"{name}@{version}")
+        return f"{name}@{version}"
+
+    def _version(self, key: str) -> Optional[dict]:
+        """Registry entry for key; None if it is gone (pruned by another worker's upload)."""
+        name, version = parse_wave(key)
+        for attempt in range(2):
+            entry = self.registry["waves"].get(name, {"versions": []})
+            found = next((v for v in entry["versions"] if v["version"] == version), None)
+            if found is not None or attempt:
+                return found
+            # Our copy of registry.json may be older than the other worker's change
+            self.reload()
+
+    def current_sha256(self, wave: str) -> Optional[str]:
+        """sha256 of the current version of wave, None if the wave does not exist."""
+        try:
+            version = self._version(self.resolve(wave))
+        except KeyError:
+            return None
+        return version["sha256"] if version else None
+
+    def find_current(self, sha256: str) -> Optional[str]:
+        """Key of a wave whose current version has this sha256."""
+        self._maybe_reload()
+        for name, entry in self.registry["waves"].items():
+            key = f"{name}@{entry['current']}"
+            version = self._version(key)
+            if version and version["sha256"] == sha256:
+                return key
+        return None
+
+    def key_for_sha256(self, wave: str, sha256: Optional[str]) -> Optional[str]:
+        self._maybe_reload()
+        entry = self.registry["waves"].get(wave, {"versions": []})
+        for v in entry["versions"]:
+            if sha256 and v["sha256"] == sha256:
+                return f"{wave}@{v['version']}"
+        return None
+
+    def peek(self, key: str) -> Optional[LoadedWave]:
+        """The loaded wave for key (marking it recently used), without loading it."""
+        with self._lock:
+            loaded = self.loaded.get(key)
+            if loaded is not None:
+                self.loaded.move_to_end(key)
+            return loaded
+
+    def load(self, key: str) -> LoadedWave:
+        """Return the wave for key, reading it from disk if needed. Blocking.
+
+        Raises KeyError if the version was pruned in the meantime.
+        """
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        # Concurrent first requests for the same wave wait for a single load
+        with load_lock:
+            loaded = self.peek(key)
+            if loaded is not None:
+                return loaded
+            version = self._version(key)
+            path = os.path.normpath(os.path.join(self.datasets_dir, version["file"])) if version else None
+            if path and not os.path.exists(path):
+                # Listed in our copy of registry.json, but another worker pruned it since
+                self.reload()
+                version = self._version(key)
+            if version is None:
+                raise KeyError(key)
+            started = time.perf_counter()
+            loaded = self.loader(path, version["sha256"])
+            print(f"Loaded dataset wave {key} in {time.perf_counter() - started:.1f}s "
+                  f"({loaded.nbytes / 1024 / 1024:.1f} MB)")
+            self.install(key, loaded)
+            return loaded
+
+    def install(self, key: str, loaded: LoadedWave, pinned: bool = False):
+        with self._lock:
+            self.loaded[key] = loaded
+            self.loaded.move_to_end(key)
+            if pinned:
+                self.pinned.add(key)
+            else:
+                self.pinned.discard(key)
+            self._evict(keep=key)
+
+    def _evict(self, keep: str):
+        def used() -> int:
+            return sum(w.nbytes for k, w in self.loaded.items() if k not in self.pinned)
+
+        for key in list(self.loaded):
+            if used() <= self.memory_budget_bytes:
+                break
+            if key != keep and key not in self.pinned:
+                del self.loaded[key]
+                print(f"Evicted dataset wave {key} (memory budget {self.memory_budget_bytes / 1024 / 1024:.0f} MB)")
+
+    def unload_all(self):
+        with self._lock:
+            self.loaded.clear()
+            self.pinned.clear()
+
+    # --- uploads ---
+    def add_version(self, name: str, src_path: str, sha256: str, filename: str) -> str:
+        """Move src_path into the registry as the new current version of wave name. Returns its key."""
+        with self._lock:
+            self.registry = self._read()
+            wave_dir = os.path.join(self.datasets_dir, name)
+            os.makedirs(wave_dir, exist_ok=True)
+            version = self._next_version(name)
+            dest = os.path.join(wave_dir, f"v{version}-{sha256[:12]}.sav")
+            os.replace(src_path, dest)
+            self._add_entry(name, dest, sha256, filename)
+
+            entry = self.registry["waves"][name]
+            for old in entry["versions"][:-MAX_VERSIONS_PER_WAVE]:
+                old_key = f"{name}@{old['version']}"
+                self.loaded.pop(old_key, None)
+                self.pinned.discard(old_key)
+                old_path = os.path.normpath(os.path.join(self.datasets_dir, old["file"]))
+                # Adopted legacy files live outside the registry dir; leave them alone
+                if os.path.dirname(old_path) == os.path.normpath(wave_dir) and os.path.exists(old_path):
+                    os.remove(old_path)
+            entry["versions"] = entry["versions"][-MAX_VERSIONS_PER_WAVE:]
+            self._write()
+        return f"{name}@{version}"
+
+    def describe(self) -> dict:
+        self._maybe_reload()
+        with self._lock:
+            loaded = {k: round(w.nbytes / 1024 / 1024, 1) for k, w in self.loaded.items()}
+        waves = {}
+        for name, entry in self.registry["waves"].items():
+            waves[name] = {
+                "current": entry["current"],
+                "versions": [{**v, "key": f"{name}@{v['version']}",
+                              "loaded_mb": loaded.get(f"{name}@{v['version']}")} for v in entry["versions"]],
+            }
+        return {
+            "default": DEFAULT_WAVE,
+            "memory_budget_mb": round(self.memory_budget_bytes / 1024 / 1024, 1),
+            "loaded_mb": round(sum(loaded.values()), 1),
+            "loaded": list(loaded),
+            "waves": waves,
+        }
+
+
+__all__ = ["DatasetRegistry", "LoadedWave", "EMPTY_WAVE", "DEFAULT_WAVE", "parse_wave"]
@@ -0,0 +1,137 @@
+from typing import List, Optional
+
+try:
+    from .dataset_index import AGE_BINS, AGE_LABELS, BitmapIndex
+    from .roadmap_templates import TEMPLATES, build_roadmap
+    from .semantic_cache import match_concepts
+except ImportError:
+    from dataset_index import AGE_BINS, AGE_LABELS, BitmapIndex
+    from roadmap_templates import TEMPLATES, build_roadmap
+    from semantic_cache import match_concepts
+
+# Rule-based roadmaps for when the model is unavailable (no API key, or the
+# circuit breaker is open).
+#
+# Archetypes come from the request first, then the profile's wants, problems
+# and interests, matched with the same concept keywords as the semantic cache
+# and built from the precomputed templates. A profile that names nothing usable
+# gets the archetype its age cohort needs most according to the dataset
+# indexes. Everything is local, so answers take milliseconds.
+
+MAX_FALLBACK_MILESTONES = 2
+# Concepts without a template of their own
+CONCEPT_ARCHETYPES = {"weight": "fitness"}
+# Cohort thresholds for the default archetype
+INACTIVE_SHARE_THRESHOLD = 0.3
+POOR_HEALTH_SHARE_THRESHOLD = 0.3
+
+UNAVAILABLE_NOTE = ("Our AI coach is temporarily unavailable, so this is a starter plan built from your "
+                    "profile and people like you. Ask again later for a fully personalized roadmap.")
+
+
+def _archetypes(texts: List[str]) -> List[str]:
+    found = []
+    for text in texts:
+        for concept in match_concepts(text or ""):
+            archetype = CONCEPT_ARCHETYPES.get(concept, concept)
+            if archetype in TEMPLATES and archetype not in found:
+                found.append(archetype)
+    return found
+
+
+def age_bin(age) -> Optional[str]:
+    if not isinstance(age, (int, float)):
+        return None
+    for low, high, label in zip(AGE_BINS, AGE_BINS[1:], AGE_LABELS):
+        if low <= age < high:
+            return label
+    return None
+
+
+def cohort_facts(agent: dict, index: BitmapIndex) -> Optional[dict]:
+    """Activity, health and wellbeing figures for the agent's age group; None without data."""
+    if not index.rows:
+        return None
+    band = age_bin(agent.get("age"))
+    cohort = {"age_bin": band} if band and band in index.bitmaps.get("age_bin", {}) else {}
+
+    def share(column: str, values) -> Optional[float]:
+        if column not in index.bitmaps:
+            return None
+        base = index.query(cohort, [])["count"]
+        hits = index.query({**cohort, column: values}, [])["count"]
+        return hits / base if base else None
+
+    casp = index.query(cohort, ["casp"] if "casp" in index.values else [])["aggregates"].get("casp", {})
+    return {
+        "cohort": f"people aged {band}" if cohort else "all respondents",
+        "inactive_share": share("br015_l", "Hardly ever or never"),
+        "poor_health_share": share("sphus_l", ["Fair", "Poor"]),
+        "casp_mean": casp.get("mean"),
+    }
+
+
+def default_archetype(facts: Optional[dict]) -> str:
+    if facts:
+        if (facts["inactive_share"] or 0) >= INACTIVE_SHARE_THRESHOLD:
+            return "fitness"
+        if (facts["poor_health_share"] or 0) >= POOR_HEALTH_SHARE_THRESHOLD:
+            return "sleep"
+    return "social"
+
+
+def _cohort_sentence(facts: Optional[dict]) -> str:
+    if not facts:
+        return ""
+    parts = []
+    if facts["inactive_share"] is not None:
+        parts.append(f"{facts['inactive_share']:.0%} hardly ever do vigorous activity")
+    if facts["poor_health_share"] is not None:
+        parts.append(f"{facts['poor_health_share']:.0%} rate their health fair or poor")
+    if facts["casp_mean"] is not None:
+        parts.append(f"the average quality-of-life (CASP) score is {facts['casp_mean']:.1f}")
+    if not parts:
+        return ""
+    return f"In the EasyShare data, among {facts['cohort']}, " + ", ".join(parts) + "."
+
+
+def _renumber(milestones: List[dict]) -> List[dict]:
+    """Give every node a unique temporary id once several templates are combined."""
+    q_counter = t_counter = 0
+    for m_counter, milestone in enumerate(milestones, start=1):
+        milestone["milestoneId"] = f"new-m-{m_counter}"
+        for quest in milestone["quests"]:
+            q_counter += 1
+            quest["questId"] = f"new-q-{q_counter}"
+            for task in quest["tasks"]:
+                t_counter += 1
+                task["taskId"] = f"new-t-{t_counter}"
+    return milestones
+
+
+def build_fallback_roadmap(agent: dict, index: BitmapIndex) -> dict:
+    """Roadmap JSON ({"message", "milestones"}) without a model call."""
+    facts = cohort_facts(agent, index)
+    requested = _archetypes([agent.get("user_input")])
+    if agent.get("current_roadmap"):
+        # The existing roadmap already reflects the profile; only add what is asked for now
+        archetypes = requested
+    else:
+        profile = _archetypes(list(agent.get("wants") or []) + list(agent.get("problems") or [])
+                              + list(agent.get("interests") or []))
+        archetypes = requested + [a for a in profile if a not in requested]
+        if not archetypes:
+            archetypes = [default_archetype(facts)]
+    archetypes = archetypes[:MAX_FALLBACK_MILESTONES]
+
+    roadmaps = [build_roadmap(archetype, agent) for archetype in archetypes]
+    message = " ".join(part for part in [UNAVAILABLE_NOTE, _cohort_sentence(facts)] if part)
+    if roadmaps:
+        message += "\n\n" + "\n\n".join(roadmap["message"] for roadmap in roadmaps)
+    return {
+        "message": message,
+        "milestones": _renumber([roadmap["milestones"][0] for roadmap in roadmaps]),
+    }
+
+
+__all__ = ["build_fallback_roadmap", "cohort_facts", "default_archetype"]
@@ -0,0 +1,150 @@
+import json
+import re
+from typing import Any, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+# Local repair of slightly malformed model output.
+#
+# Models in JSON mode still occasionally return fenced blocks, trailing commas
+# or output cut off at the token limit. Fixing those locally is far cheaper than
+# a retry: a new roadmap generation in the chat companion, a whole vision call
+# in the AI judge.
+#
+# Kept identical in ai-chat-companion and ai-provement-tool; change both copies
+# (ai-chat-companion/test/test_shared_copies.py fails when they differ). The
+# chat companion's roadmap schema lives in roadmap_schema.py.
+
+_FENCE_RE = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+
+
+def _drop_trailing_comma(out: list):
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+
+def repair_json(text: str) -> str:
+    """Best-effort fix of common JSON faults.
+
+    Handles markdown fences, leading/trailing prose, trailing commas,
+    unterminated strings and missing closing brackets (truncated output).
+    """
+    text = _FENCE_RE.sub("", text.strip())
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        return text
+    text = text[min(starts):]
+
+    out: list = []
+    stack: list = []
+    # (len(out), stack) at each comma: everything before it is a complete value
+    cut_points: list = []
+    in_str = False
+    escaped = False
+    for ch in text:
+        if in_str:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_str = False
+            continue
+        if ch == '"':
+            in_str = True
+            out.append(ch)
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            out.append(ch)
+        elif ch in "}]":
+            if ch not in stack:
+                continue  # stray closer
+            _drop_trailing_comma(out)
+            while stack[-1] != ch:
+                out.append(stack.pop())
+            out.append(stack.pop())
+            if not stack:
+                break  # ignore anything after the top-level value
+        elif ch == ",":
+            cut_points.append((len(out), list(stack)))
+            out.append(ch)
+        else:
+            out.append(ch)
+
+    if not stack:
+        return "".join(out)
+
+    # Truncated output: close the open string and brackets
+    if in_str:
+        if escaped:
+            out.pop()
+        out.append('"')
+    closed = out[:]
+    _drop_trailing_comma(closed)
+    candidate = "".join(closed) + "".join(reversed(stack))
+    try:
+        json.loads(candidate)
+        return candidate
+    except json.JSONDecodeError:
+        pass
+
+    # The last value was cut mid-way (e.g. a dangling key); drop it
+    if cut_points:
+        length, cut_stack = cut_points[-1]
+        return "".join(out[:length]) + "".join(reversed(cut_stack))
+    return candidate
+
+
+def parse_json_with_repair(text: str) -> Tuple[Optional[Any], bool]:
+    """Returns (parsed, repaired). parsed is None if even the repair failed."""
+    try:
+        return json.loads(text), False
+    except (json.JSONDecodeError, TypeError):
+        pass
+    try:
+        return json.loads(repair_json(text)), True
+    except json.JSONDecodeError:
+        return None, True
+
+
+def validate_with_repair(text: str, model: Type[BaseModel]) -> Tuple[Optional[BaseModel], bool, Optional[str]]:
+    """Parse and validate text against model, repairing locally if needed.
+
+    Returns (instance or None, repaired, error message).
+    """
+    data, repaired = parse_json_with_repair(text)
+    if data is None:
+        return None, repaired, "response is not valid JSON"
+    try:
+        return model.model_validate(data), repaired, None
+    except ValidationError as e:
+        return None, repaired, str(e)
+
+
+class OutputValidationStats:
+    """Counts how model outputs were handled.
+
+    saved_model_calls counts answers that would previously have been rejected
+    (forcing a full retry) but were rescued locally or by a short re-prompt.
+    """
+
+    def __init__(self):
+        self.valid = 0
+        self.repaired = 0
+        self.reprompted = 0
+        self.failed = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "valid": self.valid,
+            "repaired": self.repaired,
+            "reprompted": self.reprompted,
+            "failed": self.failed,
+            "saved_model_calls": self.repaired + self.reprompted,
+        }
+
+
+__all__ = ["repair_json", "parse_json_with_repair", "validate_with_repair", "OutputValidationStats"]
@@ -0,0 +1,219 @@
+import asyncio
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# Opt-in sampling profiler for slow requests.
+#
+# Set HIVEMIND_PROFILE_DIR to enable it. Then a request is profiled if either
+#   - it sends "X-Profile: <HIVEMIND_PROFILE_TOKEN>" (admin trigger), or
+#   - it is picked by 1-in-N sampling (HIVEMIND_PROFILE_SAMPLE_N, 0 = off).
+# While a request runs, a background thread samples the event-loop thread and
+# the worker threads (asyncio.to_thread, where the model calls run, and the
+# threadpool for sync endpoints) with sys._current_frames(). When the request
+# finishes (for SSE, after the last chunk) it writes <name>.speedscope.json
+# (open in https://speedscope.app) and <name>.collapsed.txt (flamegraph.pl /
+# speedscope), and appends endpoint, status, latency and file names to
+# profiles.jsonl.
+#
+# Samples are process-wide, so requests running concurrently with a profiled
+# one show up in its profile too. Only one profile runs at a time.
+# When HIVEMIND_PROFILE_DIR is unset no middleware is installed at all.
+#
+# Kept identical in ai-chat-companion and ai-provement-tool; change both copies
+# (ai-chat-companion/test/test_shared_copies.py fails when they differ).
+
+PROFILE_DIR_ENV = "HIVEMIND_PROFILE_DIR"
+PROFILE_TOKEN_ENV = "HIVEMIND_PROFILE_TOKEN"
+PROFILE_SAMPLE_ENV = "HIVEMIND_PROFILE_SAMPLE_N"
+PROFILE_INTERVAL_ENV = "HIVEMIND_PROFILE_INTERVAL_MS"
+PROFILE_HEADER = b"x-profile"
+
+DEFAULT_INTERVAL_MS = 2.0
+# asyncio.to_thread executor threads and the threadpool Starlette runs sync endpoints in
+WORKER_THREAD_PREFIXES = ("asyncio_", "AnyIO worker thread")
+_UNSAFE_NAME_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+Frame = Tuple[str, str, int]  # (qualified name, file, first line)
+
+
+class StackSampler(threading.Thread):
+    """Counts stacks of the loop thread and worker threads until stopped."""
+
+    def __init__(self, loop_thread_id: int, interval: float):
+        super().__init__(name="hivemind-profiler", daemon=True)
+        self.loop_thread_id = loop_thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()  # (thread name, stack root-first) -> weight in ms
+        self._stop_event = threading.Event()
+
+    def _targets(self) -> Dict[int, str]:
+        targets = {self.loop_thread_id: "event-loop"}
+        for thread in threading.enumerate():
+            if thread.name.startswith(WORKER_THREAD_PREFIXES):
+                targets[thread.ident] = thread.name
+        return targets
+
+    def run(self):
+        last = time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            now = time.perf_counter()
+            weight_ms = (now - last) * 1000
+            last = now
+            frames = sys._current_frames()
+            for ident, thread_name in self._targets().items():
+                frame = frames.get(ident)
+                stack: List[Frame] = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((getattr(code, "co_qualname", code.co_name), code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                if stack:
+                    stack.reverse()
+                    self.samples[(thread_name, tuple(stack))] += weight_ms
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def to_speedscope(samples: Counter, name: str) -> dict:
+    frames: List[dict] = []
+    frame_index: Dict[Frame, int] = {}
+    profiles: Dict[str, dict] = {}
+    for (thread_name, stack), weight in samples.items():
+        profile = profiles.setdefault(thread_name, {
+            "type": "sampled", "name": f"{name} [{thread_name}]", "unit": "milliseconds",
+            "startValue": 0, "endValue": 0, "samples": [], "weights": [],
+        })
+        indexes = []
+        for frame in stack:
+            if frame not in frame_index:
+                frame_index[frame] = len(frames)
+                frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+            indexes.append(frame_index[frame])
+        profile["samples"].append(indexes)
+        profile["weights"].append(round(weight, 3))
+        profile["endValue"] = round(profile["endValue"] + weight, 3)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "hivemind-profiler",
+        "shared": {"frames": frames},
+        "profiles": list(profiles.values()),
+    }
+
+
+def to_collapsed(samples: Counter) -> str:
+    """Brendan Gregg collapsed stacks, one line per stack, weights in whole ms."""
+    lines = []
+    for (thread_name, stack), weight in samples.items():
+        names = [thread_name] + [f"{n} ({os.path.basename(f)}:{line})" for n, f, line in stack]
+        lines.append(";".join(s.replace(";", ":") for s in names) + f" {max(1, round(weight))}")
+    return "\n".join(sorted(lines)) + "\n"
+
+
+class ProfilerMiddleware:
+    """Pure ASGI middleware; streaming responses are profiled to their last chunk."""
+
+    def __init__(self, app, service: str, output_dir: str, token: Optional[str] = None,
+                 sample_every: int = 0, interval_ms: float = DEFAULT_INTERVAL_MS):
+        self.app = app
+        self.service = service
+        self.output_dir = output_dir
+        self.token = token.encode("utf-8") if token else None
+        self.sample_every = sample_every
+        self.interval = interval_ms / 1000
+        self._busy = False
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _triggered(self, scope) -> Tuple[bool, str]:
+        if self.token:
+            for key, value in scope.get("headers", ()):
+                if key == PROFILE_HEADER and hmac.compare_digest(value, self.token):
+                    return True, "header"
+        if self.sample_every and random.random() < 1 / self.sample_every:
+            return True, "sampled"
+        return False, ""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._busy:
+            await self.app(scope, receive, send)
+            return
+        triggered, trigger = self._triggered(scope)
+        if not triggered:
+            await self.app(scope, receive, send)
+            return
+
+        self._busy = True
+        status = {"code": 0}
+        now = time.time()
+        profile_name = (f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}.{int(now * 1000) % 1000:03d}-{self.service}-"
+                        f"{_UNSAFE_NAME_RE.sub('_', scope['path']).strip('_') or 'root'}-{os.getpid()}")
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_name.encode())]
+            await send(message)
+
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            latency_ms = (time.perf_counter() - started) * 1000
+            sampler.stop()
+            self._busy = False
+            route = scope.get("route")
+            meta = {
+                "ts": round(time.time(), 3),
+                "service": self.service,
+                "method": scope.get("method"),
+                "path": scope["path"],
+                "endpoint": getattr(route, "path", scope["path"]),
+                "status": status["code"],
+                "latency_ms": round(latency_ms, 1),
+                "trigger": trigger,
+                "interval_ms": self.interval * 1000,
+            }
+            await asyncio.to_thread(self._write, profile_name, sampler.samples, meta)
+
+    def _write(self, profile_name: str, samples: Counter, meta: dict):
+        title = f"{meta['method']} {meta['endpoint']} {meta['status']} {meta['latency_ms']:.0f}ms"
+        base = os.path.join(self.output_dir, profile_name)
+        with open(base + ".speedscope.json", "w", encoding="utf-8") as f:
+            json.dump(to_speedscope(samples, title), f)
+        with open(base + ".collapsed.txt", "w", encoding="utf-8") as f:
+            f.write(to_collapsed(samples))
+        meta = {**meta, "samples": len(samples),
+                "files": [profile_name + ".speedscope.json", profile_name + ".collapsed.txt"]}
+        with open(os.path.join(self.output_dir, "profiles.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(meta) + "\n")
+
+
+def install_profiler(app, service: str) -> bool:
+    """Add ProfilerMiddleware if HIVEMIND_PROFILE_DIR is set. Returns True if installed."""
+    output_dir = os.environ.get(PROFILE_DIR_ENV)
+    if not output_dir:
+        return False
+    token = os.environ.get(PROFILE_TOKEN_ENV) or None
+    sample_every = int(os.environ.get(PROFILE_SAMPLE_ENV, "0"))
+    interval_ms = float(os.environ.get(PROFILE_INTERVAL_ENV, DEFAULT_INTERVAL_MS))
+    if not token and not sample_every:
+        print(f"{PROFILE_DIR_ENV} is set but neither {PROFILE_TOKEN_ENV} nor {PROFILE_SAMPLE_ENV}; profiler off.")
+        return False
+    app.add_middleware(ProfilerMiddleware, service=service, output_dir=output_dir, token=token,
+                       sample_every=sample_every, interval_ms=interval_ms)
+    return True
+
+
+__all__ = ["ProfilerMiddleware", "StackSampler", "install_profiler", "to_speedscope", "to_collapsed"]
@@ -0,0 +1,82 @@
+from typing import List, Literal, Type
+
+from pydantic import BaseModel, field_validator
+
+# Schema of the roadmap answer, checked by validate_roadmap_output in app.py.
+# Mirrors the JSON Schema given to the model in generate_feedback_stream.
+# "none" marks an unchanged parent of changed items (components/roadmap-proposal.tsx)
+Operation = Literal["create", "update", "delete", "none"]
+DIFFICULTY_SYNONYMS = {"NORMAL": "MEDIUM", "MODERATE": "MEDIUM", "INTERMEDIATE": "MEDIUM", "VERY HARD": "EPIC"}
+
+
+def _normalize_operation(v):
+    return v.strip().lower() if isinstance(v, str) else v
+
+
+class RoadmapTask(BaseModel):
+    taskId: str
+    operation: Operation = "create"
+    title: str = ""
+    desc: str = ""
+
+    _operation = field_validator("operation", mode="before")(_normalize_operation)
+
+
+class RoadmapQuest(BaseModel):
+    questId: str
+    operation: Operation = "create"
+    title: str = ""
+    desc: str = ""
+    difficulty: Literal["EASY", "MEDIUM", "HARD", "EPIC"] = "MEDIUM"
+    tasks: List[RoadmapTask] = []
+
+    _operation = field_validator("operation", mode="before")(_normalize_operation)
+
+    @field_validator("difficulty", mode="before")
+    @classmethod
+    def normalize_difficulty(cls, v):
+        if isinstance(v, str):
+            v = v.strip().upper()
+            return DIFFICULTY_SYNONYMS.get(v, v)
+        return v
+
+
+class RoadmapMilestone(BaseModel):
+    milestoneId: str
+    operation: Operation = "create"
+    title: str = ""
+    desc: str = ""
+    quests: List[RoadmapQuest] = []
+
+    _operation = field_validator("operation", mode="before")(_normalize_operation)
+
+
+def assign_missing_ids(milestone: dict, index: int) -> dict:
+    """Give newly created items the temporary ids the model forgot to add."""
+    if isinstance(milestone, dict):
+        milestone.setdefault("milestoneId", f"new-m-{index + 1}")
+        for q_idx, quest in enumerate(milestone.get("quests") or []):
+            if isinstance(quest, dict):
+                quest.setdefault("questId", f"new-q-{index + 1}-{q_idx + 1}")
+                for t_idx, task in enumerate(quest.get("tasks") or []):
+                    if isinstance(task, dict):
+                        task.setdefault("taskId", f"new-t-{index + 1}-{q_idx + 1}-{t_idx + 1}")
+    return milestone
+
+
+_CHILDREN = {RoadmapMilestone: ("quests", RoadmapQuest), RoadmapQuest: ("tasks", RoadmapTask)}
+
+
+def known_fields(data, model: Type[BaseModel]):
+    """data without the keys model ignores, recursively; what validation can have changed."""
+    if not isinstance(data, dict):
+        return data
+    out = {k: v for k, v in data.items() if k in model.model_fields}
+    if model in _CHILDREN:
+        key, child = _CHILDREN[model]
+        if isinstance(out.get(key), list):
+            out[key] = [known_fields(item, child) for item in out[key]]
+    return out
+
+
+__all__ = ["RoadmapTask", "RoadmapQuest", "RoadmapMilestone", "assign_missing_ids", "known_fields"]
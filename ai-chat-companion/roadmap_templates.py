@@ -0,0 +1,289 @@
+import copy
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from .semantic_cache import embed, match_concepts
+except ImportError:
+    from semantic_cache import embed, match_concepts
+
+# Precomputed roadmap templates for the common goal archetypes.
+#
+# A fresh request such as "help me get fit" matches an archetype through the
+# same concept keywords the semantic cache uses (semantic_cache.CONCEPTS) and
+# must also be close to one of the archetype's example requests, so a stray
+# keyword ("run a startup") is not enough. The matched tree is streamed
+# immediately in the normal roadmap JSON shape, and a short model call then
+# rewrites the message and the titles, or rejects the template if it still does
+# not fit. Requests that mention several archetypes ("make friends at the gym")
+# or none fall back to full generation.
+#
+# Each archetype has a "default" variant and optional variants per age band;
+# experience level shifts quest difficulty up for intermediate/expert users.
+
+DIFFICULTY_ORDER = ["EASY", "MEDIUM", "HARD", "EPIC"]
+# Minimum cosine similarity (semantic_cache.embed) to the closest example request
+MATCH_THRESHOLD = 0.6
+
+# archetype -> {"label", "message", "examples": [request, ...], "variants": {age band: milestone}}
+# milestone: (title, desc, [(quest title, desc, difficulty, [(task title, desc), ...]), ...])
+TEMPLATES: Dict[str, dict] = {
+    "fitness": {
+        "label": "fitness",
+        "message": "Here is a roadmap to build a steady exercise habit, starting small and adding intensity "
+                   "once movement is part of your week.",
+        "examples": ["help me get fit", "I want to exercise more", "start working out", "I want to get in shape",
+                     "I want to start running", "go jogging", "build a workout routine", "be more active",
+                     "get fitter and stronger"],
+        "variants": {
+            "default": ("Build a Fitness Habit", "Move regularly and build strength and stamina step by step.", [
+                ("Get Moving", "Make daily movement a routine.", "EASY", [
+                    ("Walk 20 minutes", "Take a brisk 20-minute walk today."),
+                    ("Schedule three workouts", "Block three 30-minute slots in your calendar this week."),
+                    ("Track your activity", "Log every session for one week."),
+                ]),
+                ("Build Stamina", "Raise the intensity of your sessions.", "MEDIUM", [
+                    ("Try a beginner run", "Alternate 1 minute running and 2 minutes walking for 20 minutes."),
+                    ("Complete a bodyweight circuit", "Squats, push-ups and planks: 3 rounds."),
+                    ("Stretch after every session", "Spend 5 minutes stretching after each workout."),
+                ]),
+                ("Level Up", "Turn the habit into a lasting routine.", "HARD", [
+                    ("Run 5 km without stopping", "Build up to a continuous 5 km run."),
+                    ("Join a class or club", "Sign up for a group sport or gym class."),
+                    ("Keep a 4-week streak", "Hit at least three sessions every week for a month."),
+                ]),
+            ]),
+            "60_plus": ("Stay Active and Strong", "Keep moving safely and maintain strength, balance and mobility.", [
+                ("Daily Movement", "Make gentle activity part of every day.", "EASY", [
+                    ("Walk 15 minutes", "Take a comfortable 15-minute walk today."),
+                    ("Take the stairs", "Use stairs instead of the lift where you can this week."),
+                    ("Log your steps", "Note your daily steps for one week."),
+                ]),
+                ("Strength and Balance", "Protect muscles and joints and prevent falls.", "MEDIUM", [
+                    ("Chair squats", "Do 2 sets of 8 sit-to-stand squats from a chair."),
+                    ("Balance practice", "Stand on one leg for 20 seconds per side, holding a support."),
+                    ("Gentle stretching", "Follow a 10-minute mobility routine three times this week."),
+                ]),
+                ("Active Together", "Keep the routine going with other people.", "MEDIUM", [
+                    ("Join a walking group", "Find a local walking or seniors' exercise group."),
+                    ("Try water exercise", "Attend one aqua fitness or swimming session."),
+                    ("Keep a 4-week streak", "Be active on at least five days a week for a month."),
+                ]),
+            ]),
+        },
+    },
+    "reading": {
+        "label": "reading",
+        "message": "Here is a roadmap to make reading a daily habit and work through more books.",
+        "examples": ["I want to read more books", "help me read more", "build a reading habit",
+                     "finish more books", "read every day"],
+        "variants": {
+            "default": ("Build a Reading Habit", "Read a little every day and finish more books.", [
+                ("Start Small", "Make reading part of your day.", "EASY", [
+                    ("Pick your first book", "Choose a book you are genuinely curious about."),
+                    ("Read 10 pages", "Read 10 pages before bed tonight."),
+                    ("Set a reading spot", "Set up a comfortable, phone-free place to read."),
+                ]),
+                ("Keep the Streak", "Read consistently for a few weeks.", "MEDIUM", [
+                    ("Read daily for a week", "Read at least 15 minutes every day for 7 days."),
+                    ("Finish your first book", "Reach the last page of your current book."),
+                    ("Write a short review", "Note three things you took away from it."),
+                ]),
+                ("Go Further", "Broaden what and how much you read.", "HARD", [
+                    ("Try a new genre", "Read a book from a genre you have never tried."),
+                    ("Join a book club", "Join a local or online reading group."),
+                    ("Finish four books", "Complete four books in two months."),
+                ]),
+            ]),
+        },
+    },
+    "learning": {
+        "label": "learning",
+        "message": "Here is a roadmap to learn a new skill with short, regular practice and clear checkpoints.",
+        "examples": ["I want to learn a new skill", "help me learn a language", "study more consistently",
+                     "learn to play guitar", "take an online course"],
+        "variants": {
+            "default": ("Learn a New Skill", "Go from first steps to confident practice.", [
+                ("Lay the Foundation", "Pick resources and learn the basics.", "EASY", [
+                    ("Choose a course or book", "Pick one beginner resource and stick with it."),
+                    ("Study 20 minutes", "Complete your first 20-minute study session."),
+                    ("Set a weekly schedule", "Plan four short practice sessions per week."),
+                ]),
+                ("Practice Regularly", "Build skill through repetition.", "MEDIUM", [
+                    ("Practice for two weeks", "Keep your schedule for 14 days."),
+                    ("Complete a small exercise", "Finish one practical exercise on your own."),
+                    ("Get feedback", "Ask a teacher, friend or community for feedback."),
+                ]),
+                ("Apply It", "Use the skill on something real.", "HARD", [
+                    ("Finish a mini project", "Create something small that uses the skill."),
+                    ("Teach someone", "Explain what you learned to another person."),
+                    ("Set the next goal", "Choose the next level to work towards."),
+                ]),
+            ]),
+        },
+    },
+    "social": {
+        "label": "social",
+        "message": "Here is a roadmap to meet new people and grow your social circle at a comfortable pace.",
+        "examples": ["I want to make new friends", "I feel lonely", "meet new people", "be more social",
+                     "grow my social circle"],
+        "variants": {
+            "default": ("Grow Your Social Circle", "Build new connections and keep them going.", [
+                ("Reach Out", "Reconnect and take the first steps.", "EASY", [
+                    ("Message an old friend", "Send a message to someone you have lost touch with."),
+                    ("Accept an invitation", "Say yes to the next social invitation you get."),
+                    ("Find local groups", "Look up three clubs or meetups that match your interests."),
+                ]),
+                ("Show Up", "Meet new people regularly.", "MEDIUM", [
+                    ("Attend a meetup", "Go to one group event this week."),
+                    ("Start a conversation", "Introduce yourself to someone new."),
+                    ("Go back a second time", "Return to the same group so faces become familiar."),
+                ]),
+                ("Deepen Connections", "Turn acquaintances into friends.", "HARD", [
+                    ("Invite someone", "Invite a new acquaintance for coffee or a walk."),
+                    ("Host a get-together", "Organise a small gathering."),
+                    ("Volunteer", "Join a volunteering activity in your community."),
+                ]),
+            ]),
+        },
+    },
+    "sleep": {
+        "label": "sleep",
+        "message": "Here is a roadmap to improve your sleep with a steady routine and a better evening wind-down.",
+        "examples": ["I want to sleep better", "help me fix my sleep", "I have insomnia", "I am always tired",
+                     "get a better bedtime routine"],
+        "variants": {
+            "default": ("Sleep Better", "Build a consistent routine for more restful sleep.", [
+                ("Set the Rhythm", "Keep regular sleep times.", "EASY", [
+                    ("Fix a wake-up time", "Get up at the same time every day this week."),
+                    ("Set a bedtime alarm", "Add a reminder 30 minutes before bed."),
+                    ("Log your sleep", "Note bedtime, wake time and how rested you feel."),
+                ]),
+                ("Wind Down", "Prepare body and mind for sleep.", "MEDIUM", [
+                    ("Screens off an hour before bed", "No phone or TV for the last hour of the day."),
+                    ("No caffeine after 2 pm", "Switch to caffeine-free drinks in the afternoon."),
+                    ("Evening routine", "Read, stretch or breathe slowly for 10 minutes before bed."),
+                ]),
+                ("Lock It In", "Make the new routine stick.", "MEDIUM", [
+                    ("Optimise your bedroom", "Make it dark, quiet and cool."),
+                    ("Morning daylight", "Spend 10 minutes outside every morning."),
+                    ("Keep it for 3 weeks", "Follow the routine for 21 days and compare your log."),
+                ]),
+            ]),
+        },
+    },
+    "stress": {
+        "label": "stress",
+        "message": "Here is a roadmap to manage stress with short daily calming practices.",
+        "examples": ["help me manage stress", "I feel stressed all the time", "reduce my anxiety",
+                     "I want to start meditating", "help me relax more"],
+        "variants": {
+            "default": ("Reduce Stress", "Build daily habits that keep stress manageable.", [
+                ("Pause and Breathe", "Learn quick ways to calm down.", "EASY", [
+                    ("Breathing exercise", "Do 5 minutes of slow breathing today."),
+                    ("Name your stressors", "Write down the three things that stress you most."),
+                    ("Take a short walk", "Walk outside for 10 minutes when you feel tense."),
+                ]),
+                ("Daily Calm", "Make relaxation a routine.", "MEDIUM", [
+                    ("Meditate for a week", "Do a 10-minute guided meditation every day for 7 days."),
+                    ("Plan breaks", "Schedule two short breaks into every workday."),
+                    ("Gratitude journal", "Write down three good things each evening."),
+                ]),
+                ("Lasting Balance", "Address the sources of stress.", "HARD", [
+                    ("Set a boundary", "Say no to one commitment that overloads you."),
+                    ("Talk to someone", "Share how you feel with a friend or professional."),
+                    ("Review your month", "Check which habits helped most and keep them."),
+                ]),
+            ]),
+        },
+    },
+}
+
+
+def age_band(age) -> str:
+    return "60_plus" if isinstance(age, (int, float)) and age >= 60 else "default"
+
+
+_EXAMPLE_VECTORS: Dict[str, list] = {}
+
+
+def _examples(archetype: str) -> list:
+    if archetype not in _EXAMPLE_VECTORS:
+        _EXAMPLE_VECTORS[archetype] = [embed(example) for example in TEMPLATES[archetype]["examples"]]
+    return _EXAMPLE_VECTORS[archetype]
+
+
+def match_archetype(query: str, threshold: float = MATCH_THRESHOLD) -> Optional[str]:
+    """The single archetype the query asks for, or None if none, several or only a loose match."""
+    concepts = match_concepts(query)
+    if len(concepts) != 1 or concepts[0] not in TEMPLATES:
+        return None
+    archetype = concepts[0]
+    vector = embed(query)
+    similarity = max(float(vector @ example) for example in _examples(archetype))
+    return archetype if similarity >= threshold else None
+
+
+def _shift_difficulty(difficulty: str, steps: int) -> str:
+    index = min(DIFFICULTY_ORDER.index(difficulty) + steps, len(DIFFICULTY_ORDER) - 1)
+    return DIFFICULTY_ORDER[index]
+
+
+def build_roadmap(archetype: str, agent: dict) -> dict:
+    """Roadmap JSON ({"message", "milestones"}) for archetype, picked and tuned by cohort."""
+    template = TEMPLATES[archetype]
+    variants = template["variants"]
+    title, desc, quests = variants.get(age_band(agent.get("age")), variants["default"])
+    level = agent.get("experience_level") or 1
+    shift = 0 if level <= 3 else (1 if level <= 6 else 2)
+
+    q_counter = t_counter = 0
+    quest_nodes = []
+    for quest_title, quest_desc, difficulty, tasks in quests:
+        q_counter += 1
+        task_nodes = []
+        for task_title, task_desc in tasks:
+            t_counter += 1
+            task_nodes.append({"taskId": f"new-t-{t_counter}", "operation": "create",
+                               "title": task_title, "desc": task_desc})
+        quest_nodes.append({"questId": f"new-q-{q_counter}", "operation": "create", "title": quest_title,
+                            "desc": quest_desc, "difficulty": _shift_difficulty(difficulty, shift),
+                            "tasks": task_nodes})
+    return {
+        "message": template["message"],
+        "milestones": [{"milestoneId": "new-m-1", "operation": "create", "title": title, "desc": desc,
+                        "quests": quest_nodes}],
+    }
+
+
+def title_outline(roadmap: dict) -> List[Tuple[str, str]]:
+    """(id, title) for every node, in tree order; what the personalization call rewrites."""
+    outline = []
+    for m in roadmap["milestones"]:
+        outline.append((m["milestoneId"], m["title"]))
+        for q in m["quests"]:
+            outline.append((q["questId"], q["title"]))
+            for t in q["tasks"]:
+                outline.append((t["taskId"], t["title"]))
+    return outline
+
+
+def apply_personalization(roadmap: dict, message, titles, max_title_chars: int = 80) -> dict:
+    """Copy of roadmap with the model's message and titles; unknown ids and bad values are ignored."""
+    result = copy.deepcopy(roadmap)
+    if isinstance(message, str) and message.strip():
+        result["message"] = message.strip()
+    if not isinstance(titles, dict):
+        return result
+    for m in result["milestones"]:
+        nodes = [(m["milestoneId"], m)]
+        for q in m["quests"]:
+            nodes.append((q["questId"], q))
+            nodes.extend((t["taskId"], t) for t in q["tasks"])
+        for node_id, node in nodes:
+            title = titles.get(node_id)
+            if isinstance(title, str) and title.strip():
+                node["title"] = title.strip()[:max_title_chars]
+    return result
+
+
+__all__ = ["TEMPLATES", "match_archetype", "build_roadmap", "title_outline", "apply_personalization"]
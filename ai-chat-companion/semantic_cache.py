@@ -0,0 +1,241 @@
+import difflib
+import hashlib
+import json
+import re
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Offline semantic cache for near-duplicate chat requests.
+#
+# Queries are embedded locally with hashed character n-grams plus word and
+# concept tokens (no model call, no network). Requests are only compared within
+# a profile cohort: age decade, location, experience band and the profile's own
+# text (bio, interests, wants, achievements, problems). Milestones are written
+# from that text, so a cached roadmap is only replayed to someone who stated
+# the same things, such as another new user with an empty profile.
+#
+# Character n-grams catch typos and reordering ("help me get fit" / "get me
+# fit"); the concept map below catches common paraphrases that share no words
+# ("get fit" / "exercise more"). Stopwords are left out of both, and concepts
+# are weighted low, so shared filler and a shared topic do not outweigh what
+# the goal is about. On top of the score, the words outside the concept map
+# ("Python" / "Japanese", "quit") must match, or the entry is not a hit.
+
+EMBEDDING_DIM = 2 ** 12
+NGRAM_RANGE = (3, 5)
+
+CONCEPTS = {
+    "fitness": ["fit", "fitter", "fitness", "exercise", "exercising", "workout", "work out", "gym", "run", "running",
+                "jog", "jogging", "active", "sport", "training", "cardio", "walk", "walking", "shape"],
+    "weight": ["weight", "lose", "slim", "diet", "eat healthier", "nutrition", "calories", "overweight"],
+    "reading": ["read", "reading", "book", "books", "novel", "literature"],
+    "learning": ["learn", "learning", "study", "studying", "course", "skill", "language", "practice", "master"],
+    "social": ["friends", "social", "socialize", "people", "lonely", "loneliness", "meet", "community", "network"],
+    "sleep": ["sleep", "sleeping", "insomnia", "rest", "bedtime", "tired"],
+    "stress": ["stress", "stressed", "anxiety", "anxious", "calm", "relax", "meditate", "meditation", "mindful"],
+    "career": ["job", "career", "work", "promotion", "interview", "resume", "cv", "employed", "hired", "startup",
+               "business", "company", "entrepreneur"],
+    "money": ["money", "save", "saving", "budget", "debt", "finance", "financial", "invest"],
+}
+_CONCEPT_PATTERNS = [
+    # Plurals count too ("finances", "workouts")
+    (concept, re.compile(r"\b(" + "|".join(re.escape(w) for w in words) + r")s?\b"))
+    for concept, words in CONCEPTS.items()
+]
+_STOPWORDS = {"i", "me", "my", "to", "a", "an", "the", "and", "or", "want", "would", "like", "help", "please",
+              "more", "get", "be", "can", "you", "how", "do", "of", "for", "in", "on", "with", "some", "start",
+              "need", "wanna", "im", "d", "m", "ll", "s", "t", "am", "is", "are", "it", "so", "at", "by", "this",
+              "that", "really", "just", "much", "lot", "plan", "make", "could", "should", "will", "all", "about"}
+_CONCEPT_WORDS = {word for words in CONCEPTS.values() for phrase in words for word in phrase.split()}
+CONCEPT_WEIGHT = 3.0
+WORD_WEIGHT = 2.0
+# Two content words are the same word above this spelling similarity (typos, plurals)
+WORD_MATCH_RATIO = 0.8
+_NON_WORD_RE = re.compile(r"[^a-z0-9 ]+")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(_NON_WORD_RE.sub(" ", text.lower()).split())
+
+
+def match_concepts(text: str) -> List[str]:
+    """Names of the CONCEPTS mentioned in text, in CONCEPTS order."""
+    norm = _normalize(text)
+    return [concept for concept, pattern in _CONCEPT_PATTERNS if pattern.search(norm)]
+
+
+def content_words(text: str) -> frozenset:
+    """Words that say what the goal is about beyond its concept ("python", "quit")."""
+    def is_concept(word):
+        # Plurals too, as in the concept patterns
+        return word in _CONCEPT_WORDS or (word.endswith("s") and word[:-1] in _CONCEPT_WORDS)
+    return frozenset(word for word in _normalize(text).split() if word not in _STOPWORDS and not is_concept(word))
+
+
+def same_subject(a: frozenset, b: frozenset) -> bool:
+    """True when every content word on either side has a (near) match on the other."""
+    def covered(words, others):
+        return all(any(w == o or difflib.SequenceMatcher(None, w, o).ratio() >= WORD_MATCH_RATIO for o in others)
+                   for w in words)
+    return covered(a, b) and covered(b, a)
+
+
+def _bucket(feature: str) -> int:
+    # crc32 is stable across processes (unlike hash()), so vectors are reproducible
+    return zlib.crc32(feature.encode("utf-8")) % EMBEDDING_DIM
+
+
+def embed(text: str) -> np.ndarray:
+    """L2-normalized hashed feature vector for text."""
+    norm = _normalize(text)
+    vec = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    if not norm:
+        return vec
+
+    words = [word for word in norm.split() if word not in _STOPWORDS]
+    padded = f" {' '.join(words)} "
+    for n in range(NGRAM_RANGE[0], NGRAM_RANGE[1] + 1):
+        for i in range(len(padded) - n + 1):
+            vec[_bucket("c:" + padded[i:i + n])] += 1.0
+    # Sublinear tf keeps long messages from dominating
+    np.log1p(vec, out=vec)
+
+    for word in words:
+        vec[_bucket("w:" + word)] += WORD_WEIGHT
+    for concept in match_concepts(norm):
+        vec[_bucket("k:" + concept)] += CONCEPT_WEIGHT
+
+    length = float(np.linalg.norm(vec))
+    return vec / length if length else vec
+
+
+def cohort_key(agent: dict) -> str:
+    age = agent.get("age")
+    age_band = f"{(int(age) // 10) * 10}s" if isinstance(age, (int, float)) else "unknown"
+    level = agent.get("experience_level") or 1
+    level_band = "novice" if level <= 3 else ("intermediate" if level <= 6 else "expert")
+    location = _normalize(str(agent.get("location") or "")) or "unknown"
+    return f"{age_band}|{location}|{level_band}|{_profile_digest(agent)}"
+
+
+PROFILE_TEXT_FIELDS = ("bio", "interests", "wants", "achievements", "problems")
+
+
+def _profile_digest(agent: dict) -> str:
+    """Digest of the profile's free text, independent of case, punctuation and list order."""
+    parts = []
+    for field in PROFILE_TEXT_FIELDS:
+        value = agent.get(field) or []
+        items = value if isinstance(value, list) else [value]
+        parts.append("\x1f".join(sorted(_normalize(str(item)) for item in items)))
+    return hashlib.sha256("\x1e".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+class _Cohort:
+    def __init__(self):
+        self.vectors = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self.entries: List[dict] = []
+
+
+class SemanticCache:
+    """Nearest-neighbour cache of roadmap responses, bounded per cohort."""
+
+    def __init__(self, threshold: float = 0.8, max_per_cohort: int = 256, ttl_seconds: float = 24 * 3600):
+        self.threshold = threshold
+        self.max_per_cohort = max_per_cohort
+        self.ttl_seconds = ttl_seconds
+        self.cohorts: Dict[str, _Cohort] = {}
+        self.lookups = 0
+        self.hits = 0
+
+    def lookup(self, cohort: str, query: str, now: Optional[float] = None) -> Optional[Tuple[dict, float]]:
+        """Return (entry, similarity) of the closest cached request above the threshold."""
+        self.lookups += 1
+        group = self.cohorts.get(cohort)
+        if group is None or not group.entries:
+            return None
+        now = time.time() if now is None else now
+        self._expire(group, now)
+        if not group.entries:
+            return None
+
+        scores = group.vectors @ embed(query)
+        words = content_words(query)
+        for best in np.argsort(-scores):
+            similarity = float(scores[best])
+            if similarity < self.threshold:
+                break
+            if same_subject(words, group.entries[best]["content_words"]):
+                self.hits += 1
+                return group.entries[best], similarity
+        return None
+
+    def store(self, cohort: str, query: str, response: str, username: str, now: Optional[float] = None):
+        group = self.cohorts.setdefault(cohort, _Cohort())
+        entry = {"query": query, "content_words": content_words(query), "response": response,
+                 "username": username, "created_at": time.time() if now is None else now}
+        group.vectors = np.vstack([group.vectors, embed(query)[None, :]])
+        group.entries.append(entry)
+        if len(group.entries) > self.max_per_cohort:
+            # Oldest first: entries are appended in time order
+            group.vectors = group.vectors[1:]
+            group.entries.pop(0)
+
+    def _expire(self, group: _Cohort, now: float):
+        keep = [i for i, e in enumerate(group.entries) if now - e["created_at"] < self.ttl_seconds]
+        if len(keep) != len(group.entries):
+            group.vectors = group.vectors[keep]
+            group.entries = [group.entries[i] for i in keep]
+
+    def stats(self) -> dict:
+        return {
+            "threshold": self.threshold,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            "entries": sum(len(c.entries) for c in self.cohorts.values()),
+        }
+
+
+def shareable_response(response: str) -> Optional[str]:
+    """The part of a roadmap response that may be replayed to other users.
+
+    The message also draws on the conversation and the dataset stats and is
+    dropped; only the milestone tree is kept, and cohort_key keeps it to people
+    with the same profile text. None if the response has no milestones worth
+    caching.
+    """
+    try:
+        milestones = json.loads(response).get("milestones")
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(milestones, list) or not milestones:
+        return None
+    return json.dumps({"milestones": milestones})
+
+
+def _shared_message(milestones: list) -> str:
+    lines = ["Here is a roadmap that worked for a goal like yours:"]
+    for m in milestones:
+        if isinstance(m, dict) and m.get("title"):
+            lines.append(f"- **{m['title']}**" + (f": {m['desc']}" if m.get("desc") else ""))
+    lines.append("Tell me more about your situation if you would like it tailored further.")
+    return "\n".join(lines)
+
+
+def adapt_response(entry: dict, username: str) -> str:
+    """Full response for the requesting user from a cached milestone tree."""
+    response = entry["response"]
+    previous = entry.get("username")
+    if previous and username and previous != username:
+        # Responses are JSON text, so insert the name JSON-escaped
+        escaped = json.dumps(username)[1:-1]
+        response = re.sub(rf"\b{re.escape(previous)}\b", lambda _: escaped, response)
+    milestones = json.loads(response)["milestones"]
+    return json.dumps({"message": _shared_message(milestones), "milestones": milestones})
+
+
+__all__ = ["SemanticCache", "embed", "content_words", "same_subject", "cohort_key", "adapt_response", "shareable_response", "match_concepts", "CONCEPTS"]
@@ -0,0 +1,48 @@
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    print("orjson not installed. Falling back to stdlib json for serialization.")
+
+# Fast JSON helpers shared by the SSE endpoints and prompt building.
+# orjson returns compact UTF-8 bytes, which is exactly what StreamingResponse
+# writes to the socket, so frames never round-trip through str.
+
+def dumps(obj: Any) -> bytes:
+    """Serialize obj to compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def dumps_str(obj: Any) -> str:
+    """Serialize obj to a JSON string (used when embedding JSON in prompts)."""
+    return dumps(obj).decode("utf-8")
+
+def loads(data):
+    """Parse JSON from bytes or str. Raises ValueError on malformed input."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# --- SSE frames ---
+SSE_DONE = b"data: [DONE]\n\n"
+
+def sse_event(obj: Any) -> bytes:
+    """Encode obj as a single pre-encoded SSE data frame."""
+    return b"data: " + dumps(obj) + b"\n\n"
+
+def sse_chunks(text: str, chunk_size: int = 200, reset: bool = False) -> list:
+    """Split text into {"chunk": ...} SSE frames, encoded up front.
+
+    With reset=True the first frame tells the client to drop what it has
+    buffered so far, so a second document can replace an earlier one.
+    """
+    frames = [{"chunk": text[i:i + chunk_size]} for i in range(0, len(text), chunk_size)]
+    if reset and frames:
+        frames[0]["reset"] = True
+    return [sse_event(frame) for frame in frames]
+
+__all__ = ["dumps", "dumps_str", "loads", "SSE_DONE", "sse_event", "sse_chunks"]
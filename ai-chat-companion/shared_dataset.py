@@ -0,0 +1,223 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Multi-worker dataset sharing.
+#
+# The supervisor (``python shared_dataset.py --workers N``) loads the SPSS file
+# once, then publishes every column into a generation directory as .npy files:
+#   - numeric columns (including casp_num) are stored as-is
+#   - everything else (the *_l label columns, country, ...) is stored as
+#     categorical codes, with the categories kept in manifest.json
+# Workers memory-map those files read-only, so N workers share one copy of the
+# data in the page cache (or in /dev/shm, which is RAM-backed).
+#
+# Layout:
+#   <shared_dir>/CURRENT            -> {"generation": 3, "dir": "gen-3-1234"}
+#   <shared_dir>/gen-3-1234/manifest.json
+#   <shared_dir>/gen-3-1234/col-0.npy ...
+# CURRENT is replaced atomically, so a worker either sees the old generation
+# or the complete new one. A new CURRENT (after an upload) tells every worker to
+# re-attach on its next check. Publishers hold <shared_dir>/PUBLISH.lock (an
+# O_EXCL lock file), so concurrent uploads get distinct generations and never
+# delete each other's directories.
+
+SHARED_DATASET_ENV = "HIVEMIND_SHARED_DATASET_DIR"
+CHECK_INTERVAL_SECONDS = 1.0
+LOCK_FILE = "PUBLISH.lock"
+# A lock older than this was left by a crashed publisher
+LOCK_STALE_SECONDS = 600
+
+
+def default_shared_dir() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "hivemind-dataset")
+
+
+def read_current(shared_dir: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(shared_dir, "CURRENT"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _categories_to_json(categories) -> list:
+    out = []
+    for c in categories:
+        if isinstance(c, np.generic):
+            c = c.item()
+        out.append(c if isinstance(c, (str, int, float, bool)) else str(c))
+    return out
+
+
+@contextmanager
+def _publish_lock(shared_dir: str):
+    path = os.path.join(shared_dir, LOCK_FILE)
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) > LOCK_STALE_SECONDS:
+                    os.remove(path)
+                    continue
+            except FileNotFoundError:
+                continue
+            time.sleep(0.05)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        yield
+    finally:
+        os.remove(path)
+
+
+def publish(df: pd.DataFrame, stats: str, shared_dir: str, sha256: Optional[str] = None) -> int:
+    """Write df into a new generation directory and make it CURRENT.
+
+    sha256 is the checksum of the source .sav file, kept so workers can tell
+    whether an upload is a no-op.
+
+    Returns the new generation number.
+    """
+    os.makedirs(shared_dir, exist_ok=True)
+    with _publish_lock(shared_dir):
+        return _publish_locked(df, stats, shared_dir, sha256)
+
+
+def _publish_locked(df: pd.DataFrame, stats: str, shared_dir: str, sha256: Optional[str]) -> int:
+    current = read_current(shared_dir) or {"generation": 0, "dir": None}
+    generation = current["generation"] + 1
+    gen_name = f"gen-{generation}-{os.getpid()}"
+    gen_dir = os.path.join(shared_dir, gen_name)
+    os.makedirs(gen_dir)
+
+    columns = []
+    for idx, col in enumerate(df.columns):
+        series = df[col]
+        file_name = f"col-{idx}.npy"
+        if pd.api.types.is_bool_dtype(series.dtype) or pd.api.types.is_numeric_dtype(series.dtype):
+            arr = series.to_numpy(dtype="float64", na_value=np.nan) if series.hasnans else series.to_numpy()
+            np.save(os.path.join(gen_dir, file_name), np.ascontiguousarray(arr))
+            columns.append({"name": col, "kind": "numeric", "file": file_name})
+        else:
+            cat = series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype("category")
+            np.save(os.path.join(gen_dir, file_name), cat.cat.codes.to_numpy())
+            columns.append({
+                "name": col,
+                "kind": "categorical",
+                "file": file_name,
+                "categories": _categories_to_json(cat.cat.categories),
+            })
+
+    manifest = {"generation": generation, "rows": len(df), "columns": columns, "stats": stats,
+                "sha256": sha256}
+    with open(os.path.join(gen_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    tmp_path = os.path.join(shared_dir, f"CURRENT.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"generation": generation, "dir": gen_name}, f)
+    os.replace(tmp_path, os.path.join(shared_dir, "CURRENT"))
+
+    # Keep the previous generation around for workers that have not switched yet.
+    for name in os.listdir(shared_dir):
+        if name.startswith("gen-") and name not in (gen_name, current["dir"]):
+            shutil.rmtree(os.path.join(shared_dir, name), ignore_errors=True)
+
+    return generation
+
+
+class SharedDataset:
+    """Read-only, memory-mapped view of the dataset published by the supervisor."""
+
+    def __init__(self, shared_dir: str):
+        self.shared_dir = shared_dir
+        self.generation = 0
+        self.dir: Optional[str] = None
+        self.df: Optional[pd.DataFrame] = None
+        self.stats = "Dataset not loaded."
+        self.sha256: Optional[str] = None
+        self._last_check = 0.0
+
+    def attach(self) -> bool:
+        """Map the CURRENT generation. Returns False if nothing is published yet."""
+        current = read_current(self.shared_dir)
+        if current is None:
+            return False
+        gen_dir = os.path.join(self.shared_dir, current["dir"])
+        with open(os.path.join(gen_dir, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        data = {}
+        for col in manifest["columns"]:
+            arr = np.load(os.path.join(gen_dir, col["file"]), mmap_mode="r")
+            if col["kind"] == "categorical":
+                data[col["name"]] = pd.Categorical.from_codes(arr, col["categories"], validate=False)
+            else:
+                data[col["name"]] = arr
+        # copy=False keeps each column backed by its memmap instead of consolidating
+        self.df = pd.DataFrame(data, copy=False) if data else pd.DataFrame()
+        self.stats = manifest["stats"]
+        self.sha256 = manifest.get("sha256")
+        self.generation = manifest["generation"]
+        self.dir = current["dir"]
+        self._last_check = time.monotonic()
+        print(f"Attached shared dataset generation {self.generation}: {manifest['rows']} records.")
+        return True
+
+    def changed(self) -> bool:
+        """True if another process published a new generation since the last attach.
+
+        The CURRENT file is read at most once per CHECK_INTERVAL_SECONDS, so
+        calling this on every request is cheap.
+        """
+        now = time.monotonic()
+        if now - self._last_check < CHECK_INTERVAL_SECONDS:
+            return False
+        self._last_check = now
+        current = read_current(self.shared_dir)
+        return current is not None and current["dir"] != self.dir
+
+    def refresh(self) -> bool:
+        """Re-attach if another process published a new generation. Returns True if it re-attached."""
+        return self.changed() and self.attach()
+
+
+# Supervisor entry point
+# Usage: python shared_dataset.py --workers 4 [--port 8000] [--shared-dir /dev/shm/hivemind-dataset]
+if __name__ == "__main__":
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the chat companion with a shared dataset across workers.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--shared-dir", default=default_shared_dir())
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as companion
+
+    companion.DATASET_REGISTRY.adopt_legacy()
+    dataset = companion.load_default_wave()
+    generation = publish(dataset.df, dataset.stats, args.shared_dir, dataset.sha256)
+    print(f"Published dataset generation {generation} to {args.shared_dir}")
+    # Free the supervisor's private copy before forking workers
+    del dataset
+    companion.DATASET_REGISTRY.unload_all()
+
+    os.environ[SHARED_DATASET_ENV] = args.shared_dir
+    uvicorn.run("app:app", host=args.host, port=args.port, workers=args.workers,
+                app_dir=os.path.dirname(os.path.abspath(__file__)))
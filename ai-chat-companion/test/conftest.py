@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# Keep app imports away from the tracked users.db and the deployment's dataset dirs
+_STATE_DIR = tempfile.mkdtemp(prefix="ai-chat-companion-test-")
+os.environ.setdefault("CONVERSATION_DB_PATH", os.path.join(_STATE_DIR, "users.db"))
+os.environ.setdefault("DATASETS_DIR", os.path.join(_STATE_DIR, "datasets"))
+os.environ.setdefault("DATASET_UPLOAD_DIR", os.path.join(_STATE_DIR, "uploads"))
+os.environ.pop("GROQ_API_KEY", None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
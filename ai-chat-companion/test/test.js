@@ -85,9 +85,28 @@ async function testMilestoneStream(feedback) {
 	return { milestones, bitVector };
 }
 
+async function testDatasetQuery() {
+	const res = await fetch(`${BASE_URL}/api/dataset/query`, {
+		method: 'POST',
+		headers: { 'Content-Type': 'application/json' },
+		body: JSON.stringify({
+			filters: { female: 1, ep005_l: 'Retired', age_bin: '60-69' },
+			aggregates: ['bmi', 'casp']
+		})
+	});
+	if (!res.ok) {
+		throw new Error(`dataset query failed: ${res.status} ${await res.text()}`);
+	}
+	const json = await res.json();
+	console.log('\n/api/dataset/query (retired women 60-69)');
+	console.log({ count: json.count, bmi: json.aggregates.bmi, elapsed_ms: json.elapsed_ms });
+	return json;
+}
+
 async function main() {
 	try {
 		console.log('BASE_URL =', BASE_URL);
+		await testDatasetQuery();
 		const feedback = await testAnalyzeAgent();
 		const { milestones, bitVector } = await testMilestoneStream(feedback);
 		console.log('\nSummary');
@@ -0,0 +1,187 @@
+import hashlib
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from chunked_upload import SESSION_TTL_SECONDS, UploadError, UploadSessions
+from dataset_index import BitmapIndex
+from dataset_registry import DatasetRegistry, LoadedWave
+
+PAYLOAD = bytes(range(256)) * 40  # 10240 bytes
+CHUNK = 4096
+SHA = hashlib.sha256(PAYLOAD).hexdigest()
+
+
+def _chunks(data=PAYLOAD):
+    return [data[i:i + CHUNK] for i in range(0, len(data), CHUNK)]
+
+
+def test_resume_lists_only_missing_chunks(tmp_path):
+    sessions = UploadSessions(str(tmp_path))
+    status = sessions.init("data.sav", len(PAYLOAD), SHA, CHUNK)
+    assert status["upload_id"] == SHA
+    assert status["missing"] == [0, 1, 2]
+
+    sessions.put_chunk(SHA, 0, _chunks()[0])
+    sessions.put_chunk(SHA, 2, _chunks()[2])
+    # Same file announced again after a dropped connection
+    resumed = sessions.init("data.sav", len(PAYLOAD), SHA.upper(), CHUNK)
+    assert resumed["received"] == [0, 2]
+    assert resumed["missing"] == [1]
+
+    # A different chunking starts over
+    assert sessions.init("data.sav", len(PAYLOAD), SHA, 2048)["received"] == []
+
+
+def test_bad_chunks_are_rejected(tmp_path):
+    sessions = UploadSessions(str(tmp_path))
+    sessions.init("data.sav", len(PAYLOAD), SHA, CHUNK)
+
+    with pytest.raises(UploadError, match="expected 4096"):
+        sessions.put_chunk(SHA, 0, _chunks()[0][:-1])
+    with pytest.raises(UploadError, match="expected 2048"):
+        sessions.put_chunk(SHA, 2, _chunks()[2] + b"x")  # last chunk is shorter
+    with pytest.raises(UploadError, match="out of range"):
+        sessions.put_chunk(SHA, 3, b"")
+    with pytest.raises(UploadError, match="checksum mismatch"):
+        sessions.put_chunk(SHA, 1, _chunks()[1], chunk_sha256="0" * 64)
+    with pytest.raises(UploadError) as unknown:
+        sessions.put_chunk("../etc", 0, b"")
+    assert unknown.value.status_code == 404
+    assert sessions.status(SHA)["received"] == []
+
+
+@pytest.mark.parametrize("size, sha, chunk_size", [
+    (len(PAYLOAD), "not-a-hash", CHUNK),
+    (0, SHA, CHUNK),
+    (len(PAYLOAD), SHA, 0),
+    (len(PAYLOAD), SHA, 65 * 1024 * 1024),
+])
+def test_invalid_init_is_rejected(tmp_path, size, sha, chunk_size):
+    with pytest.raises(UploadError):
+        UploadSessions(str(tmp_path)).init("data.sav", size, sha, chunk_size)
+
+
+def test_assemble_verifies_the_whole_file(tmp_path):
+    sessions = UploadSessions(str(tmp_path / "uploads"))
+    sessions.init("data.sav", len(PAYLOAD), SHA, CHUNK)
+    sessions.put_chunk(SHA, 0, _chunks()[0])
+    dest = tmp_path / "out.sav"
+
+    with pytest.raises(UploadError) as incomplete:
+        sessions.assemble(SHA, str(dest))
+    assert incomplete.value.status_code == 409
+
+    for index, chunk in enumerate(_chunks()):
+        sessions.put_chunk(SHA, index, chunk)
+    assert sessions.assemble(SHA, str(dest)) == SHA
+    assert dest.read_bytes() == PAYLOAD
+    assert not os.path.exists(tmp_path / "uploads" / SHA)  # session cleaned up
+
+
+def test_assembly_checksum_mismatch_discards_the_session(tmp_path):
+    sessions = UploadSessions(str(tmp_path / "uploads"))
+    sessions.init("data.sav", len(PAYLOAD), SHA, CHUNK)
+    corrupted = _chunks(bytes(len(PAYLOAD)))  # right sizes, wrong bytes
+    for index, chunk in enumerate(corrupted):
+        sessions.put_chunk(SHA, index, chunk)
+    dest = tmp_path / "out.sav"
+    dest.write_bytes(b"previous")
+
+    with pytest.raises(UploadError) as mismatch:
+        sessions.assemble(SHA, str(dest))
+    assert mismatch.value.status_code == 422
+    assert dest.read_bytes() == b"previous"
+    assert [name for name in os.listdir(tmp_path) if ".upload-" in name] == []
+    with pytest.raises(UploadError):
+        sessions.status(SHA)
+
+
+def test_concurrent_assemblies_use_separate_temp_files(tmp_path, monkeypatch):
+    other = bytes(reversed(PAYLOAD))
+    other_sha = hashlib.sha256(other).hexdigest()
+    sessions = UploadSessions(str(tmp_path / "uploads"))
+    for data, sha in ((PAYLOAD, SHA), (other, other_sha)):
+        sessions.init("data.sav", len(data), sha, CHUNK)
+        for index, chunk in enumerate(_chunks(data)):
+            sessions.put_chunk(sha, index, chunk)
+
+    # Both assemblies finish writing before either renames its temp file into place
+    both_written = threading.Barrier(2, timeout=5)
+    real_replace = os.replace
+
+    def replace(src, dst):
+        if ".upload-" in str(src):
+            both_written.wait()
+        real_replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", replace)
+    dest = tmp_path / "out.sav"
+    errors = []
+
+    def assemble(sha):
+        try:
+            sessions.assemble(sha, str(dest))
+        except Exception as e:  # noqa: BLE001 - reported by the assertion below
+            errors.append(e)
+
+    threads = [threading.Thread(target=assemble, args=(sha,)) for sha in (SHA, other_sha)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert dest.read_bytes() in (PAYLOAD, other)  # one whole file, never a mix of both
+    assert [name for name in os.listdir(tmp_path) if ".upload-" in name] == []
+
+
+def test_expire_removes_abandoned_sessions(tmp_path):
+    sessions = UploadSessions(str(tmp_path))
+    sessions.init("data.sav", len(PAYLOAD), SHA, CHUNK)
+    sessions.expire(now=time.time() + SESSION_TTL_SECONDS + 1)
+    with pytest.raises(UploadError):
+        sessions.status(SHA)
+
+
+def _loader(path, sha256):
+    with open(path, "rb") as f:
+        df = pd.DataFrame({"age": list(f.read()[:10])})
+    return LoadedWave(df, "stats", BitmapIndex(df), sha256)
+
+
+def test_retried_complete_is_a_no_op(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "UPLOAD_SESSIONS", UploadSessions(str(tmp_path / "uploads")))
+    monkeypatch.setattr(app_module, "DATASET_REGISTRY",
+                        DatasetRegistry(str(tmp_path / "datasets"), _loader, memory_budget_bytes=10 ** 9))
+    client = TestClient(app_module.app)
+    url = "/api/upload-dataset"
+
+    init = client.post(f"{url}/init", json={"filename": "w8.sav", "size": len(PAYLOAD), "sha256": SHA,
+                                            "chunk_size": CHUNK, "wave": "w8"}).json()
+    for index in init["missing"]:
+        chunk = _chunks()[index]
+        response = client.put(f"{url}/{SHA}/chunks/{index}", content=chunk,
+                              headers={"X-Chunk-Sha256": hashlib.sha256(chunk).hexdigest()})
+        assert response.status_code == 200
+
+    first = client.post(f"{url}/{SHA}/complete").json()
+    assert first["unchanged"] is False
+    assert first["wave"] == "w8@1"
+
+    # The response was lost and the client retries: the session is gone, the file is installed
+    retried = client.post(f"{url}/{SHA}/complete")
+    assert retried.status_code == 200
+    assert retried.json()["unchanged"] is True
+    assert retried.json()["wave"] == "w8@1"
+
+    # Announcing the same file again is a no-op as well
+    again = client.post(f"{url}/init", json={"filename": "w8.sav", "size": len(PAYLOAD), "sha256": SHA,
+                                             "chunk_size": CHUNK, "wave": "w8"}).json()
+    assert again["unchanged"] is True
+    assert app_module.DATASET_REGISTRY.describe()["waves"]["w8"]["current"] == 1
@@ -0,0 +1,25 @@
+from fastapi.testclient import TestClient
+
+import app as app_module
+
+client = TestClient(app_module.app)
+
+
+def test_conversation_endpoints_are_off_without_a_token(monkeypatch):
+    monkeypatch.setattr(app_module, "CONVERSATION_ADMIN_TOKEN", None)
+    assert client.get("/api/conversation/alice").status_code == 404
+    assert client.delete("/api/conversation/alice").status_code == 404
+
+
+def test_conversation_endpoints_require_the_admin_token(monkeypatch):
+    monkeypatch.setattr(app_module, "CONVERSATION_ADMIN_TOKEN", "s3cret")
+    app_module.CONVERSATION_MEMORY.append("alice", "user", "my private health details")
+
+    assert client.get("/api/conversation/alice").status_code == 403
+    assert client.get("/api/conversation/alice", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.delete("/api/conversation/alice").status_code == 403
+
+    response = client.get("/api/conversation/alice", headers={"X-Admin-Token": "s3cret"})
+    assert response.status_code == 200
+    assert response.json()["turns"][-1]["content"] == "my private health details"
+    assert client.delete("/api/conversation/alice", headers={"X-Admin-Token": "s3cret"}).status_code == 200
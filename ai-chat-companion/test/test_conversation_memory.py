@@ -0,0 +1,99 @@
+import json
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+import app as app_module
+from conversation_memory import ConversationMemory, estimate_tokens
+
+
+def _memory(tmp_path, budget=1200):
+    return ConversationMemory(str(tmp_path / "users.db"), token_budget=budget)
+
+
+def _turn(i):
+    return f"Turn {i} asks about goal number {i}. " + "It keeps going with more detail. " * 12
+
+
+def test_old_turns_are_folded_into_the_summary(tmp_path):
+    memory = _memory(tmp_path)
+    for i in range(6):
+        memory.append("anna", "user" if i % 2 == 0 else "assistant", _turn(i))
+    before = memory.get("anna")
+    assert before["summary"] == ""
+    assert len(before["turns"]) == 6
+
+    for i in range(6, 40):
+        memory.append("anna", "user" if i % 2 == 0 else "assistant", _turn(i))
+    after = memory.get("anna")
+
+    # The newest turns stay verbatim, in order, and older ones become first-sentence summary lines
+    assert after["turns"][-1]["content"] == _turn(39).strip()
+    assert sum(estimate_tokens(t["content"]) for t in after["turns"]) <= memory.recent_budget
+    assert after["summary"].splitlines()[-1].startswith("- ")
+    assert "It keeps going" not in after["summary"]
+    # The oldest summary lines were dropped to stay within the summary budget
+    assert "Turn 0 " not in after["summary"]
+    assert estimate_tokens(after["summary"]) <= memory.summary_budget
+
+
+def test_rendered_history_stays_within_the_token_budget(tmp_path):
+    memory = _memory(tmp_path)
+    sizes = []
+    for i in range(200):
+        memory.append("bob", "user" if i % 2 == 0 else "assistant", _turn(i))
+        sizes.append(estimate_tokens(memory.render("bob")))
+    # Headers and role labels add a little on top of the stored text
+    assert max(sizes) <= 1200 * 1.1
+    assert sizes[-1] > 600  # and the budget is actually used
+
+
+def test_oversized_turn_is_cut(tmp_path):
+    memory = _memory(tmp_path, budget=400)
+    memory.append("carl", "user", "x" * 10000)
+    [turn] = memory.get("carl")["turns"]
+    assert turn["content"].endswith("...")
+    assert estimate_tokens(turn["content"]) <= memory.recent_budget
+
+
+def test_users_are_separate_and_clear_removes_everything(tmp_path):
+    memory = _memory(tmp_path, budget=200)
+    for i in range(10):
+        memory.append("dana", "user", _turn(i))
+    memory.append("eve", "user", "Hi there.")
+    memory.clear("dana")
+
+    assert memory.get("dana") == {"summary": "", "turns": []}
+    assert memory.render("dana") == ""
+    assert memory.last_turn_at("dana") is None
+    assert memory.get("eve")["turns"] == [{"role": "user", "content": "Hi there."}]
+
+
+def _fake_groq(*contents):
+    replies = list(contents)
+
+    def create(**kwargs):
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=replies.pop(0)))])
+
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def test_templates_are_skipped_only_during_an_ongoing_conversation(monkeypatch):
+    memory = ConversationMemory(app_module.CONVERSATION_MEMORY.db_path)
+    monkeypatch.setattr(app_module, "SEMANTIC_CACHE", None)
+    monkeypatch.setattr(app_module, "CONVERSATION_MEMORY", memory)
+    generated = json.dumps({"message": "Ok.", "milestones": []})
+    body = {"username": "returning-user", "location": "AT", "user_input": "help me get fit"}
+    client = TestClient(app_module.app)
+    memory.append("returning-user", "user", "I hurt my knee yesterday.")
+
+    monkeypatch.setattr(app_module, "groq_client", _fake_groq(generated))
+    matched = app_module.TEMPLATE_STATS["matched"]
+    client.post("/api/analyze-agent", json=body)
+    assert app_module.TEMPLATE_STATS["matched"] == matched  # the knee matters: full generation
+
+    # Days later the same request starts from the template again
+    monkeypatch.setattr(app_module, "CONVERSATION_ACTIVE_SECONDS", 0)
+    monkeypatch.setattr(app_module, "groq_client", _fake_groq('{"fits": true}'))
+    client.post("/api/analyze-agent", json=body)
+    assert app_module.TEMPLATE_STATS["matched"] == matched + 1
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from dataset_index import BitmapIndex
+from dataset_registry import LoadedWave
+
+
+def _df():
+    return pd.DataFrame({
+        "age": [25, 35, 62, 65, 71, 85, np.nan],
+        "female": [1, 0, 1, 1, 0, 1, 0],
+        "country": ["Austria", "Austria", "Spain", "Germany", "Spain", "Austria", "Italy"],
+        "casp_num": [30.0, np.nan, 40.0, 36.0, np.nan, 32.0, 38.0],
+    })
+
+
+def test_filters_are_anded_across_columns_and_ored_within_a_list():
+    df = _df()
+    index = BitmapIndex(df)
+
+    result = index.query({"female": 1, "country": ["Austria", "Spain"]}, [])
+    expected = (df["female"] == 1) & df["country"].isin(["Austria", "Spain"])
+    assert result["count"] == int(expected.sum()) == 3
+    assert result["share"] == pytest.approx(3 / len(df))
+
+    assert index.query({"country": ["Austria", "Nowhere"]}, [])["count"] == 3
+    assert index.query({"country": "Nowhere"}, [])["count"] == 0
+    assert index.query({}, [])["count"] == len(df)
+
+
+@pytest.mark.parametrize("value", [1, 1.0, "1", " 1 ", "1.0"])
+def test_numeric_spellings_select_the_same_rows(value):
+    assert BitmapIndex(_df()).query({"female": value}, [])["count"] == 4
+
+
+def test_age_bins():
+    index = BitmapIndex(_df())
+    assert index.query({"age_bin": "60-69"}, [])["count"] == 2
+    assert index.query({"age_bin": ["<30", "80+"]}, [])["count"] == 2
+    # Rows without an age are in no bin
+    assert sum(index.query({"age_bin": label}, [])["count"] for label in index.bitmaps["age_bin"]) == 6
+
+
+def test_aggregates_skip_missing_values():
+    index = BitmapIndex(_df())
+    casp = index.query({"country": "Austria"}, ["casp", "age"])["aggregates"]
+    assert casp["casp"] == {"count": 2, "mean": 31.0, "min": 30.0, "max": 32.0}
+    assert casp["age"]["count"] == 3
+
+    none_left = index.query({"country": "Spain", "female": 0}, ["casp"])["aggregates"]["casp"]
+    assert none_left == {"count": 0, "mean": None, "min": None, "max": None}
+
+
+def test_unknown_columns_raise_key_error():
+    index = BitmapIndex(_df())
+    with pytest.raises(KeyError):
+        index.query({"shoe_size": 42}, [])
+    with pytest.raises(KeyError):
+        index.query({}, ["income"])
+
+
+def test_empty_dataset():
+    result = BitmapIndex(None).query({}, [])
+    assert result == {"count": 0, "share": 0.0, "aggregates": {}}
+
+
+def test_unknown_column_is_a_400(monkeypatch):
+    df = _df()
+    wave = LoadedWave(df, "stats", BitmapIndex(df), None)
+
+    async def get_wave(name):
+        return wave
+
+    monkeypatch.setattr(app_module, "get_wave", get_wave)
+    client = TestClient(app_module.app)
+
+    response = client.post("/api/dataset/query", json={"filters": {"shoe_size": 42}})
+    assert response.status_code == 400
+    assert "shoe_size" in response.json()["detail"]
+    assert client.post("/api/dataset/query", json={"aggregates": ["income"]}).status_code == 400
+
+    ok = client.post("/api/dataset/query", json={"filters": {"female": "1", "age_bin": "60-69"},
+                                                 "aggregates": ["casp"]})
+    assert ok.status_code == 200
+    assert ok.json()["count"] == 2
+    assert ok.json()["aggregates"]["casp"]["mean"] == 38.0
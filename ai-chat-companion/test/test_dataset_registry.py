@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from dataset_index import BitmapIndex
+from dataset_registry import MAX_VERSIONS_PER_WAVE, DatasetRegistry, LoadedWave
+
+
+def _loader(path, sha256):
+    with open(path, "r", encoding="utf-8") as f:
+        rows = int(f.read())
+    df = pd.DataFrame({"age": list(range(rows))})
+    return LoadedWave(df, f"{rows} rows", BitmapIndex(df), sha256)
+
+
+def _upload(tmp_path, name, rows):
+    path = tmp_path / f"{name}.upload"
+    path.write_text(str(rows))
+    return str(path)
+
+
+def _registry(tmp_path, budget=10 ** 9):
+    return DatasetRegistry(str(tmp_path / "datasets"), _loader, memory_budget_bytes=budget)
+
+
+def test_reload_sees_another_workers_upload_immediately(tmp_path):
+    worker_a = _registry(tmp_path)
+    worker_b = _registry(tmp_path)
+    worker_a.add_version("default", _upload(tmp_path, "one", 10), "a" * 64, "one.sav")
+    worker_b.resolve(None)  # starts the throttle window
+
+    worker_a.add_version("default", _upload(tmp_path, "two", 20), "b" * 64, "two.sav")
+    assert worker_b.key_for_sha256("default", "b" * 64) is None
+
+    worker_b.reload()
+    assert worker_b.key_for_sha256("default", "b" * 64) == "default@2"
+
+
+def test_resolve_versions_and_errors(tmp_path):
+    registry = _registry(tmp_path)
+    assert registry.resolve(None) is None  # nothing registered yet
+    registry.add_version("w8", _upload(tmp_path, "a", 10), "a" * 64, "a.sav")
+    registry.add_version("w8", _upload(tmp_path, "b", 20), "b" * 64, "b.sav")
+
+    assert registry.resolve("w8") == "w8@2"
+    assert registry.resolve("w8@1") == "w8@1"
+    with pytest.raises(KeyError):
+        registry.resolve("w8@5")
+    with pytest.raises(KeyError):
+        registry.resolve("w9")
+    assert registry.resolve(None) is None  # waves exist, but no default wave yet
+    for bad in ("../w8", "w8@x", "w 8"):
+        with pytest.raises(ValueError):
+            registry.resolve(bad)
+    assert registry.load("w8@1").stats == "10 rows"
+
+
+def test_old_versions_are_pruned(tmp_path):
+    registry = _registry(tmp_path)
+    for i in range(1, MAX_VERSIONS_PER_WAVE + 2):
+        registry.add_version("w8", _upload(tmp_path, f"v{i}", i), f"{i:064x}", f"v{i}.sav")
+        registry.load(f"w8@{i}")
+
+    versions = [v["version"] for v in registry.describe()["waves"]["w8"]["versions"]]
+    assert versions == list(range(2, MAX_VERSIONS_PER_WAVE + 2))
+    assert "w8@1" not in registry.loaded
+    files = os.listdir(tmp_path / "datasets" / "w8")
+    assert len(files) == MAX_VERSIONS_PER_WAVE
+    assert not any(name.startswith("v1-") for name in files)
+    with pytest.raises(KeyError):
+        registry.resolve("w8@1")
+
+
+def test_lru_eviction_keeps_pinned_waves(tmp_path):
+    registry = _registry(tmp_path)
+    for name in ("w1", "w2", "w3"):
+        registry.add_version(name, _upload(tmp_path, name, 1000), name.ljust(64, "0"), f"{name}.sav")
+    one_wave = registry.load("w1@1").nbytes
+    registry.memory_budget_bytes = int(one_wave * 2.5)
+    registry.install("pinned@1", _loader(_upload(tmp_path, "pinned", 1000), None), pinned=True)
+
+    registry.load("w2@1")
+    registry.peek("w1@1")  # w1 is now more recently used than w2
+    registry.load("w3@1")
+
+    assert set(registry.loaded) == {"pinned@1", "w1@1", "w3@1"}
+
+    registry.memory_budget_bytes = 0
+    registry.load("w2@1")
+    assert set(registry.loaded) == {"pinned@1", "w2@1"}  # the wave just loaded is never evicted
+
+
+def test_concurrent_loads_read_the_file_once(tmp_path):
+    calls = []
+
+    def slow_loader(path, sha256):
+        calls.append(path)
+        time.sleep(0.05)
+        return _loader(path, sha256)
+
+    registry = DatasetRegistry(str(tmp_path / "datasets"), slow_loader, memory_budget_bytes=10 ** 9)
+    registry.add_version("w8", _upload(tmp_path, "a", 10), "a" * 64, "a.sav")
+    threads = [threading.Thread(target=registry.load, args=("w8@1",)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+
+
+def test_legacy_file_is_adopted_and_never_deleted(tmp_path):
+    legacy = tmp_path / "easyshare_data.sav"
+    legacy.write_text("5")
+    registry = DatasetRegistry(str(tmp_path / "datasets"), _loader, memory_budget_bytes=10 ** 9,
+                               legacy_path=str(legacy))
+    # Constructing the registry has no side effects; adoption is a separate startup step
+    assert not os.path.exists(registry.registry_path)
+    assert registry.resolve(None) is None
+    assert registry.adopt_legacy()
+    assert not registry.adopt_legacy()
+    assert registry.resolve(None) == "default@1"
+    assert registry.load("default@1").stats == "5 rows"
+
+    for i in range(MAX_VERSIONS_PER_WAVE):
+        registry.add_version("default", _upload(tmp_path, f"v{i}", 1), f"{i:064x}", f"v{i}.sav")
+    assert registry.resolve(None) == f"default@{MAX_VERSIONS_PER_WAVE + 1}"
+    assert legacy.exists()
+
+
+def test_version_pruned_by_another_worker_is_reported_missing(tmp_path):
+    worker_a = _registry(tmp_path)
+    worker_b = _registry(tmp_path)
+    worker_a.add_version("w8", _upload(tmp_path, "v1", 1), "1" * 64, "v1.sav")
+    assert worker_b.key_for_sha256("w8", "1" * 64) == "w8@1"  # worker_b now knows w8@1
+
+    for i in range(2, MAX_VERSIONS_PER_WAVE + 2):
+        worker_a.add_version("w8", _upload(tmp_path, f"v{i}", i), f"{i}" * 64, f"v{i}.sav")
+
+    # worker_b's copy of registry.json still lists w8@1, whose file is gone now
+    with pytest.raises(KeyError):
+        worker_b.load("w8@1")
+    # ... and once it has re-read the registry, lookups of the old key find nothing
+    assert worker_b._version("w8@1") is None
+    with pytest.raises(KeyError):
+        worker_b.load("w8@1")
+    assert worker_b.current_sha256("w8") == f"{MAX_VERSIONS_PER_WAVE + 1}" * 64
+    assert worker_b.find_current("1" * 64) is None
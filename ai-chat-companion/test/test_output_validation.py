@@ -0,0 +1,72 @@
+import json
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+import app as app_module
+
+
+def _fake_groq(*contents):
+    replies = list(contents)
+
+    def create(**kwargs):
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=replies.pop(0)))])
+
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def _frames(monkeypatch, *replies):
+    monkeypatch.setattr(app_module, "groq_client", _fake_groq(*replies))
+    monkeypatch.setattr(app_module, "SEMANTIC_CACHE", None)
+    response = TestClient(app_module.app).post("/api/analyze-agent", json={
+        "username": "validation-user", "location": "AT", "user_input": "what should I focus on this month?"})
+    return [line[6:] for line in response.text.splitlines() if line.startswith("data: ")]
+
+
+def test_unusable_model_output_is_not_forwarded(monkeypatch):
+    frames = _frames(monkeypatch, "I cannot help with that, sorry.", "Still not JSON.")
+
+    assert frames[-1] == "[DONE]"
+    events = [json.loads(frame) for frame in frames[:-1]]
+    assert [list(event) for event in events] == [["error"]]
+    assert "cannot help" not in "".join(frames)
+
+
+def test_reordered_keys_count_as_valid(monkeypatch):
+    milestone = {"title": "Walk More", "milestoneId": "new-m-1", "desc": "", "operation": "create",
+                 "quests": [{"tasks": [], "difficulty": "EASY", "title": "Daily Walk", "questId": "new-q-1",
+                             "desc": "", "operation": "create"}]}
+    monkeypatch.setattr(app_module, "OUTPUT_VALIDATION_STATS", app_module.OutputValidationStats())
+    frames = _frames(monkeypatch, json.dumps({"milestones": [milestone], "message": "Go."}))
+
+    assert frames[-1] == "[DONE]"
+    assert app_module.OUTPUT_VALIDATION_STATS.as_dict()["valid"] == 1
+    assert app_module.OUTPUT_VALIDATION_STATS.as_dict()["repaired"] == 0
+
+
+def test_unchanged_parent_with_operation_none_is_valid(monkeypatch):
+    milestone = {"milestoneId": "cm1", "operation": "none", "title": "Run a 5k", "desc": "",
+                 "quests": [{"questId": "new-q-1", "operation": "create", "title": "Interval Runs", "desc": "",
+                             "difficulty": "MEDIUM", "tasks": []}]}
+    monkeypatch.setattr(app_module, "OUTPUT_VALIDATION_STATS", app_module.OutputValidationStats())
+    frames = _frames(monkeypatch, json.dumps({"message": "Add intervals.", "milestones": [milestone]}))
+
+    answer = json.loads("".join(json.loads(frame)["chunk"] for frame in frames[:-1]))
+    assert answer["milestones"][0]["operation"] == "none"
+    assert app_module.OUTPUT_VALIDATION_STATS.as_dict() == {
+        "valid": 1, "repaired": 0, "reprompted": 0, "failed": 0, "saved_model_calls": 0}
+
+
+def test_stripped_unknown_keys_are_not_a_repair(monkeypatch):
+    milestone = {"milestoneId": "new-m-1", "operation": "create", "title": "Walk More", "desc": "",
+                 "emoji": "walk", "quests": [{"questId": "new-q-1", "operation": "create", "title": "Daily Walk",
+                                              "desc": "", "difficulty": "EASY", "tasks": [], "notes": "x"}]}
+    monkeypatch.setattr(app_module, "OUTPUT_VALIDATION_STATS", app_module.OutputValidationStats())
+    _frames(monkeypatch, json.dumps({"message": "Go.", "milestones": [milestone]}))
+    assert app_module.OUTPUT_VALIDATION_STATS.as_dict()["valid"] == 1
+
+    # A changed value still is one
+    milestone["quests"][0]["difficulty"] = "easy"
+    monkeypatch.setattr(app_module, "OUTPUT_VALIDATION_STATS", app_module.OutputValidationStats())
+    _frames(monkeypatch, json.dumps({"message": "Go.", "milestones": [milestone]}))
+    assert app_module.OUTPUT_VALIDATION_STATS.as_dict()["repaired"] == 1
@@ -0,0 +1,58 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from roadmap_templates import match_archetype
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("help me get fit", "fitness"),
+    ("I want to start jogging", "fitness"),
+    ("I want to read more", "reading"),
+    ("I feel lonely lately", "social"),
+    # A stray keyword is not a match
+    ("How do I run a successful startup?", None),
+    ("help me get my finances in shape", None),
+    # Several goals go to full generation
+    ("make friends at the gym", None),
+])
+def test_match_archetype(query, expected):
+    assert match_archetype(query) == expected
+
+
+def _fake_groq(*contents):
+    replies = list(contents)
+
+    def create(**kwargs):
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=replies.pop(0)))])
+
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def _stream(client, body):
+    response = client.post("/api/analyze-agent", json=body)
+    frames = [json.loads(line[6:]) for line in response.text.splitlines()
+              if line.startswith("data: ") and line[6:] != "[DONE]"]
+    text = ""
+    for frame in frames:
+        if frame.get("reset"):
+            text = ""
+        text += frame.get("chunk", "")
+    return frames, json.loads(text)
+
+
+def test_rejected_template_is_replaced_by_full_generation(monkeypatch):
+    generated = {"message": "Let's talk gear.", "milestones": [{
+        "milestoneId": "new-m-1", "operation": "create", "title": "Pick Running Shoes", "desc": "", "quests": []}]}
+    monkeypatch.setattr(app_module, "groq_client", _fake_groq('{"fits": false}', json.dumps(generated)))
+    monkeypatch.setattr(app_module, "SEMANTIC_CACHE", None)
+
+    frames, answer = _stream(TestClient(app_module.app), {
+        "username": "rejected-user", "location": "AT", "user_input": "help me get fit with new running shoes"})
+
+    assert answer["milestones"][0]["title"] == "Pick Running Shoes"
+    assert sum(1 for frame in frames if frame.get("reset")) == 1
+    assert app_module.TEMPLATE_STATS["rejected"] >= 1
@@ -0,0 +1,66 @@
+import json
+
+from semantic_cache import SemanticCache, adapt_response, cohort_key, shareable_response
+
+
+def _response(message, title="Build a Fitness Habit"):
+    return json.dumps({
+        "message": message,
+        "milestones": [{"milestoneId": "new-m-1", "operation": "create", "title": title,
+                        "desc": "Move regularly.", "quests": []}],
+    })
+
+
+def test_cached_answer_does_not_leak_the_first_users_message():
+    cache = SemanticCache(threshold=0.5)
+    text = _response("Anna, given your knee surgery and diabetes, start with short walks.")
+    cache.store("60s|austria|novice", "help me get fit", shareable_response(text), "Anna")
+
+    entry, _ = cache.lookup("60s|austria|novice", "help me get fit please")
+    replayed = json.loads(adapt_response(entry, "Bob"))
+
+    assert "diabetes" not in replayed["message"]
+    assert "Anna" not in replayed["message"]
+    assert "Build a Fitness Habit" in replayed["message"]
+    assert replayed["milestones"][0]["title"] == "Build a Fitness Habit"
+
+
+def test_username_in_the_tree_is_replaced():
+    entry = {"response": shareable_response(_response("Hi", title="Anna's 5k plan")), "username": "Anna"}
+    replayed = json.loads(adapt_response(entry, "Bob"))
+    assert replayed["milestones"][0]["title"] == "Bob's 5k plan"
+
+
+def test_responses_without_milestones_are_not_shareable():
+    assert shareable_response(json.dumps({"message": "Sorry, no plan.", "milestones": []})) is None
+    assert shareable_response("I cannot help with that") is None
+
+
+def _hit(cached_query, query):
+    cache = SemanticCache()
+    cache.store("cohort", cached_query, _response("cached"), "Anna")
+    return cache.lookup("cohort", query)
+
+
+def test_paraphrases_of_the_same_goal_hit():
+    assert _hit("I want to learn Python", "help me learn python please")
+    assert _hit("help me get fit", "help me get fit please")
+
+
+def test_different_goals_on_the_same_topic_do_not_hit():
+    assert _hit("I want to learn Japanese", "I want to learn Python") is None
+    assert _hit("help me get a job", "I want to quit my job") is None
+    assert _hit("I want to get a job", "I want to quit my job") is None
+    assert _hit("I want to start running", "I want to stop running") is None
+
+
+def test_cohort_key_separates_profiles_by_their_text():
+    anna = {"age": 64, "location": "Austria", "experience_level": 2, "bio": "Retired teacher",
+            "wants": ["Lose weight", "walk daily"], "problems": ["knee surgery"]}
+    same_text = {**anna, "wants": ["walk daily", "lose weight!"]}
+    other_problems = {**anna, "problems": ["diabetes"]}
+
+    assert cohort_key(anna) == cohort_key(same_text)
+    assert cohort_key(anna) != cohort_key(other_problems)
+    assert cohort_key(anna) != cohort_key({**anna, "bio": "Nurse"})
+    assert cohort_key({"age": 20, "location": "AT"}) == cohort_key({"age": 25, "location": "at", "wants": []})
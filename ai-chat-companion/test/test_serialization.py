@@ -0,0 +1,52 @@
+import json
+
+import pytest
+from fastapi.exceptions import RequestValidationError
+
+from app import app, parse_agent_profile
+from serialization import SSE_DONE, sse_chunks
+
+
+def test_roadmap_is_passed_through_and_profile_validated():
+    roadmap = [{"milestoneId": "m1", "title": "Run", "quests": [{"questId": "q1", "extra": 1}]}]
+    profile, current_roadmap = parse_agent_profile(json.dumps({
+        "username": "u", "location": "AT", "wants": '["Get fit", "Sleep better"]',
+        "interests": "running, reading", "current_roadmap": roadmap,
+    }).encode())
+
+    assert current_roadmap == roadmap
+    assert profile.wants == ["Get fit", "Sleep better"]
+    assert profile.interests == ["running", "reading"]
+    assert profile.current_roadmap == []
+
+
+@pytest.mark.parametrize("body, loc", [
+    (b"{not json", ("body",)),
+    (b"[]", ("body",)),
+    (json.dumps({"username": "u", "location": "AT", "current_roadmap": {"a": 1}}).encode(), ("body", "current_roadmap")),
+    (json.dumps({"username": "u"}).encode(), ("body", "location")),
+])
+def test_invalid_bodies_raise_request_validation_errors(body, loc):
+    with pytest.raises(RequestValidationError) as error:
+        parse_agent_profile(body)
+    assert tuple(error.value.errors()[0]["loc"]) == loc
+
+
+def test_analyze_agent_body_schema_is_in_openapi():
+    operation = app.openapi()["paths"]["/api/analyze-agent"]["post"]
+    body = operation["requestBody"]
+    schema = body["content"]["application/json"]["schema"]
+
+    assert body["required"] is True
+    assert set(schema["required"]) == {"username", "location"}
+    milestone = schema["properties"]["current_roadmap"]["items"]
+    assert milestone["properties"]["quests"]["items"]["properties"]["tasks"]["items"]["required"] == ["taskId", "title"]
+    assert "$ref" not in json.dumps(schema)
+
+
+def test_sse_chunks_reassemble():
+    text = json.dumps({"message": "x" * 450})
+    frames = sse_chunks(text, chunk_size=200)
+    assert all(frame.startswith(b"data: ") and frame.endswith(b"\n\n") for frame in frames)
+    assert "".join(json.loads(frame[6:])["chunk"] for frame in frames) == text
+    assert SSE_DONE == b"data: [DONE]\n\n"
@@ -0,0 +1,16 @@
+import os
+
+import pytest
+
+# Modules both services carry a copy of, since each is deployed on its own
+_SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_OTHER_SERVICE_DIR = os.path.join(os.path.dirname(_SERVICE_DIR), "ai-provement-tool")
+SHARED_MODULES = ["profiling.py", "traffic_capture.py", "output_validation.py", "circuit_breaker.py"]
+
+
+@pytest.mark.parametrize("name", SHARED_MODULES)
+def test_copies_are_identical(name):
+    with open(os.path.join(_SERVICE_DIR, name), "rb") as ours, \
+            open(os.path.join(_OTHER_SERVICE_DIR, name), "rb") as theirs:
+        assert ours.read() == theirs.read(), \
+            f"{name} differs between ai-chat-companion and ai-provement-tool; apply the change to both copies"
@@ -0,0 +1,101 @@
+import json
+import os
+import threading
+
+import pandas as pd
+
+from shared_dataset import SharedDataset, publish, read_current
+
+
+def _df(value):
+    return pd.DataFrame({"age": [60, 70, value], "country": ["Austria", "Spain", "Italy"]})
+
+
+def test_concurrent_publishes_get_distinct_generations(tmp_path):
+    shared_dir = str(tmp_path)
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(publish(_df(i), f"stats {i}", shared_dir)))
+               for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == [1, 2, 3, 4]
+    current = read_current(shared_dir)
+    assert current["generation"] == 4
+    assert os.path.exists(os.path.join(shared_dir, current["dir"], "manifest.json"))
+    assert not os.path.exists(os.path.join(shared_dir, "PUBLISH.lock"))
+
+
+def test_refresh_follows_current_dir_not_just_the_number(tmp_path, monkeypatch):
+    shared_dir = str(tmp_path)
+    publish(_df(80), "first", shared_dir)
+    dataset = SharedDataset(shared_dir)
+    assert dataset.attach()
+
+    publish(_df(90), "second", shared_dir)
+    # Simulate a racing publisher that wrote the same generation number
+    current = read_current(shared_dir)
+    with open(os.path.join(shared_dir, "CURRENT"), "w", encoding="utf-8") as f:
+        json.dump({"generation": dataset.generation, "dir": current["dir"]}, f)
+
+    monkeypatch.setattr("shared_dataset.CHECK_INTERVAL_SECONDS", 0)
+    assert dataset.refresh()
+    assert dataset.stats == "second"
+
+
+def test_stale_lock_is_taken_over(tmp_path):
+    lock = tmp_path / "PUBLISH.lock"
+    lock.write_text("12345")
+    os.utime(lock, (0, 0))
+    assert publish(_df(1), "stats", str(tmp_path)) == 1
+
+
+def test_publishing_an_upload_does_not_block_other_requests(tmp_path, monkeypatch):
+    import asyncio
+    import time
+
+    import httpx
+
+    import app as app_module
+    from dataset_index import BitmapIndex
+    from dataset_registry import DatasetRegistry, LoadedWave
+
+    def loader(path, sha256):
+        df = _df(100)
+        return LoadedWave(df, "uploaded", BitmapIndex(df), sha256)
+
+    publishing = threading.Event()
+    publish_started = []
+
+    def slow_publish(*args):
+        publish_started.append(time.perf_counter())
+        publishing.set()
+        time.sleep(0.5)  # a large dataset takes seconds to write
+        return publish(*args)
+
+    shared_dir = str(tmp_path / "shared")
+    publish(_df(1), "first", shared_dir)
+    monkeypatch.setattr(app_module, "SHARED_DATASET_DIR", shared_dir)
+    monkeypatch.setattr(app_module, "SHARED_DATASET", SharedDataset(shared_dir))
+    monkeypatch.setattr(app_module, "DATASET_REGISTRY", DatasetRegistry(str(tmp_path / "datasets"), loader,
+                                                                    memory_budget_bytes=10 ** 9))
+    monkeypatch.setattr(app_module, "publish", slow_publish)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            upload = asyncio.create_task(client.post(
+                "/api/upload-dataset", files={"file": ("w.sav", b"new data")}))
+            await asyncio.to_thread(publishing.wait, 5)
+            health = await client.get("/health")
+            waited = time.perf_counter() - publish_started[0]
+            return (await upload).json(), health.status_code, waited
+
+    result, health_status, waited = asyncio.run(scenario())
+    assert health_status == 200
+    assert waited < 0.3
+    assert result["unchanged"] is False
+    assert app_module.SHARED_DATASET.generation == 2
+    assert app_module.SHARED_DATASET.stats == "uploaded"
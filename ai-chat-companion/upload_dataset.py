@@ -1,11 +1,24 @@
+import hashlib
 import requests
 import sys
 import os
+import time
 
-# Usage: python upload_dataset.py "C:\path\to\easyshare_data.sav"
+# Usage: python upload_dataset.py "C:\path\to\easyshare_data.sav" [server_url] [wave]
+#
+# The file becomes the new current version of the given wave (e.g. "w8"; the
+# default wave if omitted). Earlier waves and versions stay available.
+#
+# Uploads in chunks with a sha256 per chunk and for the whole file. If the
+# connection drops, run the same command again: the server remembers which
+# chunks it already has and only the missing ones are sent. Uploading the file
+# that is already loaded returns immediately without a reload.
+
+CHUNK_SIZE = 4 * 1024 * 1024
+MAX_RETRIES = 5
 
 if len(sys.argv) < 2:
-    print("Usage: python upload_dataset.py <path_to_file>")
+    print("Usage: python upload_dataset.py <path_to_file> [server_url] [wave]")
     sys.exit(1)
 
 file_path = sys.argv[1]
@@ -13,20 +26,80 @@ if not os.path.exists(file_path):
     print(f"Error: File not found at {file_path}")
     sys.exit(1)
 
-url = "http://localhost:8000/api/upload-dataset"
+base_url = (sys.argv[2] if len(sys.argv) > 2 else "http://localhost:8000").rstrip("/")
+url = f"{base_url}/api/upload-dataset"
+wave = sys.argv[3] if len(sys.argv) > 3 else None
+
+
+def with_retries(method, request_url, **kwargs):
+    """Send a request, retrying connection errors and 5xx with backoff."""
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            response = requests.request(method, request_url, timeout=120, **kwargs)
+            if response.status_code < 500:
+                return response
+            error = f"status {response.status_code}: {response.text}"
+        except requests.RequestException as e:
+            error = str(e)
+        if attempt == MAX_RETRIES:
+            raise RuntimeError(f"{method} {request_url} failed after {MAX_RETRIES} attempts ({error})")
+        delay = 2 ** (attempt - 1)
+        print(f"  retrying in {delay}s ({error})")
+        time.sleep(delay)
+
+
+def check(response):
+    if response.status_code != 200:
+        raise RuntimeError(f"Failed with status {response.status_code}\n{response.text}")
+    return response.json()
+
+
+def sha256_of(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+size = os.path.getsize(file_path)
+print(f"Hashing {os.path.basename(file_path)} ({size / 1024 / 1024:.1f} MB)...")
+file_hash = sha256_of(file_path)
 print(f"Uploading {os.path.basename(file_path)} to {url}...")
 
 try:
-    with open(file_path, 'rb') as f:
-        files = {'file': f}
-        response = requests.post(url, files=files)
-        
-    if response.status_code == 200:
-        print("\nSuccess!")
-        print(response.json())
-    else:
-        print(f"\nFailed with status {response.status_code}")
-        print(response.text)
-        
+    session = check(with_retries("POST", f"{url}/init", json={
+        "filename": os.path.basename(file_path),
+        "size": size,
+        "sha256": file_hash,
+        "chunk_size": CHUNK_SIZE,
+        "wave": wave,
+    }))
+    if session.get("unchanged"):
+        print("\nServer already has this dataset loaded; nothing to do.")
+        sys.exit(0)
+
+    upload_id = session["upload_id"]
+    missing = session["missing"]
+    total = session["total_chunks"]
+    if len(missing) < total:
+        print(f"Resuming: {total - len(missing)}/{total} chunks already on the server.")
+
+    with open(file_path, "rb") as f:
+        for done, index in enumerate(missing, start=1):
+            f.seek(index * CHUNK_SIZE)
+            data = f.read(CHUNK_SIZE)
+            check(with_retries(
+                "PUT", f"{url}/{upload_id}/chunks/{index}", data=data,
+                headers={"Content-Type": "application/octet-stream",
+                         "X-Chunk-Sha256": hashlib.sha256(data).hexdigest()},
+            ))
+            print(f"  chunk {index + 1}/{total} ({done}/{len(missing)} this run)")
+
+    result = check(with_retries("POST", f"{url}/{upload_id}/complete"))
+    print("\nSuccess!")
+    print(result)
+
 except Exception as e:
     print(f"\nError: {e}")
+    sys.exit(1)
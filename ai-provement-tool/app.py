@@ -3,14 +3,28 @@ import json
 import base64
 import io
 import time
+import asyncio
 from typing import Optional, List, Tuple, Dict
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, Form, HTTPException
-from pydantic import BaseModel, ValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, ValidationError
 import PIL.Image
 from groq import Groq
 
+try:
+    import orjson
+    _json_loads = orjson.loads  # orjson.JSONDecodeError subclasses json.JSONDecodeError
+except ImportError:
+    _json_loads = json.loads
+
+from jobs import JobStore, JOB_QUEUED, JOB_RUNNING
+from output_validation import OutputValidationStats, validate_with_repair
+from traffic_capture import capture_from_env
+from profiling import install_profiler
+from circuit_breaker import ModelUnavailable, breaker_from_env
+
 # --- Environment and API Key Setup ---
 load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
@@ -20,10 +34,18 @@ if not GROQ_API_KEY:
 groq_client = Groq(api_key=GROQ_API_KEY)
 
 app = FastAPI()
+# Opt-in sampling profiler; a no-op unless HIVEMIND_PROFILE_DIR is set
+install_profiler(app, "ai-provement-tool")
 
 
 # --- Configuration ---
 BASE_DIR = os.path.dirname(__file__)
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(BASE_DIR, "jobs.db"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_POLL_INTERVAL_SECONDS = 1.0
+# Vision calls slower than the budget (MODEL_LATENCY_BUDGET_SECONDS) count as
+# failures; repeated failures open the circuit (see circuit_breaker.py)
+MODEL_BREAKER = breaker_from_env(default_budget=15.0)
 
 
 # --- Pydantic Models ---
@@ -33,8 +55,13 @@ class Task(BaseModel):
     description: Optional[str] = None
 
 class AIResponse(BaseModel):
-    is_completed: bool
+    model_config = ConfigDict(populate_by_name=True)
+
+    # Accept the key spellings the model tends to drift into
+    is_completed: bool = Field(validation_alias=AliasChoices("is_completed", "isCompleted", "completed"))
     reason: str
+    # Provisional verdict given while the model is unavailable; submit again later
+    pending_review: bool = False
 
 
 # Simple in-memory cache for AI responses
@@ -42,12 +69,98 @@ CACHE_TTL_SECONDS = 20 * 60  # 20 minutes
 # key: (task_id, user_comment, tuple(image_urls)) -> (timestamp, AIResponse)
 _ai_cache: Dict[Tuple[int, str, Tuple[str, ...]], Tuple[float, "AIResponse"]] = {}
 
+# Opt-in capture of hashed cache keys for sizing the cache offline (see cache_simulator.py)
+TRAFFIC_CAPTURE = capture_from_env("ai-provement-tool")
+
+
+def _capture(key, response: "AIResponse", started: float, cacheable: bool = True, cached: bool = False):
+    if TRAFFIC_CAPTURE is not None:
+        latency_ms = 0.0 if cached else (time.time() - started) * 1000
+        TRAFFIC_CAPTURE.record("/evaluate", key, len(response.model_dump_json()), latency_ms, cacheable, cached)
+
+# --- Output Validation ---
+OUTPUT_VALIDATION_STATS = OutputValidationStats()
+
+
+def _completion_text(completion) -> str:
+    content = completion.choices[0].message.content
+    if isinstance(content, list):
+        # OpenAI-style SDK often returns list of content parts
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return str(content)
+
+
+async def _reprompt_ai_response(raw_text: str, error: str) -> Optional[str]:
+    """Ask the model to fix only its malformed verdict.
+
+    Text-only and capped at 256 tokens, so it costs a fraction of the original
+    vision call that would otherwise be repeated by a user retry. ModelUnavailable
+    propagates: without the model there is no verdict yet, and queued jobs wait.
+    """
+    prompt = (
+        "Your previous answer did not match the required JSON schema "
+        '{"is_completed": boolean, "reason": string}.\n'
+        f"Validation error: {error}\n"
+        f"Previous answer: {raw_text}\n"
+        "Return only the corrected JSON object, keeping the same verdict and reason."
+    )
+    try:
+        completion = await MODEL_BREAKER.call(
+            groq_client.chat.completions.create,
+            model="meta-llama/llama-4-scout-17b-16e-instruct",
+            messages=[{"role": "user", "content": prompt}],
+            response_format={"type": "json_object"},
+            max_completion_tokens=256,
+        )
+        return _completion_text(completion)
+    except ModelUnavailable:
+        raise
+    except Exception as e:
+        print(f"Re-prompt failed: {e}")
+        return None
+
+
+async def validate_ai_response(text: str) -> Tuple[Optional[AIResponse], Optional[str]]:
+    """Validate the model verdict, repairing locally before re-prompting.
+
+    Returns (response or None, last validation error).
+    """
+    try:
+        response_obj = AIResponse.model_validate_json(text)
+        OUTPUT_VALIDATION_STATS.valid += 1
+        return response_obj, None
+    except ValidationError:
+        pass
+
+    response_obj, _, error = validate_with_repair(text, AIResponse)
+    if response_obj is not None:
+        OUTPUT_VALIDATION_STATS.repaired += 1
+        return response_obj, None
+
+    fixed_text = await _reprompt_ai_response(text, error)
+    if fixed_text:
+        response_obj, _, error = validate_with_repair(fixed_text, AIResponse)
+        if response_obj is not None:
+            OUTPUT_VALIDATION_STATS.reprompted += 1
+            return response_obj, None
+
+    OUTPUT_VALIDATION_STATS.failed += 1
+    return None, error
+
+
 # --- AI Evaluation Logic ---
-async def evaluate_task_completion(task: Task, image_urls: List[str], user_text: Optional[str]) -> AIResponse:
+PROVISIONAL_VERDICTS = {"count": 0}
+
+
+async def evaluate_task_completion(task: Task, image_urls: List[str], user_text: Optional[str],
+                                   provisional: bool = True) -> AIResponse:
     """Use Groq vision model to decide if the task is completed based on task, one or more image URLs, and user text.
 
     Uses a simple in-memory cache keyed by (task.id, user_text, image_urls) with a 20 minute TTL
     to avoid repeated AI calls for identical inputs.
+
+    When the model is unavailable a provisional pending_review verdict is returned, or, with
+    provisional=False, ModelUnavailable is raised so the caller can retry later.
     """
 
     # Normalize inputs for cache key
@@ -61,6 +174,7 @@ async def evaluate_task_completion(task: Task, image_urls: List[str], user_text:
         ts, cached_response = cached
         if now - ts < CACHE_TTL_SECONDS:
             print("Using cached AI response")
+            _capture(key, cached_response, now, cached=True)
             return cached_response
         else:
             # Expired entry
@@ -114,53 +228,62 @@ async def evaluate_task_completion(task: Task, image_urls: List[str], user_text:
     ]
 
     try:
-        completion = groq_client.chat.completions.create(
+        # The Groq SDK is synchronous; the breaker runs it in a thread so
+        # concurrent requests and job workers don't block the event loop.
+        completion = await MODEL_BREAKER.call(
+            groq_client.chat.completions.create,
             model="meta-llama/llama-4-scout-17b-16e-instruct",
             messages=messages,
             response_format={"type": "json_object"},
             max_completion_tokens=256,
         )
 
-        content = completion.choices[0].message.content
-        if isinstance(content, list):
-            # OpenAI-style SDK often returns list of content parts
-            text = "".join(part.get("text", "") for part in content if isinstance(part, dict))
-        else:
-            text = str(content)
-
-        ai_data = json.loads(text)
-        response_obj = AIResponse(**ai_data)
+        text = _completion_text(completion)
+        response_obj, error = await validate_ai_response(text)
+        if response_obj is None:
+            response_obj = AIResponse(
+                is_completed=False,
+                reason=f"AI evaluation failed. Could not parse model response. Error: {error}. Raw response: {text}",
+            )
+            _capture(key, response_obj, now, cacheable=False)
+            return response_obj
         # Store in cache
         _ai_cache[key] = (now, response_obj)
+        _capture(key, response_obj, now)
         return response_obj
-    except (json.JSONDecodeError, ValidationError) as e:
-        return AIResponse(
+    except ModelUnavailable as e:
+        if not provisional:
+            raise
+        # Never cached: the same submission gets a real verdict once the model is back
+        PROVISIONAL_VERDICTS["count"] += 1
+        response_obj = AIResponse(
             is_completed=False,
-            reason=f"AI evaluation failed. Could not parse model response. Error: {e}. Raw response: {text if 'text' in locals() else ''}",
+            pending_review=True,
+            reason="Pending review: automatic verification is temporarily unavailable. "
+                   f"Your proof was not rejected; please submit it again in a few minutes. ({e})",
         )
+        _capture(key, response_obj, now, cacheable=False)
+        return response_obj
     except Exception as e:
-        return AIResponse(
+        response_obj = AIResponse(
             is_completed=False,
             reason=f"AI API call failed. Error: {e}",
         )
+        _capture(key, response_obj, now, cacheable=False)
+        return response_obj
 
-# --- API Endpoints ---
-@app.post("/evaluate", response_model=AIResponse)
-async def evaluate(
-    task: str = Form(..., description="Task object as JSON string"),
-    image_urls: str = Form(..., description="JSON array of public URLs of the proof images"),
-    user_text: Optional[str] = Form(None, description="Optional user explanation / notes"),
-):
-    """Evaluates whether a task is completed based on one or more image URLs and optional user text."""
+# --- Request Parsing ---
+def parse_evaluation_form(task: str, image_urls: str) -> Tuple[Task, List[str]]:
+    """Validate the task JSON and image URL list shared by /evaluate and /jobs."""
 
     try:
-        task_obj = Task(**json.loads(task))
-    except (json.JSONDecodeError, ValidationError) as exc:
+        task_obj = Task.model_validate_json(task)
+    except ValidationError as exc:
         raise HTTPException(status_code=400, detail=f"Invalid task JSON: {exc}")
 
     # Parse and validate image URLs (expecting a JSON array of strings)
     try:
-        urls = json.loads(image_urls)
+        urls = _json_loads(image_urls)
     except json.JSONDecodeError as exc:
         raise HTTPException(status_code=400, detail=f"Invalid image_urls JSON: {exc}")
 
@@ -175,8 +298,169 @@ async def evaluate(
     if not normalized_urls:
         raise HTTPException(status_code=400, detail="image_urls must contain at least one valid URL starting with http or https.")
 
+    return task_obj, normalized_urls
+
+
+# --- Verification Job Queue ---
+job_store = JobStore(JOBS_DB_PATH)
+_job_wakeup: Optional[asyncio.Event] = None
+_job_finished: Optional[asyncio.Condition] = None
+_job_worker_tasks: List[asyncio.Task] = []
+
+
+async def _job_worker():
+    """Claim queued jobs one at a time and persist their verdicts."""
+    while True:
+        # While the model circuit is open, leave queued jobs where they are
+        delay = MODEL_BREAKER.retry_after()
+        if delay:
+            await asyncio.sleep(delay)
+            continue
+        # sqlite calls block (busy timeout), so they run off the event loop
+        job = await asyncio.to_thread(job_store.claim)
+        if job is None:
+            # Sleep until a submission wakes us, or poll in case another
+            # process sharing the database queued something.
+            try:
+                await asyncio.wait_for(_job_wakeup.wait(), timeout=JOB_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            _job_wakeup.clear()
+            continue
+
+        try:
+            task_obj = Task.model_validate_json(job["task"])
+            result = await evaluate_task_completion(task_obj, job["image_urls"], job["user_text"],
+                                                    provisional=False)
+            if isinstance(result, AIResponse):
+                result = result.model_dump()
+            if not await asyncio.to_thread(job_store.complete, job["id"], result):
+                print(f"Job {job['id']} was taken over by another worker; verdict discarded")
+        except ModelUnavailable as e:
+            # Model down or slow: the job stays queued and is retried after the cooldown
+            print(f"Requeued job {job['id']}: {e}")
+            await asyncio.to_thread(job_store.requeue, job["id"])
+            await asyncio.sleep(max(MODEL_BREAKER.retry_after(), JOB_POLL_INTERVAL_SECONDS))
+            continue
+        except asyncio.CancelledError:
+            # Shutdown mid-job: hand it back now rather than when the lease runs out
+            job_store.requeue(job["id"])
+            raise
+        except Exception as e:
+            await asyncio.to_thread(job_store.fail, job["id"], str(e))
+
+        async with _job_finished:
+            _job_finished.notify_all()
+
+
+@app.on_event("startup")
+async def start_job_workers():
+    global _job_wakeup, _job_finished
+    _job_wakeup = asyncio.Event()
+    _job_finished = asyncio.Condition()
+    # Only jobs whose lease ran out: a sibling worker may be running the others right now
+    requeued = await asyncio.to_thread(job_store.requeue_expired)
+    if requeued:
+        print(f"Requeued {requeued} abandoned verification job(s)")
+    for _ in range(JOB_WORKERS):
+        _job_worker_tasks.append(asyncio.create_task(_job_worker()))
+
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    for worker in _job_worker_tasks:
+        worker.cancel()
+    await asyncio.gather(*_job_worker_tasks, return_exceptions=True)
+    _job_worker_tasks.clear()
+    job_store.close()
+
+
+def _job_view(job: dict) -> dict:
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        # Lets the caller check the verdict belongs to the task it is completing
+        "task": _json_loads(job["task"]),
+        "result": job["result"],
+        "error": job["error"],
+    }
+
+
+# --- API Endpoints ---
+@app.post("/evaluate", response_model=AIResponse)
+async def evaluate(
+    task: str = Form(..., description="Task object as JSON string"),
+    image_urls: str = Form(..., description="JSON array of public URLs of the proof images"),
+    user_text: Optional[str] = Form(None, description="Optional user explanation / notes"),
+):
+    """Evaluates whether a task is completed based on one or more image URLs and optional user text."""
+
+    task_obj, normalized_urls = parse_evaluation_form(task, image_urls)
+
     # Get AI evaluation
     ai_result = await evaluate_task_completion(task_obj, normalized_urls, user_text)
 
     return ai_result
 
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    task: str = Form(..., description="Task object as JSON string"),
+    image_urls: str = Form(..., description="JSON array of public URLs of the proof images"),
+    user_text: Optional[str] = Form(None, description="Optional user explanation / notes"),
+):
+    """Queues an evaluation and returns its id immediately.
+
+    Fetch the verdict with GET /jobs/{job_id} or wait on GET /jobs/{job_id}/events.
+    """
+
+    task_obj, normalized_urls = parse_evaluation_form(task, image_urls)
+    job_id = await asyncio.to_thread(job_store.create, task_obj.model_dump_json(), normalized_urls, user_text)
+    if _job_wakeup is not None:
+        _job_wakeup.set()
+    return {"job_id": job_id, "status": JOB_QUEUED}
+
+
+@app.get("/stats")
+async def stats():
+    """Counters for output validation and for the model circuit breaker."""
+
+    return {
+        "output_validation": OUTPUT_VALIDATION_STATS.as_dict(),
+        "model_breaker": MODEL_BREAKER.stats(),
+        "provisional_verdicts": PROVISIONAL_VERDICTS["count"],
+    }
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Returns the job status and, once finished, the AI verdict."""
+
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_view(job)
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Streams a single SSE event with the job result once it is finished."""
+
+    if await asyncio.to_thread(job_store.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def gen():
+        while True:
+            job = await asyncio.to_thread(job_store.get, job_id)
+            if job["status"] not in (JOB_QUEUED, JOB_RUNNING):
+                yield f"data: {json.dumps(_job_view(job))}\n\n"
+                yield "data: [DONE]\n\n"
+                return
+            # Wake on any finished job (or poll, for jobs run by another process)
+            try:
+                async with _job_finished:
+                    await asyncio.wait_for(_job_finished.wait(), timeout=JOB_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(gen(), media_type="text/event-stream")
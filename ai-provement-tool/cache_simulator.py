@@ -0,0 +1,223 @@
+import argparse
+import heapq
+import json
+import sys
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List, Optional
+
+# Offline cache simulator.
+#
+# Replays a traffic capture (see traffic_capture.py) against LRU, LFU and
+# TTL-only policies of different sizes, and reports hit rate, peak memory and
+# how many model calls (and how much model time) each configuration would save.
+#
+# Usage: python cache_simulator.py capture.jsonl [more.jsonl ...]
+#            [--sizes 100,1000,10000] [--ttls 300,1200,3600] [--service ai-provement-tool]
+
+
+class SimulatedCache:
+    """Entry-count bounded cache with optional TTL.
+
+    Subclasses pick the eviction victim; expiry is shared. Memory is the sum of
+    response sizes currently resident.
+    """
+
+    def __init__(self, capacity: Optional[int], ttl: Optional[float]):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.entries: Dict[str, tuple] = {}  # key -> (inserted_ts, size)
+        self._expiry = deque()  # (inserted_ts, key) in insertion order
+        self.memory = 0
+        self.peak_memory = 0
+
+    @property
+    def name(self) -> str:
+        size = "unbounded" if self.capacity is None else str(self.capacity)
+        ttl = "none" if self.ttl is None else f"{self.ttl:g}s"
+        return f"{self.policy:<4} size={size:<9} ttl={ttl}"
+
+    def _remove(self, key: str):
+        _, size = self.entries.pop(key)
+        self.memory -= size
+
+    def _expire(self, now: float):
+        if self.ttl is None:
+            return
+        while self._expiry and now - self._expiry[0][0] >= self.ttl:
+            inserted, key = self._expiry.popleft()
+            entry = self.entries.get(key)
+            # Skip stale queue items for keys that were re-inserted later
+            if entry is not None and entry[0] == inserted:
+                self._remove(key)
+                self._forget(key)
+
+    def access(self, key: str, now: float, size: int, cacheable: bool) -> bool:
+        """Look the key up; insert it on a miss. Returns True on a hit."""
+        self._expire(now)
+        if key in self.entries:
+            self._touch(key)
+            return True
+        if not cacheable:
+            return False
+        if self.capacity is not None and len(self.entries) >= self.capacity:
+            victim = self._victim()
+            self._remove(victim)
+            self._forget(victim)
+        self.entries[key] = (now, size)
+        self._expiry.append((now, key))
+        self.memory += size
+        self.peak_memory = max(self.peak_memory, self.memory)
+        self._insert(key)
+        return False
+
+    # Policy hooks
+    def _touch(self, key: str): ...
+    def _insert(self, key: str): ...
+    def _forget(self, key: str): ...
+    def _victim(self) -> str: ...
+
+
+class LRUCache(SimulatedCache):
+    policy = "LRU"
+
+    def __init__(self, capacity, ttl):
+        super().__init__(capacity, ttl)
+        self._order = OrderedDict()
+
+    def _touch(self, key):
+        self._order.move_to_end(key)
+
+    def _insert(self, key):
+        self._order[key] = None
+
+    def _forget(self, key):
+        self._order.pop(key, None)
+
+    def _victim(self):
+        return next(iter(self._order))
+
+
+class LFUCache(SimulatedCache):
+    policy = "LFU"
+
+    def __init__(self, capacity, ttl):
+        super().__init__(capacity, ttl)
+        self._freq: Dict[str, int] = {}
+        self._heap: List[tuple] = []  # (freq, tick, key), lazily invalidated
+        self._tick = 0
+
+    def _push(self, key):
+        self._tick += 1
+        heapq.heappush(self._heap, (self._freq[key], self._tick, key))
+
+    def _touch(self, key):
+        self._freq[key] += 1
+        self._push(key)
+
+    def _insert(self, key):
+        self._freq[key] = 1
+        self._push(key)
+
+    def _forget(self, key):
+        self._freq.pop(key, None)
+
+    def _victim(self):
+        while True:
+            freq, _, key = heapq.heappop(self._heap)
+            if self._freq.get(key) == freq:
+                return key
+
+
+class TTLCache(LRUCache):
+    """Unbounded cache that only drops entries on expiry (what app.py does today)."""
+    policy = "TTL"
+
+    def __init__(self, capacity, ttl):
+        super().__init__(None, ttl)
+
+
+def load_capture(paths: Iterable[str], service: Optional[str] = None) -> List[dict]:
+    records = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                rec = json.loads(line)
+                if service and rec.get("service") != service:
+                    continue
+                records.append(rec)
+    records.sort(key=lambda r: r["ts"])
+    return records
+
+
+def simulate(records: List[dict], cache: SimulatedCache) -> dict:
+    # Model latency per key, taken from the requests that actually hit the model
+    latency = {r["key"]: r.get("latency_ms", 0.0) for r in records if not r.get("cached")}
+    hits = 0
+    saved_ms = 0.0
+    for rec in records:
+        if cache.access(rec["key"], rec["ts"], rec.get("size", 0), rec.get("cacheable", True)):
+            hits += 1
+            saved_ms += latency.get(rec["key"], 0.0)
+    total = len(records)
+    return {
+        "config": cache.name,
+        "requests": total,
+        "hits": hits,
+        "hit_rate": hits / total if total else 0.0,
+        "peak_memory_bytes": cache.peak_memory,
+        "saved_model_calls": hits,
+        "saved_model_seconds": saved_ms / 1000,
+    }
+
+
+def build_configs(sizes: List[int], ttls: List[float]) -> List[SimulatedCache]:
+    configs: List[SimulatedCache] = []
+    for size in sizes:
+        configs.append(LRUCache(size, None))
+        configs.append(LFUCache(size, None))
+        for ttl in ttls:
+            configs.append(LRUCache(size, ttl))
+    for ttl in ttls:
+        configs.append(TTLCache(None, ttl))
+    return configs
+
+
+def _parse_list(value: str, cast) -> list:
+    return [cast(v) for v in value.split(",") if v.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a traffic capture against cache policies.")
+    parser.add_argument("captures", nargs="+", help="JSONL capture file(s)")
+    parser.add_argument("--sizes", default="100,1000,10000", help="Comma-separated entry capacities")
+    parser.add_argument("--ttls", default="300,1200,3600", help="Comma-separated TTLs in seconds")
+    parser.add_argument("--service", default=None, help="Only replay records from this service")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    records = load_capture(args.captures, args.service)
+    if not records:
+        print("No records found in capture.")
+        return 1
+
+    results = [simulate(records, cache) for cache in
+               build_configs(_parse_list(args.sizes, int), _parse_list(args.ttls, float))]
+    results.sort(key=lambda r: (-r["hit_rate"], r["peak_memory_bytes"]))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print(f"Replayed {len(records)} requests ({len({r['key'] for r in records})} distinct keys)\n")
+    print(f"{'configuration':<34} {'hit rate':>9} {'peak mem':>11} {'saved calls':>12} {'saved model s':>14}")
+    for r in results:
+        print(f"{r['config']:<34} {r['hit_rate']:>8.1%} {r['peak_memory_bytes'] / 1024:>9.1f}KB "
+              f"{r['saved_model_calls']:>12} {r['saved_model_seconds']:>14.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Optional, Dict, Any
+
+# Durable job queue for asynchronous verification.
+#
+# Jobs are persisted in a local SQLite file so a restart does not lose work.
+# Several uvicorn workers may share the same file; claim() uses BEGIN IMMEDIATE
+# so each job is handed to exactly one worker, and records which worker holds
+# it and until when (the lease). A job whose lease ran out belongs to a worker
+# that died mid-job and may be claimed again; a live worker's jobs are never
+# touched. Updates only apply while the caller still holds the job, so a late
+# verdict cannot overwrite the one from the worker that took over.
+#
+# Calls block (sqlite waits up to 10 s for another process's write lock), so
+# async code runs them with asyncio.to_thread. One connection is shared by
+# those threads, behind a lock.
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+# Longer than the slowest verdict: the vision call plus a re-prompt, each capped by the breaker
+JOB_LEASE_SECONDS = 300.0
+
+
+class JobStore:
+    def __init__(self, db_path: str, lease_seconds: float = JOB_LEASE_SECONDS):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False, timeout=10)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    task TEXT NOT NULL,
+                    image_urls TEXT NOT NULL,
+                    user_text TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    claimed_by TEXT,
+                    lease_expires REAL
+                )
+                """
+            )
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("claimed_by", "TEXT"), ("lease_expires", "REAL")):
+                if column not in columns:
+                    # Databases created before leases; their running jobs count as expired
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+        return self._conn
+
+    def create(self, task_json: str, image_urls: list, user_text: Optional[str]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO jobs (id, status, task, image_urls, user_text, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, JOB_QUEUED, task_json, json.dumps(image_urls), user_text, now, now),
+            )
+        return job_id
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Atomically take the oldest queued (or abandoned) job, lease it to this worker and return it."""
+        with self._lock:
+            conn = self.conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? "
+                    "OR (status = ? AND (lease_expires IS NULL OR lease_expires < ?)) "
+                    "ORDER BY created_at LIMIT 1",
+                    (JOB_QUEUED, JOB_RUNNING, now),
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, claimed_by = ?, lease_expires = ?, updated_at = ? WHERE id = ?",
+                        (JOB_RUNNING, self.worker_id, now + self.lease_seconds, now, row["id"]),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job = self._to_dict(row)
+        job["status"] = JOB_RUNNING
+        return job
+
+    def _update_held(self, job_id: str, assignments: str, params: tuple) -> bool:
+        """Apply an update to a job this worker still holds; False if the lease was lost."""
+        with self._lock:
+            cur = self.conn.execute(
+                f"UPDATE jobs SET {assignments}, updated_at = ? WHERE id = ? AND status = ? AND claimed_by = ?",
+                (*params, time.time(), job_id, JOB_RUNNING, self.worker_id),
+            )
+        return cur.rowcount == 1
+
+    def complete(self, job_id: str, result: Dict[str, Any]) -> bool:
+        return self._update_held(job_id, "status = ?, result = ?, lease_expires = NULL",
+                                 (JOB_DONE, json.dumps(result)))
+
+    def fail(self, job_id: str, error: str) -> bool:
+        return self._update_held(job_id, "status = ?, error = ?, lease_expires = NULL", (JOB_FAILED, error))
+
+    def requeue(self, job_id: str) -> bool:
+        """Put a claimed job back in the queue, keeping its place in line."""
+        return self._update_held(job_id, "status = ?, claimed_by = NULL, lease_expires = NULL", (JOB_QUEUED,))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def requeue_expired(self) -> int:
+        """Put jobs whose worker died mid-job (lease ran out) back in the queue."""
+        now = time.time()
+        with self._lock:
+            cur = self.conn.execute(
+                "UPDATE jobs SET status = ?, claimed_by = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE status = ? AND (lease_expires IS NULL OR lease_expires < ?)",
+                (JOB_QUEUED, now, JOB_RUNNING, now),
+            )
+        return cur.rowcount
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["image_urls"] = json.loads(job["image_urls"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+
+__all__ = ["JobStore", "JOB_QUEUED", "JOB_RUNNING", "JOB_DONE", "JOB_FAILED", "JOB_LEASE_SECONDS"]
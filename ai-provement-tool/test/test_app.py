@@ -4,6 +4,7 @@ from app import app  # Import your FastAPI app
 from unittest.mock import patch
 import httpx
 import json
+import time
 
 client = TestClient(app)
 
@@ -170,3 +171,109 @@ def test_evaluate_with_real_ai_image_3():
     assert isinstance(json_response["reason"], str) and len(json_response["reason"]) > 0
 
 
+
+@patch('app.evaluate_task_completion')
+def test_job_submit_and_poll(mock_evaluate, tmp_path, monkeypatch):
+    """A submitted job returns an id immediately and its verdict is persisted."""
+    import app as app_module
+    from circuit_breaker import CircuitBreaker
+    from jobs import JobStore
+
+    mock_evaluate.return_value = {"is_completed": True, "reason": "Mock AI verdict."}
+    monkeypatch.setattr(app_module, "job_store", JobStore(str(tmp_path / "jobs.db")))
+    # The real-AI tests may have opened the shared circuit; workers would wait out its cooldown
+    monkeypatch.setattr(app_module, "MODEL_BREAKER", CircuitBreaker(latency_budget=15.0))
+
+    task_data = {"id": 3, "title": "Queued Task"}
+    image_url = "https://res.cloudinary.com/dcmyi9sja/image/upload/v1764423449/hivemind-uploads/y9xbrjk1cwiysotw96yv.png"
+
+    with TestClient(app) as job_client:
+        response = job_client.post(
+            "/jobs",
+            data={"task": json.dumps(task_data), "image_urls": json.dumps([image_url])},
+        )
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+
+        # The SSE endpoint waits until the worker has finished the job
+        events = job_client.get(f"/jobs/{job_id}/events")
+        assert events.status_code == 200
+        assert '"status": "done"' in events.text
+        assert events.text.rstrip().endswith("data: [DONE]")
+
+        job = job_client.get(f"/jobs/{job_id}").json()
+        assert job["status"] == "done"
+        assert job["result"]["is_completed"] is True
+        assert job["task"]["title"] == "Queued Task"
+        mock_evaluate.assert_called_once()
+
+        assert job_client.get("/jobs/does-not-exist").status_code == 404
+
+def test_job_store_requeues_only_expired_leases(tmp_path):
+    """A starting worker leaves a live sibling's jobs alone and takes over abandoned ones."""
+    from jobs import JobStore
+
+    path = str(tmp_path / "jobs.db")
+    crashed = JobStore(path, lease_seconds=0.2)
+    live = JobStore(path)
+    crashed_job = crashed.create(json.dumps({"id": 1, "title": "T"}), ["https://example.com/a.png"], None)
+    live_job = live.create(json.dumps({"id": 2, "title": "T"}), ["https://example.com/b.png"], None)
+    assert crashed.claim()["id"] == crashed_job
+    assert live.claim()["id"] == live_job
+
+    starting = JobStore(path)
+    assert starting.requeue_expired() == 0
+    assert starting.claim() is None
+
+    time.sleep(0.3)
+    assert starting.requeue_expired() == 1
+    assert starting.get(live_job)["status"] == "running"
+    assert starting.claim()["id"] == crashed_job
+
+    # The original worker comes back late: its verdict does not overwrite the new one
+    assert crashed.complete(crashed_job, {"is_completed": False, "reason": "late"}) is False
+    assert starting.complete(crashed_job, {"is_completed": True, "reason": "ok"}) is True
+    assert starting.get(crashed_job)["result"]["reason"] == "ok"
+    assert live.complete(live_job, {"is_completed": True, "reason": "ok"}) is True
+
+def test_job_store_reclaims_expired_lease_without_restart(tmp_path):
+    """A job whose worker died is claimable again once its lease runs out."""
+    from jobs import JobStore
+
+    path = str(tmp_path / "jobs.db")
+    dead = JobStore(path, lease_seconds=0.1)
+    job_id = dead.create(json.dumps({"id": 1, "title": "T"}), ["https://example.com/a.png"], None)
+    dead.claim()
+    other = JobStore(path)
+    assert other.claim() is None
+    time.sleep(0.2)
+    assert other.claim()["id"] == job_id
+
+def test_repair_json_common_faults():
+    """Fenced, trailing-comma and truncated verdicts are fixed locally."""
+    from output_validation import repair_json
+
+    assert json.loads(repair_json('```json\n{"is_completed": true, "reason": "ok",}\n```')) == {
+        "is_completed": True, "reason": "ok"
+    }
+    assert json.loads(repair_json('{"is_completed": false, "reason": "Shows a different bo')) == {
+        "is_completed": False, "reason": "Shows a different bo"
+    }
+    assert json.loads(repair_json('{"is_completed": true, "reason": "ok", "conf')) == {
+        "is_completed": True, "reason": "ok"
+    }
+
+@patch('app._reprompt_ai_response')
+def test_validate_ai_response_repairs_without_reprompt(mock_reprompt):
+    """A repairable verdict is accepted and counted without another model call."""
+    import asyncio
+    import app as app_module
+
+    before = app_module.OUTPUT_VALIDATION_STATS.repaired
+    response_obj, error = asyncio.run(app_module.validate_ai_response('{"isCompleted": true, "reason": "Run tracked",'))
+
+    assert error is None
+    assert response_obj.is_completed is True
+    assert app_module.OUTPUT_VALIDATION_STATS.repaired == before + 1
+    mock_reprompt.assert_not_called()
+    assert client.get("/stats").json()["output_validation"]["saved_model_calls"] >= 1
@@ -0,0 +1,47 @@
+import json
+
+from cache_simulator import LFUCache, LRUCache, TTLCache, load_capture, main, simulate
+from traffic_capture import TrafficCapture
+
+
+def _records(keys, step=60.0, size=100):
+    return [{"ts": i * step, "key": k, "size": size, "latency_ms": 1000.0} for i, k in enumerate(keys)]
+
+
+def test_lru_evicts_least_recently_used():
+    result = simulate(_records(["a", "b", "a", "c", "a", "b"]), LRUCache(2, None))
+    # hits: a (3rd), a (5th); b was evicted by c
+    assert result["hits"] == 2
+    assert result["saved_model_seconds"] == 2.0
+    assert result["peak_memory_bytes"] == 200
+
+
+def test_lfu_keeps_frequent_keys():
+    result = simulate(_records(["a", "a", "b", "c", "a"]), LFUCache(2, None))
+    assert result["hits"] == 2
+
+
+def test_ttl_expires_entries():
+    records = _records(["a", "a", "a"], step=700.0)
+    assert simulate(records, TTLCache(None, 1200))["hits"] == 1
+    assert simulate(records, TTLCache(None, 3600))["hits"] == 2
+
+
+def test_capture_is_hashed_and_replayable(tmp_path, capsys):
+    path = str(tmp_path / "capture.jsonl")
+    capture = TrafficCapture(path, "ai-provement-tool")
+    key = (1, "I ran 10km", ("https://example.com/a.png",))
+    capture.record("/evaluate", key, 120, latency_ms=900)
+    capture.record("/evaluate", key, 120, cached=True)
+
+    raw = open(path, encoding="utf-8").read()
+    assert "I ran 10km" not in raw and "example.com" not in raw
+
+    records = load_capture([path])
+    assert records[0]["key"] == records[1]["key"]
+    # A second capture instance reuses the salt file, so keys stay comparable
+    assert TrafficCapture(path, "ai-provement-tool").fingerprint(key) == records[0]["key"]
+
+    assert main([path, "--sizes", "10", "--ttls", "60", "--json"]) == 0
+    results = json.loads(capsys.readouterr().out)
+    assert all(r["hits"] == 1 for r in results)
@@ -0,0 +1,254 @@
+import asyncio
+import json
+import time
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+import app as app_module
+from circuit_breaker import CircuitBreaker, ModelUnavailable
+
+
+def _slow_call(*args, **kwargs):
+    time.sleep(0.5)
+    return "late"
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def _failing_call(*args, **kwargs):
+    raise _StatusError(503)
+
+
+def _rejected_call(*args, **kwargs):
+    raise _StatusError(400)  # e.g. the proof image URL cannot be fetched
+
+
+def test_breaker_opens_after_failures_and_recovers():
+    breaker = CircuitBreaker(latency_budget=0.05, failure_threshold=2, cooldown=0.1)
+
+    async def scenario():
+        for _ in range(2):
+            try:
+                await breaker.call(_slow_call)
+            except ModelUnavailable:
+                pass
+        assert breaker.state == "open"
+
+        started = time.perf_counter()
+        try:
+            await breaker.call(_slow_call)
+        except ModelUnavailable:
+            pass
+        assert time.perf_counter() - started < 0.05  # refused without calling
+
+        await asyncio.sleep(0.15)
+        assert await breaker.call(lambda: "ok") == "ok"  # half-open probe succeeds
+        assert breaker.state == "closed"
+
+    asyncio.run(scenario())
+    assert breaker.counts["timeouts"] == 2
+    assert breaker.counts["short_circuited"] == 1
+    assert breaker.counts["opened"] == 1
+
+
+def test_cancelled_probe_does_not_block_later_probes():
+    breaker = CircuitBreaker(latency_budget=1.0, failure_threshold=1, cooldown=0.05)
+
+    async def scenario():
+        try:
+            await breaker.call(_failing_call)
+        except ModelUnavailable:
+            pass
+        assert breaker.state == "open"
+        await asyncio.sleep(0.1)
+
+        probe = asyncio.create_task(breaker.call(_slow_call))
+        await asyncio.sleep(0.05)
+        probe.cancel()  # e.g. the SSE client disconnected
+        try:
+            await probe
+        except asyncio.CancelledError:
+            pass
+        assert breaker.state == "half_open"
+
+        assert await breaker.call(lambda: "ok") == "ok"
+        assert breaker.state == "closed"
+
+    asyncio.run(scenario())
+    assert breaker.counts["short_circuited"] == 0
+
+
+def test_stale_call_does_not_decide_for_the_probe():
+    breaker = CircuitBreaker(latency_budget=1.0, failure_threshold=1, cooldown=0.05)
+
+    async def scenario():
+        stale = asyncio.create_task(breaker.call(_slow_call))  # started while closed
+        await asyncio.sleep(0.05)
+        try:
+            await breaker.call(_failing_call)
+        except ModelUnavailable:
+            pass
+        assert breaker.state == "open"
+        await asyncio.sleep(0.1)
+
+        probe = asyncio.create_task(breaker.call(_slow_call))
+        await asyncio.sleep(0.05)
+        assert breaker.state == "half_open"
+        assert await stale == "late"
+        # The stale success neither closed the circuit nor freed the probe slot
+        assert breaker.state == "half_open"
+        try:
+            await breaker.call(lambda: "ok")
+        except ModelUnavailable:
+            pass
+        assert breaker.counts["short_circuited"] == 1
+        assert await probe == "late"
+        assert breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_client_errors_do_not_open_the_circuit():
+    breaker = CircuitBreaker(latency_budget=1.0, failure_threshold=2, cooldown=60)
+
+    async def scenario():
+        for _ in range(3):
+            try:
+                await breaker.call(_rejected_call)
+            except _StatusError as e:
+                assert e.status_code == 400
+        assert breaker.state == "closed"
+
+    asyncio.run(scenario())
+    assert breaker.counts["client_errors"] == 3
+    assert breaker.counts["errors"] == 0
+
+
+def test_evaluate_rejects_on_client_error_without_pending(monkeypatch):
+    breaker = CircuitBreaker(latency_budget=1.0, failure_threshold=1, cooldown=60)
+    monkeypatch.setattr(app_module, "MODEL_BREAKER", breaker)
+    client = TestClient(app_module.app)
+    data = {
+        "task": json.dumps({"id": 4243, "title": "Read a book"}),
+        "image_urls": json.dumps(["https://example.com/missing.png"]),
+    }
+
+    with patch.object(app_module.groq_client.chat.completions, "create", side_effect=_rejected_call):
+        body = client.post("/evaluate", data=data).json()
+
+    assert body["pending_review"] is False
+    assert "AI API call failed" in body["reason"]
+    assert breaker.state == "closed"
+
+
+def test_evaluate_returns_pending_verdict_when_model_unavailable(monkeypatch):
+    breaker = CircuitBreaker(latency_budget=0.05, failure_threshold=2, cooldown=60)
+    monkeypatch.setattr(app_module, "MODEL_BREAKER", breaker)
+    client = TestClient(app_module.app)
+    data = {
+        "task": json.dumps({"id": 4242, "title": "Read a book"}),
+        "image_urls": json.dumps(["https://example.com/proof.png"]),
+        "user_text": "finished it",
+    }
+
+    with patch.object(app_module.groq_client.chat.completions, "create", side_effect=_failing_call):
+        for _ in range(3):
+            response = client.post("/evaluate", data=data)
+            assert response.status_code == 200
+            body = response.json()
+            assert body["pending_review"] is True
+            assert body["is_completed"] is False
+
+    assert breaker.state == "open"
+    assert breaker.counts["short_circuited"] == 1
+    # Provisional verdicts are not cached
+    assert not any(key[0] == 4242 for key in app_module._ai_cache)
+    stats = client.get("/stats").json()
+    assert stats["model_breaker"]["state"] == "open"
+
+
+def test_job_stays_queued_while_model_unavailable(tmp_path, monkeypatch):
+    from types import SimpleNamespace
+    from jobs import JobStore
+
+    breaker = CircuitBreaker(latency_budget=1.0, failure_threshold=1, cooldown=0.3)
+    monkeypatch.setattr(app_module, "MODEL_BREAKER", breaker)
+    monkeypatch.setattr(app_module, "JOB_WORKERS", 1)
+    monkeypatch.setattr(app_module, "job_store", JobStore(str(tmp_path / "jobs.db")))
+    verdict = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(
+        content='{"is_completed": true, "reason": "Looks done."}'))])
+    outcomes = [_StatusError(503), verdict]
+
+    def create(**kwargs):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    data = {
+        "task": json.dumps({"id": 4244, "title": "Read a book"}),
+        "image_urls": json.dumps(["https://example.com/proof.png"]),
+    }
+    with patch.object(app_module.groq_client.chat.completions, "create", side_effect=create):
+        with TestClient(app_module.app) as client:
+            job_id = client.post("/jobs", data=data).json()["job_id"]
+            deadline = time.time() + 10
+            statuses = set()
+            while time.time() < deadline:
+                job = client.get(f"/jobs/{job_id}").json()
+                statuses.add(job["status"])
+                if job["status"] == "done":
+                    break
+                time.sleep(0.05)
+
+    assert job["status"] == "done"
+    assert job["result"]["is_completed"] is True
+    assert job["result"]["pending_review"] is False
+    assert "queued" in statuses
+    assert breaker.counts["opened"] == 1
+
+
+def test_job_is_requeued_when_the_reprompt_finds_the_model_unavailable(tmp_path, monkeypatch):
+    from types import SimpleNamespace
+    from jobs import JobStore
+
+    breaker = CircuitBreaker(latency_budget=1.0, failure_threshold=1, cooldown=0.3)
+    monkeypatch.setattr(app_module, "MODEL_BREAKER", breaker)
+    monkeypatch.setattr(app_module, "JOB_WORKERS", 1)
+    monkeypatch.setattr(app_module, "job_store", JobStore(str(tmp_path / "jobs.db")))
+
+    def reply(content):
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    # Unreadable verdict, re-prompt hits an outage, then a clean verdict after the cooldown
+    outcomes = [reply("I think they did it."), _StatusError(503),
+                reply('{"is_completed": true, "reason": "Looks done."}')]
+
+    def create(**kwargs):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    data = {
+        "task": json.dumps({"id": 4245, "title": "Read a book"}),
+        "image_urls": json.dumps(["https://example.com/proof.png"]),
+    }
+    with patch.object(app_module.groq_client.chat.completions, "create", side_effect=create):
+        with TestClient(app_module.app) as client:
+            job_id = client.post("/jobs", data=data).json()["job_id"]
+            deadline = time.time() + 10
+            while time.time() < deadline:
+                job = client.get(f"/jobs/{job_id}").json()
+                if job["status"] in ("done", "failed"):
+                    break
+                time.sleep(0.05)
+
+    assert job["status"] == "done"
+    assert job["result"]["is_completed"] is True
+    assert outcomes == []
@@ -0,0 +1,83 @@
+import json
+import time
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from profiling import install_profiler
+
+
+def _app(monkeypatch, tmp_path, token="secret", sample_n="0"):
+    monkeypatch.setenv("HIVEMIND_PROFILE_DIR", str(tmp_path))
+    monkeypatch.setenv("HIVEMIND_PROFILE_TOKEN", token)
+    monkeypatch.setenv("HIVEMIND_PROFILE_SAMPLE_N", sample_n)
+    monkeypatch.setenv("HIVEMIND_PROFILE_INTERVAL_MS", "1")
+    app = FastAPI()
+    assert install_profiler(app, "test-service")
+
+    def busy_work():
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            sum(range(1000))
+
+    @app.get("/items/{item_id}")
+    def get_item(item_id: int):
+        busy_work()
+        return {"id": item_id}
+
+    @app.get("/stream")
+    async def stream():
+        async def gen():
+            for i in range(3):
+                busy_work()
+                yield f"data: {i}\n\n"
+        return StreamingResponse(gen(), media_type="text/event-stream")
+
+    return TestClient(app)
+
+
+def _index(tmp_path):
+    path = tmp_path / "profiles.jsonl"
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_disabled_installs_nothing(monkeypatch):
+    monkeypatch.delenv("HIVEMIND_PROFILE_DIR", raising=False)
+    app = FastAPI()
+    assert not install_profiler(app, "test-service")
+    assert app.user_middleware == []
+
+
+def test_admin_header_writes_profiles(monkeypatch, tmp_path):
+    client = _app(monkeypatch, tmp_path)
+    assert "x-profile-id" not in client.get("/items/1").headers
+    assert "x-profile-id" not in client.get("/items/1", headers={"X-Profile": "wrong"}).headers
+    assert _index(tmp_path) == []
+
+    response = client.get("/items/7", headers={"X-Profile": "secret"})
+    assert response.json() == {"id": 7}
+    [entry] = _index(tmp_path)
+    assert response.headers["x-profile-id"] + ".speedscope.json" in entry["files"]
+    assert entry["endpoint"] == "/items/{item_id}"
+    assert entry["status"] == 200
+    assert entry["latency_ms"] >= 50
+    assert entry["trigger"] == "header"
+
+    speedscope = json.loads((tmp_path / entry["files"][0]).read_text())
+    assert speedscope["profiles"] and speedscope["shared"]["frames"]
+    names = {f["name"] for f in speedscope["shared"]["frames"]}
+    assert any("busy_work" in name for name in names)
+    collapsed = (tmp_path / entry["files"][1]).read_text()
+    assert "busy_work" in collapsed
+
+
+def test_sampling_covers_streaming_body(monkeypatch, tmp_path):
+    client = _app(monkeypatch, tmp_path, token="", sample_n="1")
+    response = client.get("/stream")
+    assert response.text.count("data:") == 3
+    [entry] = _index(tmp_path)
+    assert entry["trigger"] == "sampled"
+    assert entry["latency_ms"] >= 150
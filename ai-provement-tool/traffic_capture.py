@@ -0,0 +1,81 @@
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from typing import Any, Optional
+
+# Opt-in, privacy-safe request capture for cache sizing.
+#
+# Set HIVEMIND_TRAFFIC_CAPTURE=/path/to/capture.jsonl to enable. Each line holds
+# only a keyed hash of the cache key, a timestamp, the response size and the
+# model latency -- never the request content itself. The HMAC salt lives in
+# <capture>.salt so all workers (and restarts) hash identical keys identically,
+# while the capture alone cannot be used to confirm a guessed input.
+# Replay captures with ai-provement-tool/cache_simulator.py.
+#
+# Kept identical in ai-chat-companion and ai-provement-tool; change both copies
+# (ai-chat-companion/test/test_shared_copies.py fails when they differ).
+
+TRAFFIC_CAPTURE_ENV = "HIVEMIND_TRAFFIC_CAPTURE"
+
+
+def _load_salt(path: str) -> bytes:
+    salt_path = path + ".salt"
+    try:
+        with open(salt_path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        salt = secrets.token_bytes(32)
+        try:
+            # O_EXCL: if another worker created it first, use theirs
+            fd = os.open(salt_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "wb") as f:
+                f.write(salt)
+            return salt
+        except FileExistsError:
+            with open(salt_path, "rb") as f:
+                return f.read()
+
+
+class TrafficCapture:
+    def __init__(self, path: str, service: str):
+        self.path = path
+        self.service = service
+        self._salt = _load_salt(path)
+        self._lock = threading.Lock()
+
+    def fingerprint(self, key: Any) -> str:
+        raw = json.dumps(key, sort_keys=True, default=str).encode("utf-8")
+        return hmac.new(self._salt, raw, hashlib.sha256).hexdigest()[:32]
+
+    def record(self, endpoint: str, key: Any, size: int, latency_ms: float = 0.0,
+               cacheable: bool = True, cached: bool = False):
+        line = json.dumps({
+            "ts": round(time.time(), 3),
+            "service": self.service,
+            "endpoint": endpoint,
+            "key": self.fingerprint(key),
+            "size": size,
+            "latency_ms": round(latency_ms, 1),
+            "cacheable": cacheable,
+            "cached": cached,
+        })
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            print(f"Traffic capture write failed: {e}")
+
+
+def capture_from_env(service: str) -> Optional[TrafficCapture]:
+    path = os.environ.get(TRAFFIC_CAPTURE_ENV)
+    if not path:
+        return None
+    print(f"Traffic capture enabled: {path}")
+    return TrafficCapture(path, service)
+
+
+__all__ = ["TrafficCapture", "capture_from_env", "TRAFFIC_CAPTURE_ENV"]
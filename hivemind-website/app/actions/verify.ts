@@ -4,6 +4,12 @@ import { prisma } from "@/lib/prisma"
 import { revalidatePath } from "next/cache"
 import { completeTaskAndAwardXP } from "./game"
 
+const AI_JUDGE_URL = process.env.AI_JUDGE_URL || "http://127.0.0.1:1234"
+
+// Verification runs as a queued job on the judge. verifyTaskWithAI only submits
+// it and returns the job id; the client then calls checkVerification every few
+// seconds, so no server action stays open for the model's latency.
+
 export async function verifyTaskWithAI(
   taskId: string, 
   imageUrls: string[], 
@@ -33,22 +39,52 @@ export async function verifyTaskWithAI(
   formData.append("user_text", userComment)
 
   try {
-    // 3. Call the Python AI Backend
-    const response = await fetch("http://127.0.0.1:1234/evaluate", {
+    // 3. Queue the evaluation on the Python AI Backend; the verdict is fetched by checkVerification
+    const submit = await fetch(`${AI_JUDGE_URL}/jobs`, {
       method: "POST",
       body: formData,
       cache: "no-store"
     })
 
-    if (!response.ok) {
-      const text = await response.text()
-      console.error("AI Backend Error:", text)
+    if (!submit.ok) {
+      console.error("AI Backend Error:", await submit.text())
+      return { error: "AI Service unavailable or rejected request." }
+    }
+
+    const { job_id } = await submit.json()
+    return { jobId: job_id as string }
+
+  } catch (error) {
+    console.error("Verification failed:", error)
+    return { error: "Failed to connect to AI judge." }
+  }
+}
+
+export async function checkVerification(taskId: string, jobId: string) {
+  const task = await prisma.task.findUnique({
+    where: { id: taskId },
+    select: { id: true, content: true }
+  })
+
+  if (!task) return { error: "Task not found" }
+
+  try {
+    const res = await fetch(`${AI_JUDGE_URL}/jobs/${encodeURIComponent(jobId)}`, { cache: "no-store" })
+    if (res.status === 404) return { error: "Verification not found. Please submit again." }
+    if (!res.ok) return { status: "queued" }
+
+    const job = await res.json()
+    if (job.status === "failed") {
+      console.error("AI job failed:", job.error)
       return { error: "AI Service unavailable or rejected request." }
     }
+    if (job.status !== "done") return { status: job.status as string }
 
-    const result = await response.json()
+    // The verdict must belong to this task
+    if (job.task?.title !== task.content) return { error: "Verification does not match this task." }
 
     // 4. Process Result
+    const result = job.result
     if (result.is_completed) {
 
       await completeTaskAndAwardXP(taskId)
@@ -62,7 +98,7 @@ export async function verifyTaskWithAI(
     }
 
   } catch (error) {
-    console.error("Verification failed:", error)
+    console.error("Verification check failed:", error)
     return { error: "Failed to connect to AI judge." }
   }
-}
\ No newline at end of file
+}
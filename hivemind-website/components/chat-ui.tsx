@@ -66,6 +66,11 @@ export default function ChatUI({ userId }: { userId: string }) {
                             const parsedChunk = JSON.parse(dataContent);
                             
                             if (parsedChunk.chunk) {
+                                // A reset chunk starts a new document that replaces what was
+                                // streamed so far (e.g. a template roadmap being personalized)
+                                if (parsedChunk.reset) {
+                                    rawAiResponseRef.current = "";
+                                }
                                 rawAiResponseRef.current += parsedChunk.chunk;
                                 try {
                                     const repairedJson = JSON.parse(jsonrepair(rawAiResponseRef.current));
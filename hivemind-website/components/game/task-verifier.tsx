@@ -3,7 +3,7 @@
 import { useState, useRef } from "react"
 import { useTransition } from "react"
 import { uploadImages } from "@/app/actions/upload"
-import { verifyTaskWithAI } from "@/app/actions/verify"
+import { checkVerification, verifyTaskWithAI } from "@/app/actions/verify"
 import { Button } from "@/components/ui/button"
 import { Input } from "@/components/ui/input"
 import { Textarea } from "@/components/ui/textarea"
@@ -12,6 +12,23 @@ import { Sparkles, Upload, Loader2, CheckCircle2, XCircle, Image as ImageIcon }
 import { cn } from "@/lib/utils"
 import { AnimatePresence, motion } from "motion/react"
 
+const VERDICT_POLL_INTERVAL_MS = 2000
+// Jobs wait in the judge's queue while the model is down, so allow for a long wait
+const VERDICT_TIMEOUT_MS = 10 * 60_000
+
+type Verdict = { success?: boolean; reason?: string; error?: string }
+
+// Polls the queued verification with short server action calls until it has a verdict
+async function waitForVerdict(taskId: string, jobId: string): Promise<Verdict> {
+  const deadline = Date.now() + VERDICT_TIMEOUT_MS
+  while (Date.now() < deadline) {
+    await new Promise(resolve => setTimeout(resolve, VERDICT_POLL_INTERVAL_MS))
+    const res = await checkVerification(taskId, jobId)
+    if (!res.status) return res
+  }
+  return { error: "The AI judge is taking too long. Please try again later." }
+}
+
 interface TaskVerifierProps {
   taskId: string
   taskContent: string
@@ -63,7 +80,10 @@ export function TaskVerifier({ taskId, taskContent, isCompleted }: TaskVerifierP
 
       // 2. Send to AI
       setStatus('VERIFYING')
-      const aiRes = await verifyTaskWithAI(taskId, uploadRes.urls, comment)
+      const submitted = await verifyTaskWithAI(taskId, uploadRes.urls, comment)
+      const aiRes: Verdict = submitted.jobId
+        ? await waitForVerdict(taskId, submitted.jobId)
+        : submitted
 
       if (aiRes.success) {
         setStatus('SUCCESS')